@@ -23,6 +23,19 @@ SET time_zone = "+00:00";
 
 -- --------------------------------------------------------
 
+--
+-- Estructura de tabla para la tabla `cambios_aplicados`
+--
+
+CREATE TABLE `cambios_aplicados` (
+  `uuid` char(36) NOT NULL,
+  `aplicado` timestamp NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`uuid`),
+  KEY `idx_cambios_aplicados_aplicado` (`aplicado`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- --------------------------------------------------------
+
 --
 -- Estructura de tabla para la tabla `clientes`
 --
@@ -33,7 +46,24 @@ CREATE TABLE `clientes` (
   `apellido` varchar(100) NOT NULL,
   `telefono` varchar(20) NOT NULL,
   `correo_electronico` varchar(100) NOT NULL,
-  `usuario` varchar(50) NOT NULL
+  `usuario` varchar(50) NOT NULL,
+  `version` int(11) NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- --------------------------------------------------------
+
+--
+-- Estructura de tabla para la tabla `movimientos`
+--
+
+CREATE TABLE `movimientos` (
+  `id_movimiento` bigint(20) NOT NULL,
+  `id_producto` int(11) NOT NULL,
+  `tipo` enum('entrada','salida','ajuste') NOT NULL,
+  `cantidad` int(11) NOT NULL,
+  `motivo` varchar(255) DEFAULT NULL,
+  `usuario` varchar(100) DEFAULT NULL,
+  `fecha` timestamp NOT NULL DEFAULT current_timestamp()
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
 
 -- --------------------------------------------------------
@@ -48,7 +78,10 @@ CREATE TABLE `productos` (
   `categoria` varchar(255) NOT NULL,
   `precio` decimal(10,2) NOT NULL,
   `cantidad` int(11) NOT NULL,
-  `descripcion` text DEFAULT NULL
+  `descripcion` text DEFAULT NULL,
+  `umbral` int(11) DEFAULT NULL,
+  `faltante` int(11) GENERATED ALWAYS AS (`umbral` - `cantidad`) STORED,
+  `version` int(11) NOT NULL DEFAULT 0
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
 
 --
@@ -58,6 +91,113 @@ CREATE TABLE `productos` (
 INSERT INTO `productos` (`id_producto`, `nombre`, `categoria`, `precio`, `cantidad`, `descripcion`) VALUES
 (1, 'BOCINA BLUTUSH', 'ELECTRONICOS', 1.00, 85, 'MUY BUENA BOCINA BLUTUSH');
 
+--
+-- Disparadores `productos`
+-- Mantienen `resumen_categorias` al día con cada alta, cambio o baja
+--
+DELIMITER $$
+CREATE TRIGGER `trg_productos_resumen_insert` AFTER INSERT ON `productos` FOR EACH ROW BEGIN
+  INSERT INTO `resumen_categorias` (`categoria`, `productos`, `unidades`, `valor`, `agotados`)
+  VALUES (NEW.`categoria`, 1, NEW.`cantidad`, NEW.`precio` * NEW.`cantidad`, NEW.`cantidad` <= 0)
+  ON DUPLICATE KEY UPDATE
+    `productos` = `productos` + 1,
+    `unidades` = `unidades` + VALUES(`unidades`),
+    `valor` = `valor` + VALUES(`valor`),
+    `agotados` = `agotados` + VALUES(`agotados`);
+END
+$$
+CREATE TRIGGER `trg_productos_resumen_update` AFTER UPDATE ON `productos` FOR EACH ROW BEGIN
+  -- Solo las columnas que suma el resumen: ediciones de nombre, descripción o
+  -- umbral no tocan `resumen_categorias` ni bloquean la fila de la categoría
+  IF NOT (OLD.`categoria` <=> NEW.`categoria` AND OLD.`precio` <=> NEW.`precio`
+          AND OLD.`cantidad` <=> NEW.`cantidad`) THEN
+    UPDATE `resumen_categorias`
+    SET `productos` = `productos` - 1,
+        `unidades` = `unidades` - OLD.`cantidad`,
+        `valor` = `valor` - OLD.`precio` * OLD.`cantidad`,
+        `agotados` = `agotados` - (OLD.`cantidad` <= 0)
+    WHERE `categoria` = OLD.`categoria`;
+    INSERT INTO `resumen_categorias` (`categoria`, `productos`, `unidades`, `valor`, `agotados`)
+    VALUES (NEW.`categoria`, 1, NEW.`cantidad`, NEW.`precio` * NEW.`cantidad`, NEW.`cantidad` <= 0)
+    ON DUPLICATE KEY UPDATE
+      `productos` = `productos` + 1,
+      `unidades` = `unidades` + VALUES(`unidades`),
+      `valor` = `valor` + VALUES(`valor`),
+      `agotados` = `agotados` + VALUES(`agotados`);
+  END IF;
+END
+$$
+CREATE TRIGGER `trg_productos_resumen_delete` AFTER DELETE ON `productos` FOR EACH ROW BEGIN
+  UPDATE `resumen_categorias`
+  SET `productos` = `productos` - 1,
+      `unidades` = `unidades` - OLD.`cantidad`,
+      `valor` = `valor` - OLD.`precio` * OLD.`cantidad`,
+      `agotados` = `agotados` - (OLD.`cantidad` <= 0)
+  WHERE `categoria` = OLD.`categoria`;
+END
+$$
+DELIMITER ;
+
+-- --------------------------------------------------------
+
+--
+-- Estructura de tabla para la tabla `registro_cambios`
+-- Una fila por cada alta, cambio o baja de productos y clientes (ver migraciones/007)
+--
+
+CREATE TABLE `registro_cambios` (
+  `seq` bigint(20) NOT NULL AUTO_INCREMENT,
+  `tabla` varchar(20) NOT NULL,
+  `clave` int(11) NOT NULL,
+  `fecha` timestamp NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`seq`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+--
+-- Disparadores del registro de cambios (`productos` y `clientes`)
+--
+DELIMITER $$
+CREATE TRIGGER `trg_productos_registro_insert` AFTER INSERT ON `productos` FOR EACH ROW
+  INSERT INTO `registro_cambios` (`tabla`, `clave`) VALUES ('productos', NEW.`id_producto`)
+$$
+CREATE TRIGGER `trg_productos_registro_update` AFTER UPDATE ON `productos` FOR EACH ROW
+  INSERT INTO `registro_cambios` (`tabla`, `clave`) VALUES ('productos', NEW.`id_producto`)
+$$
+CREATE TRIGGER `trg_productos_registro_delete` AFTER DELETE ON `productos` FOR EACH ROW
+  INSERT INTO `registro_cambios` (`tabla`, `clave`) VALUES ('productos', OLD.`id_producto`)
+$$
+CREATE TRIGGER `trg_clientes_registro_insert` AFTER INSERT ON `clientes` FOR EACH ROW
+  INSERT INTO `registro_cambios` (`tabla`, `clave`) VALUES ('clientes', NEW.`id_cliente`)
+$$
+CREATE TRIGGER `trg_clientes_registro_update` AFTER UPDATE ON `clientes` FOR EACH ROW
+  INSERT INTO `registro_cambios` (`tabla`, `clave`) VALUES ('clientes', NEW.`id_cliente`)
+$$
+CREATE TRIGGER `trg_clientes_registro_delete` AFTER DELETE ON `clientes` FOR EACH ROW
+  INSERT INTO `registro_cambios` (`tabla`, `clave`) VALUES ('clientes', OLD.`id_cliente`)
+$$
+DELIMITER ;
+
+-- --------------------------------------------------------
+
+--
+-- Estructura de tabla para la tabla `resumen_categorias`
+--
+
+CREATE TABLE `resumen_categorias` (
+  `categoria` varchar(255) NOT NULL,
+  `productos` int(11) NOT NULL DEFAULT 0,
+  `unidades` bigint(20) NOT NULL DEFAULT 0,
+  `valor` decimal(16,2) NOT NULL DEFAULT 0.00,
+  `agotados` int(11) NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+--
+-- Volcado de datos para la tabla `resumen_categorias`
+--
+
+INSERT INTO `resumen_categorias` (`categoria`, `productos`, `unidades`, `valor`, `agotados`) VALUES
+('ELECTRONICOS', 1, 85, 85.00, 0);
+
 -- --------------------------------------------------------
 
 --
@@ -92,13 +232,37 @@ INSERT INTO `usuarios` (`id_usuario`, `nombre_usuario`, `usuarios`, `contrasena`
 ALTER TABLE `clientes`
   ADD PRIMARY KEY (`id_cliente`),
   ADD UNIQUE KEY `correo_electronico` (`correo_electronico`),
-  ADD UNIQUE KEY `usuario` (`usuario`);
+  ADD UNIQUE KEY `usuario` (`usuario`),
+  ADD KEY `idx_clientes_apellido_nombre` (`apellido`,`nombre`);
+
+--
+-- Indices de la tabla `movimientos`
+--
+ALTER TABLE `movimientos`
+  ADD PRIMARY KEY (`id_movimiento`),
+  ADD KEY `idx_movimientos_producto` (`id_producto`,`id_movimiento`);
 
 --
 -- Indices de la tabla `productos`
 --
 ALTER TABLE `productos`
-  ADD PRIMARY KEY (`id_producto`);
+  ADD PRIMARY KEY (`id_producto`),
+  ADD KEY `idx_productos_faltante` (`faltante`),
+  ADD KEY `idx_productos_categoria_nombre` (`categoria`,`nombre`),
+  ADD KEY `idx_productos_nombre` (`nombre`),
+  ADD KEY `idx_productos_precio` (`precio`),
+  ADD KEY `idx_productos_cantidad` (`cantidad`),
+  ADD FULLTEXT KEY `ft_nombre` (`nombre`);
+
+-- InnoDB crea un solo índice FULLTEXT por sentencia
+ALTER TABLE `productos`
+  ADD FULLTEXT KEY `ft_nombre_descripcion` (`nombre`,`descripcion`);
+
+--
+-- Indices de la tabla `resumen_categorias`
+--
+ALTER TABLE `resumen_categorias`
+  ADD PRIMARY KEY (`categoria`);
 
 --
 -- Indices de la tabla `usuarios`
@@ -118,6 +282,12 @@ ALTER TABLE `usuarios`
 ALTER TABLE `clientes`
   MODIFY `id_cliente` int(11) NOT NULL AUTO_INCREMENT, AUTO_INCREMENT=16;
 
+--
+-- AUTO_INCREMENT de la tabla `movimientos`
+--
+ALTER TABLE `movimientos`
+  MODIFY `id_movimiento` bigint(20) NOT NULL AUTO_INCREMENT;
+
 --
 -- AUTO_INCREMENT de la tabla `productos`
 --
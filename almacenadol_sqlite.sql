@@ -0,0 +1,206 @@
+--
+-- Esquema de almacenadol_db para SQLite (ConexionSQLite)
+--
+-- Equivalente a almacenadol_db.sql con sus migraciones: mismas tablas,
+-- columnas, claves e índices. Diferencias propias del motor:
+--   * ENUM se reemplaza por CHECK.
+--   * Los índices FULLTEXT se reemplazan por la tabla FTS5 `productos_fts`,
+--     mantenida por disparadores.
+--   * Todo usa IF NOT EXISTS: se vuelve a ejecutar al subir
+--     ConexionSQLite.VERSION_ESQUEMA. Las columnas nuevas de tablas que ya
+--     existen se agregan con ConexionSQLite.COLUMNAS_AGREGADAS y las que
+--     pasan a admitir NULL se corrigen con COLUMNAS_OPCIONALES; los
+--     disparadores que cambian se borran con DROP TRIGGER IF EXISTS antes
+--     de crearlos.
+--
+
+CREATE TABLE IF NOT EXISTS `clientes` (
+  `id_cliente` INTEGER PRIMARY KEY AUTOINCREMENT,
+  `nombre` varchar(100) NOT NULL,
+  `apellido` varchar(100) NOT NULL,
+  `telefono` varchar(20) NOT NULL,
+  `correo_electronico` varchar(100) NOT NULL UNIQUE,
+  `usuario` varchar(50) NOT NULL UNIQUE,
+  `version` INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS `idx_clientes_apellido_nombre` ON `clientes` (`apellido`, `nombre`);
+
+CREATE TABLE IF NOT EXISTS `productos` (
+  `id_producto` INTEGER PRIMARY KEY AUTOINCREMENT,
+  `nombre` varchar(255) NOT NULL,
+  `categoria` varchar(255) NOT NULL,
+  `precio` DECIMAL(10,2) NOT NULL,
+  `cantidad` INTEGER NOT NULL,
+  `descripcion` text DEFAULT NULL,
+  `umbral` INTEGER DEFAULT NULL,
+  `faltante` INTEGER GENERATED ALWAYS AS (`umbral` - `cantidad`) STORED,
+  `version` INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS `idx_productos_faltante` ON `productos` (`faltante`);
+
+-- Orden y filtro de las listas (ver migraciones/006)
+CREATE INDEX IF NOT EXISTS `idx_productos_categoria_nombre` ON `productos` (`categoria`, `nombre`);
+CREATE INDEX IF NOT EXISTS `idx_productos_nombre` ON `productos` (`nombre`);
+CREATE INDEX IF NOT EXISTS `idx_productos_precio` ON `productos` (`precio`);
+CREATE INDEX IF NOT EXISTS `idx_productos_cantidad` ON `productos` (`cantidad`);
+
+CREATE TABLE IF NOT EXISTS `movimientos` (
+  `id_movimiento` INTEGER PRIMARY KEY AUTOINCREMENT,
+  `id_producto` INTEGER NOT NULL,
+  `tipo` varchar(10) NOT NULL CHECK (`tipo` IN ('entrada', 'salida', 'ajuste')),
+  `cantidad` INTEGER NOT NULL,
+  `motivo` varchar(255) DEFAULT NULL,
+  `usuario` varchar(100) DEFAULT NULL,
+  `fecha` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS `idx_movimientos_producto` ON `movimientos` (`id_producto`, `id_movimiento`);
+
+CREATE TABLE IF NOT EXISTS `usuarios` (
+  `id_usuario` INTEGER PRIMARY KEY AUTOINCREMENT,
+  `nombre_usuario` varchar(100) NOT NULL DEFAULT '',
+  `usuarios` varchar(50) NOT NULL UNIQUE,
+  `contrasena` varchar(255) NOT NULL,
+  `rol` varchar(50) NOT NULL,
+  `estado` varchar(10) DEFAULT 'activo' CHECK (`estado` IN ('activo', 'inactivo')),
+  `token` char(36) DEFAULT NULL,
+  `fecha_creacion` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+--
+-- Indicadores de inventario por categoría (ver migraciones/003)
+--
+
+CREATE TABLE IF NOT EXISTS `resumen_categorias` (
+  `categoria` varchar(255) NOT NULL PRIMARY KEY,
+  `productos` INTEGER NOT NULL DEFAULT 0,
+  `unidades` INTEGER NOT NULL DEFAULT 0,
+  `valor` DECIMAL(16,2) NOT NULL DEFAULT 0,
+  `agotados` INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS `trg_productos_resumen_insert` AFTER INSERT ON `productos` BEGIN
+  INSERT INTO `resumen_categorias` (`categoria`, `productos`, `unidades`, `valor`, `agotados`)
+  VALUES (NEW.`categoria`, 1, NEW.`cantidad`, ROUND(NEW.`precio` * NEW.`cantidad`, 2), NEW.`cantidad` <= 0)
+  ON CONFLICT (`categoria`) DO UPDATE SET
+    `productos` = `productos` + 1,
+    `unidades` = `unidades` + excluded.`unidades`,
+    `valor` = ROUND(`valor` + excluded.`valor`, 2),
+    `agotados` = `agotados` + excluded.`agotados`;
+END;
+
+-- Solo si cambia lo que suma el resumen (migraciones/009). Se borra primero para
+-- que las bases creadas con la versión anterior del disparador la reemplacen
+DROP TRIGGER IF EXISTS `trg_productos_resumen_update`;
+CREATE TRIGGER `trg_productos_resumen_update` AFTER UPDATE ON `productos`
+WHEN NOT (OLD.`categoria` IS NEW.`categoria` AND OLD.`precio` IS NEW.`precio`
+          AND OLD.`cantidad` IS NEW.`cantidad`) BEGIN
+  UPDATE `resumen_categorias`
+  SET `productos` = `productos` - 1,
+      `unidades` = `unidades` - OLD.`cantidad`,
+      `valor` = ROUND(`valor` - OLD.`precio` * OLD.`cantidad`, 2),
+      `agotados` = `agotados` - (OLD.`cantidad` <= 0)
+  WHERE `categoria` = OLD.`categoria`;
+  INSERT INTO `resumen_categorias` (`categoria`, `productos`, `unidades`, `valor`, `agotados`)
+  VALUES (NEW.`categoria`, 1, NEW.`cantidad`, ROUND(NEW.`precio` * NEW.`cantidad`, 2), NEW.`cantidad` <= 0)
+  ON CONFLICT (`categoria`) DO UPDATE SET
+    `productos` = `productos` + 1,
+    `unidades` = `unidades` + excluded.`unidades`,
+    `valor` = ROUND(`valor` + excluded.`valor`, 2),
+    `agotados` = `agotados` + excluded.`agotados`;
+END;
+
+CREATE TRIGGER IF NOT EXISTS `trg_productos_resumen_delete` AFTER DELETE ON `productos` BEGIN
+  UPDATE `resumen_categorias`
+  SET `productos` = `productos` - 1,
+      `unidades` = `unidades` - OLD.`cantidad`,
+      `valor` = ROUND(`valor` - OLD.`precio` * OLD.`cantidad`, 2),
+      `agotados` = `agotados` - (OLD.`cantidad` <= 0)
+  WHERE `categoria` = OLD.`categoria`;
+END;
+
+--
+-- Búsqueda de texto (equivalente a los índices FULLTEXT de migraciones/001)
+--
+
+CREATE VIRTUAL TABLE IF NOT EXISTS `productos_fts` USING fts5(
+  `nombre`, `descripcion`,
+  content = 'productos', content_rowid = 'id_producto',
+  tokenize = 'unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS `trg_productos_fts_insert` AFTER INSERT ON `productos` BEGIN
+  INSERT INTO `productos_fts` (rowid, `nombre`, `descripcion`) VALUES (NEW.`id_producto`, NEW.`nombre`, NEW.`descripcion`);
+END;
+
+-- Solo cuando cambia el texto: los movimientos de stock no tocan el índice
+CREATE TRIGGER IF NOT EXISTS `trg_productos_fts_update` AFTER UPDATE OF `nombre`, `descripcion` ON `productos` BEGIN
+  INSERT INTO `productos_fts` (`productos_fts`, rowid, `nombre`, `descripcion`) VALUES ('delete', OLD.`id_producto`, OLD.`nombre`, OLD.`descripcion`);
+  INSERT INTO `productos_fts` (rowid, `nombre`, `descripcion`) VALUES (NEW.`id_producto`, NEW.`nombre`, NEW.`descripcion`);
+END;
+
+CREATE TRIGGER IF NOT EXISTS `trg_productos_fts_delete` AFTER DELETE ON `productos` BEGIN
+  INSERT INTO `productos_fts` (`productos_fts`, rowid, `nombre`, `descripcion`) VALUES ('delete', OLD.`id_producto`, OLD.`nombre`, OLD.`descripcion`);
+END;
+
+--
+-- Cambios del diario local ya aplicados (ver migraciones/005)
+--
+
+CREATE TABLE IF NOT EXISTS `cambios_aplicados` (
+  `uuid` char(36) NOT NULL PRIMARY KEY,
+  `aplicado` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Purga por antigüedad (ver migraciones/011)
+CREATE INDEX IF NOT EXISTS `idx_cambios_aplicados_aplicado` ON `cambios_aplicados` (`aplicado`);
+
+--
+-- Registro de cambios para sincronizar las terminales (ver migraciones/007)
+--
+
+CREATE TABLE IF NOT EXISTS `registro_cambios` (
+  `seq` INTEGER PRIMARY KEY AUTOINCREMENT,
+  `tabla` varchar(20) NOT NULL,
+  `clave` INTEGER NOT NULL,
+  `fecha` TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TRIGGER IF NOT EXISTS `trg_productos_registro_insert` AFTER INSERT ON `productos` BEGIN
+  INSERT INTO `registro_cambios` (`tabla`, `clave`) VALUES ('productos', NEW.`id_producto`);
+END;
+
+CREATE TRIGGER IF NOT EXISTS `trg_productos_registro_update` AFTER UPDATE ON `productos` BEGIN
+  INSERT INTO `registro_cambios` (`tabla`, `clave`) VALUES ('productos', NEW.`id_producto`);
+END;
+
+CREATE TRIGGER IF NOT EXISTS `trg_productos_registro_delete` AFTER DELETE ON `productos` BEGIN
+  INSERT INTO `registro_cambios` (`tabla`, `clave`) VALUES ('productos', OLD.`id_producto`);
+END;
+
+CREATE TRIGGER IF NOT EXISTS `trg_clientes_registro_insert` AFTER INSERT ON `clientes` BEGIN
+  INSERT INTO `registro_cambios` (`tabla`, `clave`) VALUES ('clientes', NEW.`id_cliente`);
+END;
+
+CREATE TRIGGER IF NOT EXISTS `trg_clientes_registro_update` AFTER UPDATE ON `clientes` BEGIN
+  INSERT INTO `registro_cambios` (`tabla`, `clave`) VALUES ('clientes', NEW.`id_cliente`);
+END;
+
+CREATE TRIGGER IF NOT EXISTS `trg_clientes_registro_delete` AFTER DELETE ON `clientes` BEGIN
+  INSERT INTO `registro_cambios` (`tabla`, `clave`) VALUES ('clientes', OLD.`id_cliente`);
+END;
+
+--
+-- Datos iniciales (los mismos de almacenadol_db.sql)
+--
+
+-- Solo en bases vacías: al actualizar el esquema no se recrean filas borradas
+INSERT INTO `productos` (`id_producto`, `nombre`, `categoria`, `precio`, `cantidad`, `descripcion`)
+SELECT 1, 'BOCINA BLUTUSH', 'ELECTRONICOS', 1.00, 85, 'MUY BUENA BOCINA BLUTUSH'
+WHERE NOT EXISTS (SELECT 1 FROM `productos`);
+
+INSERT INTO `usuarios` (`id_usuario`, `nombre_usuario`, `usuarios`, `contrasena`, `rol`, `estado`, `token`, `fecha_creacion`)
+SELECT 1, 'Juan Pérez', '1', '1', '1', 'activo', '5c935755-a778-4ee1-b47d-4fecf3d8b62c', '2024-11-29 17:41:47'
+WHERE NOT EXISTS (SELECT 1 FROM `usuarios`);
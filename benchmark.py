@@ -0,0 +1,318 @@
+"""Banco de pruebas de rendimiento con datos sintéticos reproducibles.
+
+Crea (o vacía) una base de datos de pruebas con el esquema de ``almacenadol_db.sql``,
+la llena con productos y clientes generados a partir de una semilla y mide las
+operaciones principales de la aplicación sin abrir la interfaz:
+
+    python benchmark.py --host 127.0.0.1 --usuario root --base almacenadol_bench
+    python benchmark.py --motor sqlite --base /tmp/almacen_bench.db --tamanos 10000 100000
+    python benchmark.py --tamanos 10000 --salida actual.json --comparar anterior.json
+
+Los resultados (mediana, p95 y mínimo en milisegundos por operación y tamaño)
+se escriben en JSON para comparar versiones. La base indicada se BORRA y se
+vuelve a crear: no usar la base de producción.
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from index import (AccesoDatos, ConexionBD, ConexionSQLite, ExportadorDatos, ImportadorProductos,
+                   IndiceBusqueda, ServicioInventario, Usuario, pymysql)
+
+TAMANOS = (10000, 100000, 1000000)
+RUTA_ESQUEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "almacenadol_db.sql")
+
+CATEGORIAS = ("ELECTRONICOS", "FERRETERIA", "LIMPIEZA", "PAPELERIA", "ALIMENTOS", "BEBIDAS", "HOGAR",
+              "JUGUETES", "DEPORTES", "ROPA", "CALZADO", "JARDIN", "MASCOTAS", "AUTOMOTRIZ", "SALUD",
+              "BELLEZA", "OFICINA", "ILUMINACION", "PLOMERIA", "ELECTRICIDAD")
+SUSTANTIVOS = ("bocina", "cable", "martillo", "tornillo", "detergente", "cuaderno", "arroz", "jugo",
+               "lampara", "silla", "pelota", "camisa", "zapato", "manguera", "collar", "filtro",
+               "vendaje", "crema", "grapadora", "bombillo", "llave", "tubo", "interruptor", "mesa")
+ADJETIVOS = ("grande", "pequeño", "rojo", "azul", "negro", "blanco", "inalámbrico", "reforzado",
+             "económico", "premium", "compacto", "resistente", "ligero", "doble", "plegable")
+NOMBRES = ("Juan", "María", "Pedro", "Ana", "Luis", "Carmen", "José", "Rosa", "Carlos", "Laura",
+           "Miguel", "Elena", "Jorge", "Sofía", "Rafael", "Lucía")
+APELLIDOS = ("Pérez", "Gómez", "Rodríguez", "Martínez", "García", "Fernández", "López", "Díaz",
+             "Sánchez", "Ramírez", "Torres", "Reyes", "Cruz", "Morales", "Jiménez", "Castillo")
+
+
+# ------------------------------
+# Generador de datos
+# ------------------------------
+
+class GeneradorDatos:
+    """Filas sintéticas deterministas: la fila ``i`` es siempre la misma para una semilla."""
+
+    def __init__(self, semilla=42):
+        self.semilla = semilla
+
+    def _azar(self, tabla, i):
+        return random.Random(f"{self.semilla}-{tabla}-{i}")
+
+    def producto(self, i):
+        azar = self._azar("productos", i)
+        nombre = f"{azar.choice(SUSTANTIVOS)} {azar.choice(ADJETIVOS)} {i}".upper()
+        descripcion = " ".join(azar.choice(SUSTANTIVOS + ADJETIVOS) for _ in range(azar.randint(4, 12)))
+        precio = Decimal(azar.randint(100, 500000)) / 100
+        cantidad = 0 if azar.random() < 0.03 else azar.randint(1, 500)
+        return (nombre, azar.choice(CATEGORIAS), precio, cantidad, descripcion)
+
+    def cliente(self, i):
+        azar = self._azar("clientes", i)
+        nombre, apellido = azar.choice(NOMBRES), azar.choice(APELLIDOS)
+        telefono = f"809-{azar.randint(200, 999)}-{azar.randint(1000, 9999)}"
+        return (nombre, apellido, telefono, f"cliente{i}@ejemplo.com", f"cliente{i}")
+
+    def productos(self, desde, hasta):
+        return (self.producto(i) for i in range(desde, hasta))
+
+    def clientes(self, desde, hasta):
+        return (self.cliente(i) for i in range(desde, hasta))
+
+
+# ------------------------------
+# Preparación de la base de pruebas
+# ------------------------------
+
+def sentencias_sql(ruta):
+    """Sentencias de un volcado SQL, respetando los bloques ``DELIMITER`` de los disparadores."""
+    delimitador, actual = ";", []
+    with open(ruta, encoding="utf-8") as archivo:
+        for linea in archivo:
+            limpia = linea.strip()
+            if limpia.upper().startswith("DELIMITER "):
+                delimitador = limpia.split()[1]
+                continue
+            if not actual and (not limpia or limpia.startswith("--")):
+                continue
+            actual.append(linea)
+            if limpia.endswith(delimitador):
+                sentencia = "".join(actual).rstrip()[:-len(delimitador)].strip()
+                actual = []
+                if sentencia:
+                    yield sentencia
+
+
+def crear_base(host, usuario, contrasena, base_datos):
+    """Borra y vuelve a crear la base de pruebas con el esquema actual de la aplicación."""
+    conn = pymysql.connect(host=host, user=usuario, password=contrasena, charset="utf8mb4", autocommit=True)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{base_datos}`")
+            cursor.execute(f"CREATE DATABASE `{base_datos}` CHARACTER SET utf8mb4 COLLATE utf8mb4_general_ci")
+            cursor.execute(f"USE `{base_datos}`")
+            for sentencia in sentencias_sql(RUTA_ESQUEMA):
+                cursor.execute(sentencia)
+    finally:
+        conn.close()
+
+
+def crear_base_sqlite(ruta):
+    """Borra el archivo de pruebas (y su WAL); ConexionSQLite lo vuelve a crear con el esquema."""
+    for sufijo in ("", "-wal", "-shm"):
+        if os.path.exists(ruta + sufijo):
+            os.remove(ruta + sufijo)
+    return ConexionSQLite(ruta)
+
+
+def poblar(conexion_bd, generador, tabla, desde, hasta, lote=2000):
+    """Inserta las filas ``desde``..``hasta`` del generador en lotes de un INSERT de varias filas."""
+    if tabla == "productos":
+        sql = ("INSERT INTO productos (nombre, categoria, precio, cantidad, descripcion) "
+               "VALUES (%s, %s, %s, %s, %s)")
+        filas = generador.productos(desde, hasta)
+    else:
+        sql = ("INSERT INTO clientes (nombre, apellido, telefono, correo_electronico, usuario) "
+               "VALUES (%s, %s, %s, %s, %s)")
+        filas = generador.clientes(desde, hasta)
+    while True:
+        bloque = [fila for _, fila in zip(range(lote), filas)]
+        if not bloque:
+            break
+        with conexion_bd.transaccion() as cursor:
+            cursor.executemany(sql, bloque)
+
+
+# ------------------------------
+# Medición
+# ------------------------------
+
+def medir(funcion, repeticiones):
+    """Ejecuta ``funcion(i)`` varias veces y devuelve mediana, p95 y mínimo en ms."""
+    tiempos = []
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(i)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return {
+        "repeticiones": repeticiones,
+        "mediana_ms": round(statistics.median(tiempos), 3),
+        "p95_ms": round(tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))], 3),
+        "min_ms": round(tiempos[0], 3),
+    }
+
+
+def medir_operaciones(conexion_bd, generador, total, repeticiones, directorio):
+    """Mide las operaciones de la aplicación sobre una base con ``total`` productos y clientes."""
+    datos = AccesoDatos(conexion_bd)
+    inventario = ServicioInventario(conexion_bd)
+    azar = random.Random(generador.semilla)
+    ids = [azar.randint(2, total) for _ in range(repeticiones)]
+    consultas = [generador.producto(i)[0].split()[0].lower()[:4] for i in ids]
+    resultados = {}
+
+    usuario = Usuario("1", None, "1", None, None)
+    resultados["login"] = medir(lambda i: usuario.verificar_login(conexion_bd), repeticiones)
+    resultados["lista_primera_pagina"] = medir(lambda i: datos.pagina_productos(limite=200), repeticiones)
+    resultados["lista_pagina_intermedia"] = medir(
+        lambda i: datos.pagina_productos(despues_de=ids[i], limite=200), repeticiones)
+    resultados["refrescar_rango"] = medir(
+        lambda i: datos.pagina_productos(desde=ids[i], hasta=ids[i] + 1000, limite=1000), repeticiones)
+    resultados["lista_clientes"] = medir(lambda i: datos.pagina_clientes(despues_de=ids[i], limite=200), repeticiones)
+    resultados["lista_ordenada_precio"] = medir(
+        lambda i: datos.pagina_productos(orden="precio", descendente=True, limite=200), repeticiones)
+    resultados["lista_filtrada_categoria"] = medir(
+        lambda i: datos.pagina_productos(orden="nombre", filtro={"categoria": CATEGORIAS[i % len(CATEGORIAS)]},
+                                         limite=200), repeticiones)
+
+    # Búsqueda: índice local (construcción una vez + consultas) y FULLTEXT en el servidor
+    indice = IndiceBusqueda()
+    resultados["indice_construir"] = medir(lambda i: indice.construir(datos.iterar_productos()), 1)
+    resultados["buscar_local"] = medir(lambda i: indice.buscar(consultas[i]), repeticiones)
+    resultados["buscar_servidor"] = medir(lambda i: datos.buscar_productos(consultas[i]), repeticiones)
+
+    resultados["resumen_inventario"] = medir(lambda i: datos.resumen_inventario(), repeticiones)
+    resultados["alertas_stock"] = medir(lambda i: datos.productos_bajo_umbral(), repeticiones)
+
+    nuevos = []
+    resultados["insertar"] = medir(
+        lambda i: nuevos.append(datos.insertar_producto(*generador.producto(total + i))), repeticiones)
+    resultados["editar"] = medir(
+        lambda i: datos.actualizar_producto(nuevos[i], f"EDITADO {i}", "HOGAR", Decimal("9.99"), "editado"),
+        repeticiones)
+    resultados["movimiento_stock"] = medir(lambda i: inventario.registrar(nuevos[i], "entrada", 5), repeticiones)
+    resultados["eliminar"] = medir(lambda i: datos.eliminar_producto(nuevos[i]), repeticiones)
+
+    # Importación de un CSV de hasta 10 000 filas y exportación de la tabla completa
+    ruta_csv = os.path.join(directorio, "importar.csv")
+    filas_csv = min(total, 10000)
+    with open(ruta_csv, "w", newline="", encoding="utf-8") as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(ImportadorProductos.COLUMNAS)
+        escritor.writerows(generador.productos(total * 2, total * 2 + filas_csv))
+    resultados["importar_csv"] = medir(lambda i: ImportadorProductos(conexion_bd).importar(ruta_csv), 1)
+    resultados["importar_csv"]["filas"] = filas_csv
+    exportador = ExportadorDatos(datos)
+    resultados["exportar_csv"] = medir(
+        lambda i: exportador.exportar("productos", os.path.join(directorio, "productos.csv")), 1)
+    resultados["exportar_jsonl"] = medir(
+        lambda i: exportador.exportar("productos", os.path.join(directorio, "productos.jsonl")), 1)
+
+    # Deshacer la importación para que el siguiente tamaño parta de los datos generados
+    with conexion_bd.transaccion() as cursor:
+        cursor.execute("DELETE FROM productos WHERE id_producto > %s", (total + 1,))
+    return resultados
+
+
+def version_codigo():
+    try:
+        salida = subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return salida.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def comparar(actual, anterior, tolerancia):
+    """Lista las operaciones cuya mediana empeoró más de ``tolerancia`` (0.2 = 20 %)."""
+    regresiones = []
+    for tamano, operaciones in actual["resultados"].items():
+        for operacion, medida in operaciones.items():
+            previa = anterior.get("resultados", {}).get(tamano, {}).get(operacion)
+            if previa and previa["mediana_ms"] > 0 and medida["mediana_ms"] > previa["mediana_ms"] * (1 + tolerancia):
+                regresiones.append((tamano, operacion, previa["mediana_ms"], medida["mediana_ms"]))
+    return regresiones
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Banco de pruebas de rendimiento con datos sintéticos.")
+    parser.add_argument("--motor", choices=("mysql", "sqlite"), default="mysql")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--usuario", default="root")
+    parser.add_argument("--contrasena", default="")
+    parser.add_argument("--base", default="almacenadol_bench",
+                        help="Base de pruebas, o archivo con --motor sqlite (se borra y se recrea)")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=list(TAMANOS))
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", default="benchmark_resultados.json")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Empeoramiento aceptado (0.2 = 20 %%)")
+    args = parser.parse_args(argumentos)
+
+    if args.base == "almacenadol_db":
+        parser.error("la base de pruebas se borra: use una base distinta de almacenadol_db")
+
+    generador = GeneradorDatos(args.semilla)
+    if args.motor == "sqlite":
+        conexion_bd = crear_base_sqlite(args.base)
+    else:
+        crear_base(args.host, args.usuario, args.contrasena, args.base)
+        conexion_bd = ConexionBD(args.host, args.usuario, args.contrasena, args.base)
+    informe = {
+        "version": version_codigo(),
+        "motor": args.motor,
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "semilla": args.semilla,
+        "resultados": {},
+    }
+    cargadas = 0
+    try:
+        with tempfile.TemporaryDirectory() as directorio:
+            # Los tamaños crecen de forma incremental: solo se insertan las filas que faltan
+            for total in sorted(args.tamanos):
+                print(f"Generando {total} productos y clientes...")
+                inicio = time.perf_counter()
+                poblar(conexion_bd, generador, "productos", cargadas, total)
+                poblar(conexion_bd, generador, "clientes", cargadas, total)
+                cargadas = total
+                with conexion_bd.cursor() as cursor:
+                    cursor.execute("ANALYZE" if args.motor == "sqlite" else "ANALYZE TABLE productos, clientes")
+                    cursor.fetchall()
+                print(f"  datos listos en {time.perf_counter() - inicio:.1f} s; midiendo...")
+                resultados = medir_operaciones(conexion_bd, generador, total, args.repeticiones, directorio)
+                informe["resultados"][str(total)] = resultados
+                for operacion, medida in resultados.items():
+                    print(f"  {operacion:<24} mediana {medida['mediana_ms']:>10.2f} ms   p95 {medida['p95_ms']:>10.2f} ms")
+    finally:
+        conexion_bd.cerrar_pool()
+
+    with open(args.salida, "w", encoding="utf-8") as archivo:
+        json.dump(informe, archivo, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            regresiones = comparar(informe, json.load(archivo), args.tolerancia)
+        for tamano, operacion, antes, ahora in regresiones:
+            print(f"REGRESIÓN {tamano} {operacion}: {antes:.2f} ms -> {ahora:.2f} ms")
+        return 1 if regresiones else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,57 +1,3273 @@
+import time
+INICIO_PROCESO = time.perf_counter()  # Referencia para medir el tiempo hasta la primera ventana
+
 import tkinter as tk
-import pymysql
+import importlib.util
 import uuid
+import threading
+import queue
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from tkinter import ttk, messagebox, PhotoImage
+from tkinter import ttk, messagebox, PhotoImage, filedialog, simpledialog
 import os
+import bisect
+import csv
+import hashlib
+import heapq
+import itertools
+import json
+import re
+import sqlite3
+import sys
+import http.client
+import urllib.parse
+import tempfile
+import unicodedata
+import weakref
+from decimal import Decimal, InvalidOperation
+
+
+def importar_diferido(nombre):
+    """Importa un módulo sin ejecutarlo: se carga al acceder a su primer atributo.
+
+    Así la ventana de login aparece antes de cargar el driver de MySQL, que se
+    carga en segundo plano mientras el usuario escribe (ver ``precargar_driver``).
+    Devuelve None si el módulo no está instalado (p. ej. solo se usa SQLite).
+    """
+    if nombre in sys.modules:
+        return sys.modules[nombre]
+    spec = importlib.util.find_spec(nombre)
+    if spec is None:
+        return None
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nombre] = modulo
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+pymysql = importar_diferido("pymysql")
+_bloqueo_driver = threading.Lock()
+_driver_cargado = False
+
+
+def cargar_driver():
+    """Devuelve pymysql ya cargado; todo acceso al driver pasa por aquí.
+
+    LazyLoader no es seguro entre hilos: si el hilo de Tk y uno de ServicioBD
+    tocan el módulo a la vez, uno puede verlo a medio ejecutar. El primer acceso
+    se hace con un candado; los siguientes solo comprueban una variable.
+    """
+    global _driver_cargado
+    if not _driver_cargado and pymysql is not None:
+        with _bloqueo_driver:
+            if not _driver_cargado:
+                pymysql.connect  # Ejecuta el módulo de verdad
+                _driver_cargado = True
+    return pymysql
+
+
+def precargar_driver():
+    """Fuerza la carga real de pymysql (pensada para un hilo de ServicioBD)."""
+    return cargar_driver()
+
+
+# Imágenes de recursos/ ya decodificadas, compartidas por todas las ventanas
+_imagenes = {}
+
+
+def imagen_recurso(nombre):
+    """PhotoImage de recursos/, cargada una sola vez por proceso"""
+    if nombre not in _imagenes:
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        _imagenes[nombre] = PhotoImage(file=os.path.join(script_dir, "recursos", nombre))
+    return _imagenes[nombre]
+
+# ------------------------------
+# Métricas de consultas (tiempos, histogramas y consultas lentas)
+# ------------------------------
+
+_contexto_ui = threading.local()
+
+
+@contextmanager
+def accion_ui(nombre):
+    """Marca las consultas hechas dentro del bloque (en este hilo) con la acción de la interfaz."""
+    anterior = getattr(_contexto_ui, "accion", None)
+    _contexto_ui.accion = nombre
+    try:
+        yield
+    finally:
+        _contexto_ui.accion = anterior
+
+
+def accion_actual():
+    return getattr(_contexto_ui, "accion", None) or threading.current_thread().name
+
+
+class MetricasBD:
+    """Tiempos de conexión y de consultas de un pool, agrupados por forma de consulta.
+
+    La forma es el SQL sin literales ni espacios repetidos y con las listas
+    ``IN (%s, ...)`` colapsadas: las consultas que solo cambian en sus parámetros
+    se acumulan juntas. Por cada forma se guarda un histograma de latencias (las
+    cubetas de ``LIMITES_MS``), filas devueltas, errores y las acciones de la
+    interfaz que la usaron.
+
+    Las consultas que tardan ``umbral_lenta_ms`` o más se guardan en memoria y, si
+    hay ``ruta_log_lentas``, se agregan a ese archivo como JSON Lines. Solo se
+    registra la forma, nunca los parámetros (el login lleva la contraseña).
+    """
+
+    LIMITES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)  # La última cubeta es "más de 5 s"
+    MAX_LENTAS = 200
+    MAX_FORMAS_EN_CACHE = 5000
+
+    _formas = {}  # Consulta -> forma; cada consulta se normaliza una vez
+
+    def __init__(self, umbral_lenta_ms=200, ruta_log_lentas=None):
+        self.umbral_lenta_ms = umbral_lenta_ms
+        self.ruta_log_lentas = ruta_log_lentas
+        self._bloqueo = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._bloqueo:
+            self._desde = time.time()
+            self._consultas = {}                        # forma -> estadística
+            self._conexiones = self._nueva_estadistica()  # Abrir una conexión nueva
+            self._esperas = self._nueva_estadistica()     # Esperar una conexión libre del pool
+            self._lentas = deque(maxlen=self.MAX_LENTAS)
+
+    @classmethod
+    def forma(cls, query):
+        forma = cls._formas.get(query)
+        if forma is None:
+            forma = " ".join(query.split())
+            forma = re.sub(r"'(?:[^'\\]|''|\\.)*'", "?", forma)
+            forma = re.sub(r"\b\d+(?:\.\d+)?\b", "?", forma)
+            forma = re.sub(r"\bIN \((?:%s, )*%s\)", "IN (...)", forma, flags=re.IGNORECASE)
+            if len(cls._formas) >= cls.MAX_FORMAS_EN_CACHE:
+                cls._formas.clear()
+            cls._formas[query] = forma
+        return forma
+
+    def _nueva_estadistica(self):
+        return {"veces": 0, "total_ms": 0.0, "max_ms": 0.0, "filas": 0, "errores": 0,
+                "histograma": [0] * (len(self.LIMITES_MS) + 1), "acciones": {}}
+
+    def _sumar(self, estadistica, ms, filas=0, error=False, accion=None):
+        estadistica["veces"] += 1
+        estadistica["total_ms"] += ms
+        estadistica["max_ms"] = max(estadistica["max_ms"], ms)
+        estadistica["filas"] += filas
+        estadistica["errores"] += bool(error)
+        estadistica["histograma"][bisect.bisect_left(self.LIMITES_MS, ms)] += 1
+        if accion is not None:
+            estadistica["acciones"][accion] = estadistica["acciones"].get(accion, 0) + 1
+
+    def registrar_conexion(self, segundos):
+        with self._bloqueo:
+            self._sumar(self._conexiones, segundos * 1000)
+
+    def registrar_espera(self, segundos):
+        with self._bloqueo:
+            self._sumar(self._esperas, segundos * 1000)
+
+    def registrar_consulta(self, query, segundos, filas, error=None):
+        forma, ms, accion = self.forma(query), segundos * 1000, accion_actual()
+        with self._bloqueo:
+            estadistica = self._consultas.get(forma)
+            if estadistica is None:
+                estadistica = self._consultas[forma] = self._nueva_estadistica()
+            self._sumar(estadistica, ms, filas, error is not None, accion)
+            if ms < self.umbral_lenta_ms:
+                return
+            lenta = {"fecha": datetime.now().isoformat(timespec="seconds"), "ms": round(ms, 1),
+                     "consulta": forma, "accion": accion, "filas": filas,
+                     "error": str(error) if error is not None else None}
+            self._lentas.append(lenta)
+            if self.ruta_log_lentas:
+                try:
+                    with open(self.ruta_log_lentas, "a", encoding="utf-8") as archivo:
+                        archivo.write(json.dumps(lenta, ensure_ascii=False) + "\n")
+                except OSError as e:
+                    print(f"No se pudo escribir el registro de consultas lentas: {e}")
+
+    def _percentil(self, estadistica, fraccion):
+        """Límite superior de la cubeta donde cae el percentil (la última usa el máximo)."""
+        objetivo, acumulado = estadistica["veces"] * fraccion, 0
+        for limite, cantidad in zip(self.LIMITES_MS + (None,), estadistica["histograma"]):
+            acumulado += cantidad
+            if acumulado >= objetivo and cantidad:
+                return limite if limite is not None and limite < estadistica["max_ms"] else round(estadistica["max_ms"], 1)
+        return 0
+
+    def _describir(self, estadistica):
+        veces = estadistica["veces"]
+        return {
+            "veces": veces,
+            "media_ms": round(estadistica["total_ms"] / veces, 2) if veces else 0,
+            "p50_ms": self._percentil(estadistica, 0.5),
+            "p95_ms": self._percentil(estadistica, 0.95),
+            "p99_ms": self._percentil(estadistica, 0.99),
+            "max_ms": round(estadistica["max_ms"], 1),
+            "total_ms": round(estadistica["total_ms"], 1),
+            "filas": estadistica["filas"],
+            "errores": estadistica["errores"],
+            "histograma": dict(zip([f"<={limite}" for limite in self.LIMITES_MS] + [f">{self.LIMITES_MS[-1]}"],
+                                   estadistica["histograma"])),
+            "acciones": dict(estadistica["acciones"]),
+        }
+
+    def resumen(self):
+        """Estadísticas como diccionario serializable; las consultas, de mayor a menor tiempo total."""
+        with self._bloqueo:
+            consultas = sorted(self._consultas.items(), key=lambda par: par[1]["total_ms"], reverse=True)
+            return {
+                "desde": datetime.fromtimestamp(self._desde).isoformat(timespec="seconds"),
+                "umbral_lenta_ms": self.umbral_lenta_ms,
+                "conexiones": self._describir(self._conexiones),
+                "esperas_pool": self._describir(self._esperas),
+                "consultas": [{"consulta": forma, **self._describir(estadistica)} for forma, estadistica in consultas],
+                "lentas": list(self._lentas),
+            }
+
+    def exportar_json(self, ruta):
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            json.dump(self.resumen(), archivo, ensure_ascii=False, indent=2)
+
+
+class CursorMedido:
+    """Cursor que registra en MetricasBD cada consulta que ejecuta.
+
+    El tiempo de una consulta incluye el execute y las lecturas de sus filas (con
+    un cursor sin buffer las filas llegan al leerlas); se registra al ejecutar la
+    siguiente o al cerrar el cursor. Las filas son las leídas o, si no se leyó
+    nada, las afectadas.
+    """
+
+    def __init__(self, cursor, metricas):
+        self._cursor = cursor
+        self._metricas = metricas
+        self._consulta = None
+
+    def _terminar(self):
+        if self._consulta is not None:
+            filas = self._leidas if self._leyo else max(self._afectadas, 0)
+            self._metricas.registrar_consulta(self._consulta, self._segundos, filas)
+            self._consulta = None
+
+    def _medir(self, funcion, query, argumento):
+        self._terminar()
+        inicio = time.perf_counter()
+        try:
+            resultado = funcion(query, argumento)
+        except Exception as e:
+            self._metricas.registrar_consulta(query, time.perf_counter() - inicio, 0, error=e)
+            raise
+        self._consulta, self._segundos = query, time.perf_counter() - inicio
+        self._leidas, self._leyo, self._afectadas = 0, False, self._cursor.rowcount
+        return resultado
+
+    def _contar(self, inicio, filas):
+        if self._consulta is not None:
+            self._segundos += time.perf_counter() - inicio
+            self._leyo = True
+            self._leidas += filas
+
+    def execute(self, query, params=None):
+        return self._medir(self._cursor.execute, query, params)
+
+    def executemany(self, query, filas):
+        return self._medir(self._cursor.executemany, query, filas)
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        fila = self._cursor.fetchone()
+        self._contar(inicio, 0 if fila is None else 1)
+        return fila
+
+    def fetchmany(self, tamano):
+        inicio = time.perf_counter()
+        filas = self._cursor.fetchmany(tamano)
+        self._contar(inicio, len(filas))
+        return filas
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        filas = self._cursor.fetchall()
+        self._contar(inicio, len(filas))
+        return filas
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)  # rowcount, lastrowid, description...
+
+    def close(self):
+        self._terminar()
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excepcion):
+        self.close()
+
+
+class ConexionMedida:
+    """Conexión prestada por el pool cuyos cursores son CursorMedido."""
+
+    def __init__(self, conn, metricas):
+        self._conn = conn
+        self._metricas = metricas
+
+    def cursor(self, *args):
+        return CursorMedido(self._conn.cursor(*args), self._metricas)
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)  # begin, commit, rollback, ping...
+
 
 # ------------------------------
 # Clase para gestionar la conexión con la base de datos
 # ------------------------------
 
 class ConexionBD:
-    def __init__(self, host, usuario, contrasena, base_datos):
+    """Pool acotado de conexiones reutilizables a la base de datos.
+
+    Las conexiones se piden prestadas con ``conexion()``, ``cursor()`` o
+    ``transaccion()`` y se devuelven al pool al salir del bloque ``with``,
+    en lugar de abrir y cerrar una conexión TCP/TLS en cada operación.
+    """
+
+    def __init__(self, host, usuario, contrasena, base_datos, tamano_pool=5,
+                 max_inactividad=300, intervalo_ping=30, espera_maxima=30, metricas=None):
         self.host = host
         self.usuario = usuario
         self.contrasena = contrasena
         self.base_datos = base_datos
-        self.conn = None
-        self.cursor = None
+        self.tamano_pool = tamano_pool          # Máximo de conexiones abiertas a la vez
+        self.max_inactividad = max_inactividad  # Segundos ociosa antes de reciclar la conexión
+        self.intervalo_ping = intervalo_ping    # Segundos ociosa antes de verificarla con ping
+        self.espera_maxima = espera_maxima      # Segundos esperando una conexión libre
+        self._libres = []                       # Pila de (conexión, instante de devolución)
+        self._en_uso = 0
+        self._condicion = threading.Condition()
+        self.metricas = metricas or MetricasBD()  # Toda consulta pasa por CursorMedido
+
+    motor = "mysql"
 
-    def conectar(self):
+    @property
+    def identidad(self):
+        """Texto que identifica la base de datos (p. ej. para elegir el diario local)."""
+        return f"mysql://{self.usuario}@{self.host}/{self.base_datos}"
+
+    @property
+    def Error(self):
+        """Excepción base del driver: ``except conexion_bd.Error`` sirve con cualquier motor."""
+        return cargar_driver().MySQLError
+
+    @property
+    def errores_de_conexion(self):
+        """Errores que indican una conexión caída (se descarta y la lectura se reintenta)."""
+        driver = cargar_driver()
+        return (driver.err.OperationalError, driver.err.InterfaceError)
+
+    def reintentar_interbloqueo(self, funcion):
+        """Ejecuta ``funcion()`` (que abre su propia transacción) y la repite una vez
+        si InnoDB la eligió como víctima de un interbloqueo (error 1213).
+
+        InnoDB ya deshizo la transacción entera, así que repetirla desde el
+        principio es seguro. Con SQLite nunca ocurre: los errores no traen ese código.
+        """
         try:
-            self.conn = pymysql.connect(
-                host=self.host,
-                user=self.usuario,
-                password=self.contrasena,
-                database=self.base_datos,
-                charset='utf8mb4'
-            )
-            self.cursor = self.conn.cursor()
-            print("Conexión exitosa a la base de datos.")
-        except pymysql.MySQLError as e:
-            print(f"Error al conectar con la base de datos: {e}")
-    
-    def cerrar(self):
-        if self.conn:
-            self.cursor.close()
-            self.conn.close()
-    
+            return funcion()
+        except self.Error as e:
+            if getattr(e, "args", ())[:1] != (1213,):
+                raise
+            return funcion()
+
+    def _error_sin_conexiones(self):
+        return cargar_driver().err.OperationalError(2013, "No hay conexiones libres en el pool")
+
+    def _clase_cursor_sin_buffer(self):
+        return cargar_driver().cursors.SSCursor
+
+    def _crear_conexion(self, **opciones):
+        if pymysql is None:
+            raise ModuleNotFoundError("Se necesita pymysql para conectarse a MySQL", name="pymysql")
+        conn = cargar_driver().connect(
+            host=self.host,
+            user=self.usuario,
+            password=self.contrasena,
+            database=self.base_datos,
+            charset='utf8mb4',
+            autocommit=True,
+            **opciones
+        )
+        print("Conexión exitosa a la base de datos.")
+        return conn
+
+    def _crear_conexion_medida(self, **opciones):
+        inicio = time.perf_counter()
+        conn = self._crear_conexion(**opciones)
+        self.metricas.registrar_conexion(time.perf_counter() - inicio)
+        return conn
+
+    def acceso_datos(self):
+        return AccesoDatos(self)
+
+    def servicio_inventario(self):
+        return ServicioInventario(self)
+
+    def estado_pool(self):
+        with self._condicion:
+            return {"tamano": self.tamano_pool, "en_uso": self._en_uso, "libres": len(self._libres)}
+
+    @staticmethod
+    def _cerrar_silencioso(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def obtener_conexion(self):
+        """Toma una conexión del pool, verificándola o reciclándola si estuvo ociosa."""
+        inicio = time.perf_counter()
+        with self._condicion:
+            while not self._libres and self._en_uso >= self.tamano_pool:
+                if not self._condicion.wait(self.espera_maxima):
+                    raise self._error_sin_conexiones()
+            conn, devuelta = self._libres.pop() if self._libres else (None, 0)
+            self._en_uso += 1
+        self.metricas.registrar_espera(time.perf_counter() - inicio)
+
+        try:
+            inactiva = time.monotonic() - devuelta
+            if conn is not None and inactiva > self.max_inactividad:
+                # Reciclar conexiones ociosas: el servidor pudo haberlas cerrado (wait_timeout)
+                self._cerrar_silencioso(conn)
+                conn = None
+            elif conn is not None and inactiva > self.intervalo_ping:
+                try:
+                    conn.ping(reconnect=True)
+                except self.Error:
+                    self._cerrar_silencioso(conn)
+                    conn = None
+            if conn is None:
+                conn = self._crear_conexion_medida()
+            return conn
+        except Exception:
+            with self._condicion:
+                self._en_uso -= 1
+                self._condicion.notify()
+            raise
+
+    def devolver_conexion(self, conn, descartar=False):
+        """Devuelve una conexión al pool; si quedó inservible se descarta."""
+        with self._condicion:
+            self._en_uso -= 1
+            if descartar or not getattr(conn, "open", True):
+                self._cerrar_silencioso(conn)
+            else:
+                self._libres.append((conn, time.monotonic()))
+            self._condicion.notify()
+
+    @contextmanager
+    def conexion(self):
+        """Presta una conexión del pool durante el bloque ``with``."""
+        conn = self.obtener_conexion()
+        descartar = False
+        try:
+            yield ConexionMedida(conn, self.metricas)
+        except self.errores_de_conexion:
+            descartar = True  # Conexión caída: no devolverla al pool
+            raise
+        finally:
+            self.devolver_conexion(conn, descartar)
+
+    @contextmanager
+    def cursor(self):
+        """Presta una conexión en modo autocommit y entrega un cursor (lecturas)."""
+        with self.conexion() as conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def transaccion(self):
+        """Entrega un cursor dentro de una transacción: commit al salir, rollback si hay error."""
+        with self.conexion() as conn:
+            conn.begin()
+            cursor = conn.cursor()
+            try:
+                yield cursor
+                conn.commit()
+            except Exception:
+                try:
+                    conn.rollback()
+                except self.Error:
+                    pass
+                raise
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def conexion_directa(self, **opciones):
+        """Conexión propia, fuera del pool, con opciones especiales (p. ej. local_infile)."""
+        conn = self._crear_conexion_medida(**opciones)
+        try:
+            yield ConexionMedida(conn, self.metricas)
+        finally:
+            self._cerrar_silencioso(conn)
+
+    def cerrar_pool(self):
+        """Cierra todas las conexiones ociosas del pool."""
+        with self._condicion:
+            libres, self._libres = self._libres, []
+        for conn, _ in libres:
+            self._cerrar_silencioso(conn)
+
     def ejecutar_consulta(self, query, params=None):
         try:
-            self.cursor.execute(query, params)
-            self.conn.commit()
-        except pymysql.MySQLError as e:
+            with self.transaccion() as cursor:
+                cursor.execute(query, params)
+        except self.Error as e:
             print(f"Error al ejecutar consulta: {e}")
-            self.conn.rollback()
-    
+
     def obtener_resultados(self, query, params=None):
+        for intento in range(2):
+            try:
+                with self.cursor() as cursor:
+                    cursor.execute(query, params)
+                    return cursor.fetchall()
+            except self.errores_de_conexion as e:
+                # Reconexión bajo demanda: la lectura se reintenta una vez con otra conexión
+                if intento == 0:
+                    continue
+                print(f"Error al obtener resultados: {e}")
+            except self.Error as e:
+                print(f"Error al obtener resultados: {e}")
+                break
+        return []
+
+    def iterar_resultados(self, query, params=None, tamano_lote=1000):
+        """Generador de lotes de filas leídos con un cursor sin buffer (SSCursor).
+
+        El servidor envía las filas a medida que se consumen, así que la memoria
+        del cliente queda acotada a un lote sin importar el tamaño de la tabla.
+        La conexión queda prestada hasta agotar o cerrar el generador.
+        """
+        with self.conexion() as conn:
+            cursor = conn.cursor(self._clase_cursor_sin_buffer())
+            try:
+                cursor.execute(query, params)
+                while True:
+                    lote = cursor.fetchmany(tamano_lote)
+                    if not lote:
+                        break
+                    yield lote
+            finally:
+                cursor.close()
+
+
+# ------------------------------
+# Motor SQLite (base local, sin servidor)
+# ------------------------------
+
+# precio y valor se guardan como DECIMAL y se leen como Decimal, igual que con MySQL
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter("DECIMAL", lambda valor: Decimal(valor.decode()).quantize(Decimal("0.01")))
+sqlite3.register_converter("TIMESTAMP", lambda valor: datetime.fromisoformat(valor.decode()))
+
+
+class CursorSQLite:
+    """Cursor de sqlite3 con la interfaz que usa la aplicación (parámetros ``%s`` de pymysql)."""
+
+    _traducciones = {}  # Consulta con %s -> consulta con ?, cada forma se traduce una vez
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    @classmethod
+    def traducir(cls, query):
+        traducida = cls._traducciones.get(query)
+        if traducida is None:
+            traducida = cls._traducciones[query] = re.sub(r"%([s%])", lambda m: "?" if m.group(1) == "s" else "%", query)
+        return traducida
+
+    def execute(self, query, params=None):
+        if params is None:
+            self._cursor.execute(query)
+        else:
+            self._cursor.execute(self.traducir(query), tuple(params))
+        return self._cursor.rowcount
+
+    def executemany(self, query, filas):
+        self._cursor.executemany(self.traducir(query), filas)
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, tamano):
+        return self._cursor.fetchmany(tamano)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class _ConexionSQLite:
+    """Conexión de sqlite3 con los métodos de una conexión de pymysql (begin, ping, cursor)."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.open = True
+
+    def cursor(self, clase=None):
+        return CursorSQLite(self._conn.cursor())
+
+    def begin(self):
+        # IMMEDIATE toma el bloqueo de escritura al empezar: dos transacciones no
+        # quedan esperando a la vez a convertir un bloqueo de lectura en escritura
+        self._conn.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        if self._conn.in_transaction:
+            self._conn.commit()
+
+    def rollback(self):
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+    def ping(self, reconnect=False):
+        pass  # Un archivo local no se desconecta
+
+    def close(self):
+        self.open = False
+        self._conn.close()
+
+
+class ConexionSQLite(ConexionBD):
+    """Mismo pool e interfaz que ConexionBD sobre un archivo SQLite local.
+
+    Pensado para un solo puesto sin servidor, pruebas y bancos de pruebas. Usa WAL
+    (las lecturas no esperan a las escrituras) y crea el esquema de
+    ``almacenadol_sqlite.sql`` la primera vez. Las consultas de la aplicación se
+    escriben con ``%s`` como en MySQL; CursorSQLite las traduce.
+    """
+
+    motor = "sqlite"
+    RUTA_ESQUEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "almacenadol_sqlite.sql")
+    VERSION_ESQUEMA = 8  # Subir al agregar tablas o índices a almacenadol_sqlite.sql
+    # Columnas nuevas de tablas que ya existían: CREATE TABLE IF NOT EXISTS no las agrega
+    COLUMNAS_AGREGADAS = (
+        ("productos", "version", "INTEGER NOT NULL DEFAULT 0"),  # migraciones/008
+        ("clientes", "version", "INTEGER NOT NULL DEFAULT 0"),
+    )
+    # Columnas que pasaron a admitir NULL: SQLite no tiene ALTER COLUMN, así que la
+    # tabla se reconstruye con la definición del script copiando la columna con esa expresión
+    COLUMNAS_OPCIONALES = (
+        ("productos", "umbral", "NULLIF(umbral, 0)"),  # migraciones/010
+    )
+    PRAGMAS = (
+        "PRAGMA synchronous = NORMAL",     # Con WAL es seguro ante caídas de la aplicación
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA cache_size = -32000",      # 32 MB de caché de páginas por conexión
+        "PRAGMA mmap_size = 268435456",    # Lecturas mapeadas en memoria (256 MB)
+        "PRAGMA foreign_keys = ON",
+    )
+
+    def __init__(self, ruta, tamano_pool=5, espera_maxima=30, metricas=None):
+        super().__init__(None, None, None, ruta, tamano_pool=tamano_pool, espera_maxima=espera_maxima,
+                         metricas=metricas)
+        self.ruta = ruta
+        self._preparar()
+
+    @property
+    def identidad(self):
+        return f"sqlite://{os.path.abspath(self.ruta)}"
+
+    @property
+    def Error(self):
+        return sqlite3.Error
+
+    @property
+    def errores_de_conexion(self):
+        return ()  # No hay conexiones que se caigan
+
+    def _error_sin_conexiones(self):
+        return sqlite3.OperationalError("No hay conexiones libres en el pool")
+
+    def _clase_cursor_sin_buffer(self):
+        return None  # Los cursores de sqlite3 ya leen las filas a medida que se piden
+
+    def _crear_conexion(self, **opciones):
+        conn = sqlite3.connect(self.ruta, timeout=self.espera_maxima, isolation_level=None,
+                               detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        # Cada conexión la usa un solo hilo a la vez: el pool se encarga de prestarla
+        conn.execute(f"PRAGMA busy_timeout = {int(self.espera_maxima * 1000)}")
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        return _ConexionSQLite(conn)
+
+    def _preparar(self):
+        """Activa WAL (queda guardado en el archivo) y crea o actualiza el esquema."""
+        conn = sqlite3.connect(self.ruta, isolation_level=None)
         try:
-            self.cursor.execute(query, params)
-            return self.cursor.fetchall()
-        except pymysql.MySQLError as e:
-            print(f"Error al obtener resultados: {e}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] < self.VERSION_ESQUEMA:
+                # El script solo crea lo que falta: sirve también para actualizar bases anteriores
+                with open(self.RUTA_ESQUEMA, encoding="utf-8") as archivo:
+                    script = archivo.read()
+                for tabla, columna, expresion in self.COLUMNAS_OPCIONALES:
+                    self._admitir_nulos(conn, script, tabla, columna, expresion)
+                conn.executescript(script)
+                for tabla, columna, definicion in self.COLUMNAS_AGREGADAS:
+                    if columna not in {fila[1] for fila in conn.execute(f"PRAGMA table_info({tabla})")}:
+                        conn.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}")
+                conn.execute(f"PRAGMA user_version = {self.VERSION_ESQUEMA}")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _admitir_nulos(conn, script, tabla, columna, expresion):
+        """Reconstruye ``tabla`` con su definición de ``script`` si ``columna`` sigue siendo NOT NULL.
+
+        Son los pasos que indica SQLite para cambiar una columna: tabla nueva, copia
+        de las filas (con sus ids), DROP de la anterior y RENAME. Índices y
+        disparadores caen con la tabla anterior y el script los vuelve a crear; el
+        DROP no dispara triggers, así que el índice FTS y el resumen no cambian.
+        """
+        anteriores = {fila[1]: fila for fila in conn.execute(f"PRAGMA table_xinfo({tabla})")}
+        if columna not in anteriores or not anteriores[columna][3]:
+            return  # Base nueva (la crea el script) o ya actualizada
+        definicion = re.search(rf"CREATE TABLE IF NOT EXISTS `{tabla}` \(.*?\n\);", script, re.S).group(0)
+        nueva = f"{tabla}_nueva"
+        conn.execute("BEGIN")
+        try:
+            conn.execute(definicion.replace(f"`{tabla}`", f"`{nueva}`", 1))
+            # Columnas normales (hidden = 0) de las dos tablas; las generadas se recalculan
+            columnas = [fila[1] for fila in conn.execute(f"PRAGMA table_xinfo({nueva})")
+                        if fila[6] == 0 and fila[1] in anteriores and anteriores[fila[1]][6] == 0]
+            valores = [expresion if c == columna else c for c in columnas]
+            secuencia = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (tabla,)).fetchone()
+            conn.execute(f"INSERT INTO {nueva} ({', '.join(columnas)}) SELECT {', '.join(valores)} FROM {tabla}")
+            conn.execute(f"DROP TABLE {tabla}")
+            conn.execute(f"ALTER TABLE {nueva} RENAME TO {tabla}")
+            if secuencia:
+                # Los ids de filas borradas no se reutilizan (AUTOINCREMENT)
+                actual = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (tabla,)).fetchone()
+                conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (tabla,))
+                conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+                             (tabla, max(secuencia[0], actual[0] if actual else 0)))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+# ------------------------------
+# Clase AccesoDatos (consultas de productos y clientes)
+# ------------------------------
+
+def tramos_in(ids, tamano=500):
+    """Parte una selección de ids para sentencias ``IN (...)``: devuelve (marcadores, tramo) por tramo.
+
+    Acota el largo del SQL y el número de parámetros (SQLite antiguo admite 999).
+    """
+    ids = list(ids)
+    for inicio in range(0, len(ids), tamano):
+        tramo = ids[inicio:inicio + tamano]
+        yield ", ".join(["%s"] * len(tramo)), tramo
+
+
+class AccesoDatos:
+    """Consultas y operaciones CRUD sobre productos y clientes.
+
+    Sus métodos son bloqueantes: desde la interfaz se llaman a través de ServicioBD.
+    """
+
+    # ``version`` (migraciones/008) va al final: los formularios la envían con cada edición
+    COLUMNAS_PRODUCTOS = "id_producto, nombre, categoria, precio, cantidad, descripcion, version"
+    COLUMNAS_CLIENTES = "id_cliente, nombre, apellido, telefono, correo_electronico, usuario, version"
+    # Las listas traen solo el comienzo de la descripcion (TEXT); la completa se pide
+    # con descripciones_productos al seleccionar o editar un producto
+    LARGO_RESUMEN = 80
+    COLUMNAS_LISTA_PRODUCTOS = ("id_producto, nombre, categoria, precio, cantidad, "
+                                f"SUBSTR(descripcion, 1, {LARGO_RESUMEN + 1}) AS descripcion, version")
+
+    # Órdenes de las listas: nombre -> columnas. Cada uno tiene su índice secundario
+    # (migraciones/006), que termina en la clave primaria como desempate
+    ORDENES_PRODUCTOS = {"nombre": ("nombre",), "categoria": ("categoria", "nombre"),
+                         "precio": ("precio",), "cantidad": ("cantidad",)}
+    ORDENES_CLIENTES = {"apellido": ("apellido", "nombre")}
+
+    # Métodos que expone servidor.py; el servicio guarda en caché los resultados de LECTURAS
+    LECTURAS = ("pagina_productos", "pagina_clientes", "estimar_total_productos", "buscar_productos",
+                "resumen_inventario", "productos_bajo_umbral", "productos_por_id", "descripciones_productos",
+                "clientes_por_id", "ultimo_cambio", "cambios_desde")
+    METODOS_REMOTOS = LECTURAS + ("insertar_producto", "actualizar_producto", "eliminar_producto",
+                                  "insertar_cliente", "actualizar_cliente", "eliminar_cliente")
+
+    def __init__(self, conexion_bd):
+        self.conexion_bd = conexion_bd
+
+    @staticmethod
+    def _condiciones_filtro(columnas, filtro):
+        """``filtro`` es un diccionario {columna: valor} de igualdades; solo se aceptan
+        columnas de la propia consulta."""
+        condiciones, parametros = [], []
+        for columna, valor in (filtro or {}).items():
+            if columna not in columnas.split(", "):
+                raise ValueError(f"Columna de filtro no válida: {columna}")
+            condiciones.append(f"{columna} = %s")
+            parametros.append(valor)
+        return condiciones, parametros
+
+    @staticmethod
+    def _condicion_posicion(columnas, valores, operador):
+        """``(c1, c2, ...) > (v1, v2, ...)`` desarrollado en ORs de igualdades, que los
+        dos motores recorren como rango del índice. El último operador decide si la
+        posición misma se incluye (>=, <=)."""
+        if len(columnas) == 1:
+            return f"{columnas[0]} {operador} %s", [valores[0]]
+        partes, parametros = [], []
+        for i, columna in enumerate(columnas):
+            comparacion = operador if i == len(columnas) - 1 else operador[0]
+            partes.append(" AND ".join([f"{c} = %s" for c in columnas[:i]] + [f"{columna} {comparacion} %s"]))
+            parametros.extend(valores[:i + 1])
+        return "(" + " OR ".join(f"({parte})" for parte in partes) + ")", parametros
+
+    def _pagina(self, tabla, columnas, clave, despues_de=None, antes_de=None, limite=200, desde=None, hasta=None,
+                filtro=None, orden=None, descendente=False, ordenes=None):
+        """Página ordenada usando paginación por posición (keyset).
+
+        Sin ``orden`` las filas van por la clave primaria y las posiciones son claves.
+        Con ``orden`` (uno de ``ordenes``) van por esas columnas y la clave, y las
+        posiciones son tuplas con sus valores. Con ``despues_de`` devuelve las filas
+        siguientes a esa posición; con ``antes_de`` las anteriores. ``desde``/``hasta``
+        (inclusivos) vuelven a pedir un rango ya mostrado para refrescarlo. Las filas
+        vuelven siempre en el orden pedido y la consulta recorre solo ``limite``
+        entradas del índice, sin OFFSET.
+        """
+        if orden is None:
+            columnas_orden = (clave,)
+        elif orden in (ordenes or {}):
+            columnas_orden = ordenes[orden] + (clave,)
+        else:
+            raise ValueError(f"Orden no válido: {orden}")
+        condiciones, parametros = self._condiciones_filtro(columnas, filtro)
+        for operador, posicion in ((">", despues_de), ("<", antes_de), (">=", desde), ("<=", hasta)):
+            if posicion is not None:
+                if descendente:
+                    operador = operador.translate(str.maketrans("<>", "><"))
+                condicion, valores = self._condicion_posicion(columnas_orden, posicion if orden else (posicion,),
+                                                              operador)
+                condiciones.append(condicion)
+                parametros.extend(valores)
+        where = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        direccion = "DESC" if (antes_de is not None) != descendente else "ASC"
+        orden_sql = ", ".join(f"{columna} {direccion}" for columna in columnas_orden)
+        with self.conexion_bd.cursor() as cursor:
+            cursor.execute(f"SELECT {columnas} FROM {tabla}{where} ORDER BY {orden_sql} LIMIT %s",
+                           (*parametros, limite))
+            filas = list(cursor.fetchall())
+        return filas[::-1] if antes_de is not None else filas
+
+    def _iterar(self, tabla, columnas, clave, tamano_lote=1000, filtro=None):
+        """Recorre la tabla en lotes, en orden de clave, sin cargarla en memoria."""
+        condiciones, parametros = self._condiciones_filtro(columnas, filtro)
+        where = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        return self.conexion_bd.iterar_resultados(f"SELECT {columnas} FROM {tabla}{where} ORDER BY {clave}",
+                                                  parametros, tamano_lote=tamano_lote)
+
+    # Productos
+    def iterar_productos(self, tamano_lote=1000, filtro=None):
+        return self._iterar("productos", self.COLUMNAS_PRODUCTOS, "id_producto", tamano_lote, filtro)
+
+    def pagina_productos(self, completa=False, **rango):
+        """Página de productos; sin ``completa`` la descripcion llega recortada (ver LARGO_RESUMEN)."""
+        columnas = self.COLUMNAS_PRODUCTOS if completa else self.COLUMNAS_LISTA_PRODUCTOS
+        return self._pagina("productos", columnas, "id_producto", ordenes=self.ORDENES_PRODUCTOS, **rango)
+
+    def descripciones_productos(self, ids):
+        """{id: descripcion completa} de los productos indicados."""
+        descripciones = {}
+        with self.conexion_bd.cursor() as cursor:
+            for marcadores, tramo in tramos_in(ids):
+                cursor.execute(f"SELECT id_producto, descripcion FROM productos WHERE id_producto IN ({marcadores})",
+                               tramo)
+                descripciones.update(cursor.fetchall())
+        return descripciones
+
+    def estimar_total_productos(self):
+        """Número aproximado de productos según las estadísticas de InnoDB (sin recorrer la tabla)."""
+        with self.conexion_bd.cursor() as cursor:
+            if self.conexion_bd.motor == "sqlite":
+                # El id más alto acota el total y se lee del índice primario sin recorrerlo
+                cursor.execute("SELECT MAX(id_producto) FROM productos")
+            else:
+                cursor.execute("""
+                SELECT TABLE_ROWS FROM information_schema.TABLES
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'productos'
+                """)
+            fila = cursor.fetchone()
+        return int(fila[0] or 0) if fila else 0
+
+    def buscar_productos(self, consulta, limite=500):
+        """Búsqueda FULLTEXT en el servidor sobre nombre y descripcion, ordenada por relevancia.
+
+        Cada palabra se exige como prefijo (``+palabra*`` en modo booleano), igual que
+        en la búsqueda local; las coincidencias en el nombre pesan el doble. Las filas
+        traen la descripcion recortada, como ``pagina_productos``.
+        """
+        palabras = separar_palabras(consulta)
+        if not palabras:
             return []
+        if self.conexion_bd.motor == "sqlite":
+            return self._buscar_productos_fts5(palabras, limite)
+        expresion = " ".join(f"+{palabra}*" for palabra in palabras)
+        with self.conexion_bd.cursor() as cursor:
+            cursor.execute(f"""
+            SELECT {self.COLUMNAS_LISTA_PRODUCTOS},
+                   MATCH (nombre) AGAINST (%s IN BOOLEAN MODE) * 2
+                   + MATCH (nombre, descripcion) AGAINST (%s IN BOOLEAN MODE) AS relevancia
+            FROM productos
+            WHERE MATCH (nombre, descripcion) AGAINST (%s IN BOOLEAN MODE)
+            ORDER BY relevancia DESC, id_producto
+            LIMIT %s
+            """, (expresion, expresion, expresion, limite))
+            return [fila[:-1] for fila in cursor.fetchall()]
+
+    def _buscar_productos_fts5(self, palabras, limite):
+        # En SQLite el índice de texto es la tabla FTS5 productos_fts; bm25 pondera el nombre al doble
+        columnas = ("p.id_producto, p.nombre, p.categoria, p.precio, p.cantidad, "
+                    f"SUBSTR(p.descripcion, 1, {self.LARGO_RESUMEN + 1}), p.version")
+        expresion = " ".join(f'"{palabra}"*' for palabra in palabras)
+        with self.conexion_bd.cursor() as cursor:
+            cursor.execute(f"""
+            SELECT {columnas}
+            FROM productos_fts JOIN productos p ON p.id_producto = productos_fts.rowid
+            WHERE productos_fts MATCH %s
+            ORDER BY bm25(productos_fts, 2.0, 1.0), p.id_producto
+            LIMIT %s
+            """, (expresion, limite))
+            return cursor.fetchall()
+
+    def resumen_inventario(self):
+        """Indicadores por categoría desde ``resumen_categorias``, que mantienen los triggers
+        de productos: la lectura es O(categorías) sin importar el tamaño del catálogo."""
+        with self.conexion_bd.cursor() as cursor:
+            cursor.execute("""
+            SELECT categoria, productos, unidades, valor, agotados
+            FROM resumen_categorias WHERE productos > 0
+            ORDER BY valor DESC
+            """)
+            return cursor.fetchall()
+
+    def productos_bajo_umbral(self, limite=200):
+        """Productos con ``cantidad <= umbral``, los más faltantes primero.
+
+        Usa el índice de la columna generada ``faltante`` (umbral - cantidad): es un
+        rango sobre el índice, así que el costo depende de cuántos productos están
+        bajos y no del tamaño del catálogo. Los productos sin umbral (NULL) tienen
+        ``faltante`` NULL y nunca aparecen.
+        """
+        with self.conexion_bd.cursor() as cursor:
+            cursor.execute("""
+            SELECT id_producto, nombre, cantidad, umbral
+            FROM productos WHERE faltante >= 0
+            ORDER BY faltante DESC LIMIT %s
+            """, (limite,))
+            return cursor.fetchall()
+
+    def productos_por_id(self, ids):
+        """Filas actuales de los productos indicados (los que ya no existen no aparecen)."""
+        filas = []
+        with self.conexion_bd.cursor() as cursor:
+            for marcadores, tramo in tramos_in(ids):
+                cursor.execute(f"SELECT {self.COLUMNAS_PRODUCTOS} FROM productos WHERE id_producto IN ({marcadores})",
+                               tramo)
+                filas.extend(cursor.fetchall())
+        return filas
+
+    def _actualizar_en_bloque(self, sentencia, ids, *parametros, cursor=None):
+        """Ejecuta ``sentencia`` (con ``{ids}`` donde va la lista IN) sobre la selección,
+        por tramos y en una sola transacción. Devuelve el número de filas afectadas.
+
+        Con ``cursor`` se usa esa transacción (la del diario al aplicar un cambio en bloque).
+        """
+        if cursor is None:
+            with self.conexion_bd.transaccion() as cursor:
+                return self._actualizar_en_bloque(sentencia, ids, *parametros, cursor=cursor)
+        afectadas = 0
+        for marcadores, tramo in tramos_in(ids):
+            cursor.execute(sentencia.format(ids=marcadores), (*parametros, *tramo))
+            afectadas += cursor.rowcount
+        return afectadas
+
+    def insertar_producto(self, nombre, categoria, precio, cantidad, descripcion):
+        with self.conexion_bd.transaccion() as cursor:
+            cursor.execute("""
+            INSERT INTO productos (nombre, categoria, precio, cantidad, descripcion)
+            VALUES (%s, %s, %s, %s, %s)
+            """, (nombre, categoria, precio, cantidad, descripcion))
+            return cursor.lastrowid
+
+    @staticmethod
+    def _condicion_version(version):
+        """Con ``version`` la actualización solo se aplica si nadie guardó desde que se leyó la fila."""
+        return (" AND version = %s", (version,)) if version is not None else ("", ())
+
+    def actualizar_producto(self, id_producto, nombre, categoria, precio, descripcion, version=None):
+        """Actualiza los datos del producto; la existencia solo cambia con ServicioInventario.
+
+        Devuelve False si el producto no existe o, con ``version``, si ya tiene otra.
+        """
+        condicion, parametros = self._condicion_version(version)
+        with self.conexion_bd.transaccion() as cursor:
+            cursor.execute(f"""
+            UPDATE productos
+            SET nombre = %s, categoria = %s, precio = %s, descripcion = %s, version = version + 1
+            WHERE id_producto = %s{condicion}
+            """, (nombre, categoria, precio, descripcion, id_producto, *parametros))
+            return cursor.rowcount > 0
+
+    def eliminar_producto(self, id_producto):
+        with self.conexion_bd.transaccion() as cursor:
+            cursor.execute("DELETE FROM productos WHERE id_producto = %s", (id_producto,))
+
+    # Clientes
+    def iterar_clientes(self, tamano_lote=1000, filtro=None):
+        return self._iterar("clientes", self.COLUMNAS_CLIENTES, "id_cliente", tamano_lote, filtro)
+
+    def pagina_clientes(self, **rango):
+        return self._pagina("clientes", self.COLUMNAS_CLIENTES, "id_cliente", ordenes=self.ORDENES_CLIENTES, **rango)
+
+    def insertar_cliente(self, nombre, apellido, telefono, correo, usuario):
+        with self.conexion_bd.transaccion() as cursor:
+            cursor.execute("""
+            INSERT INTO clientes (nombre, apellido, telefono, correo_electronico, usuario)
+            VALUES (%s, %s, %s, %s, %s)
+            """, (nombre, apellido, telefono, correo, usuario))
+            return cursor.lastrowid
+
+    def actualizar_cliente(self, id_cliente, nombre, apellido, telefono, correo, usuario, version=None):
+        condicion, parametros = self._condicion_version(version)
+        with self.conexion_bd.transaccion() as cursor:
+            cursor.execute(f"""
+            UPDATE clientes
+            SET nombre = %s, apellido = %s, telefono = %s, correo_electronico = %s, usuario = %s,
+                version = version + 1
+            WHERE id_cliente = %s{condicion}
+            """, (nombre, apellido, telefono, correo, usuario, id_cliente, *parametros))
+            return cursor.rowcount > 0
+
+    def eliminar_cliente(self, id_cliente):
+        with self.conexion_bd.transaccion() as cursor:
+            cursor.execute("DELETE FROM clientes WHERE id_cliente = %s", (id_cliente,))
+
+    def clientes_por_id(self, ids):
+        filas = []
+        with self.conexion_bd.cursor() as cursor:
+            for marcadores, tramo in tramos_in(ids):
+                cursor.execute(f"SELECT {self.COLUMNAS_CLIENTES} FROM clientes WHERE id_cliente IN ({marcadores})",
+                               tramo)
+                filas.extend(cursor.fetchall())
+        return filas
+
+    # Registro de cambios (migraciones/007)
+    def ultimo_cambio(self):
+        """Secuencia del último cambio registrado (0 si no hay ninguno)."""
+        with self.conexion_bd.cursor() as cursor:
+            cursor.execute("SELECT MAX(seq) FROM registro_cambios")
+            return cursor.fetchone()[0] or 0
+
+    def cambios_desde(self, despues_de, limite=500, huecos=()):
+        """Cambios de productos y clientes con ``seq`` mayor que ``despues_de`` o
+        incluido en ``huecos`` (secuencias anteriores que aún no se habían visto).
+
+        Lee el rango del registro por su clave primaria y vuelve a leer solo los
+        registros tocados, así que el costo depende de cuántos cambios hubo y no
+        del tamaño de las tablas. Devuelve las secuencias vistas, las filas
+        actuales y los ids que ya no existen. Si hay más de ``limite`` cambios
+        devuelve ``{"desbordado": True, "ultimo": seq}``: conviene recargar todo.
+        """
+        huecos = list(huecos)
+        condicion = "seq > %s"
+        if huecos:
+            condicion += f" OR seq IN ({', '.join(['%s'] * len(huecos))})"
+        with self.conexion_bd.cursor() as cursor:
+            cursor.execute(f"SELECT seq, tabla, clave FROM registro_cambios WHERE {condicion} ORDER BY seq LIMIT %s",
+                           (despues_de, *huecos, limite + 1))
+            registros = cursor.fetchall()
+            if len(registros) > limite:
+                cursor.execute("SELECT MAX(seq) FROM registro_cambios")
+                return {"desbordado": True, "ultimo": cursor.fetchone()[0]}
+
+        claves = {"productos": set(), "clientes": set()}
+        for _, tabla, clave in registros:
+            if tabla in claves:
+                claves[tabla].add(clave)
+        productos = self.productos_por_id(sorted(claves["productos"])) if claves["productos"] else []
+        clientes = self.clientes_por_id(sorted(claves["clientes"])) if claves["clientes"] else []
+        return {
+            "secuencias": [registro[0] for registro in registros],
+            "productos": productos,
+            "clientes": clientes,
+            "eliminados": {"productos": sorted(claves["productos"] - {fila[0] for fila in productos}),
+                           "clientes": sorted(claves["clientes"] - {fila[0] for fila in clientes})},
+        }
+
+
+# ------------------------------
+# Clase ServicioInventario (movimientos de stock)
+# ------------------------------
+
+class StockInsuficiente(ValueError):
+    """Un movimiento dejaría la existencia de un producto por debajo de cero."""
+
+
+class ServicioInventario:
+    """Registra entradas, salidas y ajustes de stock en la tabla ``movimientos``.
+
+    La existencia nunca se sobrescribe: cada producto se actualiza con un
+    ``UPDATE ... SET cantidad = cantidad + delta`` condicionado a que el resultado
+    no sea negativo. La sentencia es atómica y solo bloquea la fila del producto,
+    así que dos usuarios que mueven stock a la vez no pierden cambios. La única
+    excepción es ``fijar_existencia`` (recuentos), que bloquea las filas antes de
+    sobrescribirlas y registra la diferencia como ajuste.
+    """
+
+    TIPOS = ("entrada", "salida", "ajuste")
+    LECTURAS = ("historial",)
+    METODOS_REMOTOS = LECTURAS + ("registrar", "registrar_lote")
+
+    def __init__(self, conexion_bd):
+        self.conexion_bd = conexion_bd
+
+    @staticmethod
+    def delta(tipo, cantidad):
+        """Variación de existencia de un movimiento: las entradas suman, las salidas restan
+        y los ajustes llevan su propio signo."""
+        cantidad = int(cantidad)
+        if tipo == "entrada":
+            return abs(cantidad)
+        if tipo == "salida":
+            return -abs(cantidad)
+        if tipo == "ajuste":
+            return cantidad
+        raise ValueError(f"Tipo de movimiento no válido: {tipo}")
+
+    def registrar(self, id_producto, tipo, cantidad, motivo=None, usuario=None):
+        """Registra un solo movimiento y devuelve la nueva existencia del producto."""
+        return self.registrar_lote([(id_producto, tipo, cantidad, motivo)], usuario)[int(id_producto)]
+
+    def registrar_lote(self, movimientos, usuario=None):
+        """Aplica varios movimientos ``(id_producto, tipo, cantidad, motivo)`` en una transacción.
+
+        Si algún producto quedaría en negativo (o no existe) se lanza
+        StockInsuficiente y no se aplica ningún movimiento del lote.
+        Devuelve {id_producto: nueva existencia}. Si la transacción cae en un
+        interbloqueo se repite una vez.
+        """
+        def aplicar_en_transaccion():
+            with self.conexion_bd.transaccion() as cursor:
+                return self.aplicar(cursor, movimientos, usuario)
+        return self.conexion_bd.reintentar_interbloqueo(aplicar_en_transaccion)
+
+    def aplicar(self, cursor, movimientos, usuario=None):
+        """Aplica los movimientos con un cursor dentro de una transacción ya abierta.
+
+        Los deltas de un mismo producto se suman y se aplican con un UPDATE por
+        producto, en orden de id para que dos lotes concurrentes bloqueen las filas
+        en el mismo orden. Cada movimiento puede traer un quinto elemento con su
+        usuario; si no, se usa ``usuario``.
+        """
+        filas, deltas = [], {}
+        for id_producto, tipo, cantidad, motivo, *quien in movimientos:
+            id_producto, delta = int(id_producto), self.delta(tipo, cantidad)
+            deltas[id_producto] = deltas.get(id_producto, 0) + delta
+            filas.append((id_producto, tipo, delta, motivo, quien[0] if quien else usuario))
+        if not filas:
+            return {}
+
+        ids = sorted(deltas)
+        for id_producto in ids:
+            delta = deltas[id_producto]
+            if delta == 0:
+                continue  # Sin cambio neto: un UPDATE no afectaría filas
+            cursor.execute("""
+            UPDATE productos SET cantidad = cantidad + %s
+            WHERE id_producto = %s AND cantidad + %s >= 0
+            """, (delta, id_producto, delta))
+            if cursor.rowcount == 0:
+                raise StockInsuficiente(f"El producto {id_producto} no existe o no tiene stock suficiente "
+                                        f"para un movimiento de {delta}.")
+        cursor.executemany("""
+        INSERT INTO movimientos (id_producto, tipo, cantidad, motivo, usuario)
+        VALUES (%s, %s, %s, %s, %s)
+        """, filas)
+        marcadores = ", ".join(["%s"] * len(ids))
+        cursor.execute(f"SELECT id_producto, cantidad FROM productos WHERE id_producto IN ({marcadores})", ids)
+        return dict(cursor.fetchall())
+
+    def fijar_existencia(self, cursor, ids_productos, cantidad, motivo=None, usuario=None):
+        """Deja la existencia de varios productos en ``cantidad`` (p. ej. tras un recuento),
+        con un cursor dentro de una transacción ya abierta (la del diario).
+
+        Por cada tramo de ids: lee y bloquea las existencias actuales, registra la
+        diferencia como un ajuste por producto y aplica un solo
+        ``UPDATE ... WHERE id_producto IN (...)``. La diferencia se calcula con la
+        existencia del momento, así que el resultado es ``cantidad`` aunque otras
+        terminales hayan movido stock. Devuelve el número de productos que cambiaron.
+        """
+        cantidad = int(cantidad)
+        if cantidad < 0:
+            raise StockInsuficiente("La existencia no puede ser negativa.")
+        bloqueo = " FOR UPDATE" if self.conexion_bd.motor == "mysql" else ""
+        cambiados = 0
+        for marcadores, tramo in tramos_in(sorted(int(i) for i in ids_productos)):
+            cursor.execute(f"""
+            SELECT id_producto, cantidad FROM productos
+            WHERE id_producto IN ({marcadores}) AND cantidad <> %s
+            ORDER BY id_producto{bloqueo}
+            """, (*tramo, cantidad))
+            ajustes = [(id_producto, "ajuste", cantidad - actual, motivo, usuario)
+                       for id_producto, actual in cursor.fetchall()]
+            if not ajustes:
+                continue
+            cursor.executemany("""
+            INSERT INTO movimientos (id_producto, tipo, cantidad, motivo, usuario)
+            VALUES (%s, %s, %s, %s, %s)
+            """, ajustes)
+            marcadores = ", ".join(["%s"] * len(ajustes))
+            cursor.execute(f"UPDATE productos SET cantidad = %s WHERE id_producto IN ({marcadores})",
+                           (cantidad, *(ajuste[0] for ajuste in ajustes)))
+            cambiados += len(ajustes)
+        return cambiados
+
+    def historial(self, id_producto, limite=50):
+        """Últimos movimientos de un producto, del más reciente al más antiguo."""
+        with self.conexion_bd.cursor() as cursor:
+            cursor.execute("""
+            SELECT id_movimiento, tipo, cantidad, motivo, usuario, fecha
+            FROM movimientos WHERE id_producto = %s
+            ORDER BY id_movimiento DESC LIMIT %s
+            """, (id_producto, limite))
+            return cursor.fetchall()
+
+
+# ------------------------------
+# Clase AlertasStock (aviso periódico de stock bajo)
+# ------------------------------
+
+class AlertasStock:
+    """Revisa cada ``intervalo_ms`` los productos por debajo de su umbral.
+
+    La consulta corre en ServicioBD y la siguiente revisión se programa con
+    ``root.after`` solo cuando termina la anterior, así que nunca se acumulan.
+    Cada producto se avisa una vez mientras siga bajo su umbral (si se repone y
+    vuelve a bajar se avisa de nuevo): cada revisión hace una sola llamada a
+    ``al_alertar(nuevos, total)`` con los productos que no se habían avisado.
+    """
+
+    def __init__(self, root, servicio_bd, datos, al_alertar, intervalo_ms=60000, limite=200):
+        self.root = root
+        self.servicio_bd = servicio_bd
+        self.datos = datos
+        self.al_alertar = al_alertar
+        self.intervalo_ms = intervalo_ms
+        self.limite = limite      # Máximo de productos por revisión: acota el costo de cada consulta
+        self.avisados = set()     # Ids ya avisados que siguen bajo su umbral
+        self.activa = False
+        self._programada = None   # Id de root.after de la próxima revisión
+
+    def iniciar(self):
+        if not self.activa:
+            self.activa = True
+            self.revisar()
+
+    def detener(self):
+        self.activa = False
+        if self._programada is not None:
+            self.root.after_cancel(self._programada)
+            self._programada = None
+        self.servicio_bd.cancelar("alertas_stock")
+
+    def revisar(self):
+        """Revisa ahora (p. ej. después de un movimiento de stock) y reprograma la siguiente."""
+        if not self.activa:
+            return
+        if self._programada is not None:
+            self.root.after_cancel(self._programada)
+            self._programada = None
+
+        def al_terminar(filas):
+            actuales = {fila[0] for fila in filas}
+            nuevos = [fila for fila in filas if fila[0] not in self.avisados]
+            self.avisados = actuales
+            self.al_alertar(nuevos, len(filas))
+            self._programar()
+
+        def al_fallar(error):
+            print(f"Error al revisar el stock bajo: {error}")
+            self._programar()
+
+        self.servicio_bd.ejecutar(lambda: self.datos.productos_bajo_umbral(self.limite), al_terminar,
+                                  al_fallar=al_fallar, clave="alertas_stock")
+
+    def _programar(self):
+        if self.activa:  # Se pudo detener mientras la consulta estaba en curso
+            self._programada = self.root.after(self.intervalo_ms, self.revisar)
+
+
+class MonitorCambios:
+    """Trae cada ``intervalo_ms`` lo que otras terminales cambiaron en productos y clientes.
+
+    Usa ``registro_cambios`` (migraciones/007): pide los cambios posteriores al
+    último ``seq`` visto y entrega a ``al_cambiar(cambios)`` las filas actuales y
+    los ids eliminados (ver AccesoDatos.cambios_desde). Con más de ``limite``
+    cambios pendientes llama ``al_cambiar(None)``: es más barato recargar todo.
+
+    Un ``seq`` puede aparecer después de otros mayores si su transacción tardó
+    en confirmarse; los huecos se vuelven a pedir durante ``espera_huecos_s``
+    segundos y después se dan por descartados (rollback). Solo se piden esos
+    ``seq`` sueltos junto con los posteriores al último visto, así que un hueco
+    abierto no obliga a releer los cambios que ya se aplicaron.
+    Como AlertasStock, la siguiente consulta se programa al terminar la anterior.
+    """
+
+    def __init__(self, root, servicio_bd, datos, al_cambiar, intervalo_ms=3000, limite=500, espera_huecos_s=30):
+        self.root = root
+        self.servicio_bd = servicio_bd
+        self.datos = datos
+        self.al_cambiar = al_cambiar
+        self.intervalo_ms = intervalo_ms
+        self.limite = limite
+        self.espera_huecos_s = espera_huecos_s
+        self.ultimo = None        # Último seq visto; None hasta leer el punto de partida
+        self.huecos = {}          # seq no visto -> instante en que se detectó el hueco
+        self.activo = False
+        self._programada = None
+
+    @property
+    def listo(self):
+        """Ya sigue el registro: las listas abiertas se mantienen al día solas."""
+        return self.activo and self.ultimo is not None
+
+    def iniciar(self):
+        if not self.activo:
+            self.activo = True
+            self.revisar()
+
+    def detener(self):
+        self.activo = False
+        if self._programada is not None:
+            self.root.after_cancel(self._programada)
+            self._programada = None
+        self.servicio_bd.cancelar("monitor_cambios")
+
+    def revisar(self):
+        """Consulta ahora (p. ej. después de enviar el diario) y reprograma la siguiente."""
+        if not self.activo:
+            return
+        if self._programada is not None:
+            self.root.after_cancel(self._programada)
+            self._programada = None
+
+        if self.ultimo is None:
+            # Lo anterior a abrir la sesión ya está en las listas
+            consulta, al_terminar = self.datos.ultimo_cambio, self._al_iniciar
+        else:
+            desde, huecos = self.ultimo, sorted(self.huecos)
+            consulta, al_terminar = (lambda: self.datos.cambios_desde(desde, self.limite, huecos)), self._al_recibir
+
+        def al_fallar(error):
+            print(f"Error al leer el registro de cambios: {error}")
+            self._programar()
+
+        self.servicio_bd.ejecutar(consulta, al_terminar, al_fallar=al_fallar, clave="monitor_cambios")
+
+    def _al_iniciar(self, ultimo):
+        self.ultimo = ultimo
+        self._programar()
+
+    def _al_recibir(self, cambios):
+        if cambios.get("desbordado"):
+            self.ultimo = max(self.ultimo, cambios["ultimo"] or 0)
+            self.huecos.clear()
+            self.al_cambiar(None)
+            self._programar()
+            return
+
+        secuencias = cambios["secuencias"]
+        nuevos = [seq for seq in secuencias if seq > self.ultimo or seq in self.huecos]
+        for seq in nuevos:
+            self.huecos.pop(seq, None)
+        ahora = time.monotonic()
+        if secuencias and secuencias[-1] > self.ultimo:
+            vistas = set(secuencias)
+            faltantes = (seq for seq in range(self.ultimo + 1, secuencias[-1]) if seq not in vistas)
+            for seq in itertools.islice(faltantes, self.limite):  # Un salto grande del contador no son huecos
+                self.huecos[seq] = ahora
+            self.ultimo = secuencias[-1]
+        self.huecos = {seq: desde for seq, desde in self.huecos.items() if ahora - desde < self.espera_huecos_s}
+
+        if nuevos:
+            self.al_cambiar(cambios)
+        self._programar()
+
+    def _programar(self):
+        if self.activo:
+            self._programada = self.root.after(self.intervalo_ms, self.revisar)
+
+
+# ------------------------------
+# Cliente del servicio local (servidor.py)
+# ------------------------------
+
+def a_json(valor):
+    """Prepara un valor para JSON sin perder lo que JSON no distingue (tuplas, Decimal,
+    fechas, claves no texto). ``desde_json`` lo reconstruye."""
+    if isinstance(valor, tuple):
+        return {"__tupla__": [a_json(v) for v in valor]}
+    if isinstance(valor, list):
+        return [a_json(v) for v in valor]
+    if isinstance(valor, dict):
+        if all(isinstance(clave, str) for clave in valor):
+            return {clave: a_json(v) for clave, v in valor.items()}
+        return {"__dict__": [[a_json(clave), a_json(v)] for clave, v in valor.items()]}
+    if isinstance(valor, Decimal):
+        return {"__decimal__": str(valor)}
+    if isinstance(valor, datetime):
+        return {"__fecha__": valor.isoformat()}
+    return valor
+
+
+def desde_json(objeto):
+    """``object_hook`` de json.loads para lo que produce ``a_json``"""
+    if "__tupla__" in objeto:
+        return tuple(objeto["__tupla__"])
+    if "__dict__" in objeto:
+        return {clave: valor for clave, valor in objeto["__dict__"]}
+    if "__decimal__" in objeto:
+        return Decimal(objeto["__decimal__"])
+    if "__fecha__" in objeto:
+        return datetime.fromisoformat(objeto["__fecha__"])
+    return objeto
+
+
+class ErrorServicio(Exception):
+    """Error que el servicio informa al ejecutar una operación (el equivalente a un error de la base)."""
+
+
+class ConexionServicio:
+    """Sustituye a ConexionBD cuando la aplicación trabaja a través de servidor.py.
+
+    Las terminales no abren conexiones a la base de datos ni necesitan sus
+    credenciales: el servicio mantiene un solo pool y una caché de lecturas
+    compartida. Cada hilo usa su propia conexión HTTP persistente. Las llamadas
+    se miden en ``metricas`` igual que las consultas de ConexionBD.
+    """
+
+    motor = "servicio"
+    Error = ErrorServicio
+    errores_de_conexion = (OSError, http.client.HTTPException)  # Servicio o base inalcanzables
+
+    def __init__(self, url, token=None, espera_maxima=30, metricas=None):
+        partes = urllib.parse.urlsplit(url)
+        self.identidad = f"servicio://{partes.hostname}:{partes.port or 80}{partes.path.rstrip('/')}"
+        self.host = partes.hostname
+        self.puerto = partes.port or 80
+        self.token = token
+        self.espera_maxima = espera_maxima
+        self.metricas = metricas or MetricasBD()
+        self._local = threading.local()
+        self._abiertas = []  # Conexiones HTTP de todos los hilos, para cerrarlas al salir
+        self._en_curso = 0
+        self._bloqueo = threading.Lock()
+
+    def acceso_datos(self):
+        return AccesoRemoto(self)
+
+    def servicio_inventario(self):
+        return ProxyServicio(self, "inventario", ServicioInventario.METODOS_REMOTOS)
+
+    def _conexion_http(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            inicio = time.perf_counter()
+            conn = http.client.HTTPConnection(self.host, self.puerto, timeout=self.espera_maxima)
+            conn.connect()
+            self.metricas.registrar_conexion(time.perf_counter() - inicio)
+            self._local.conn = conn
+            with self._bloqueo:
+                self._abiertas.append(conn)
+        return conn
+
+    def _descartar_http(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            conn.close()
+            with self._bloqueo:
+                if conn in self._abiertas:
+                    self._abiertas.remove(conn)
+
+    def _enviar(self, ruta, cuerpo):
+        cabeceras = {"Content-Type": "application/json"}
+        if self.token:
+            cabeceras["X-Token"] = self.token
+        for intento in range(2):
+            reutilizada = getattr(self._local, "conn", None) is not None
+            conn = self._conexion_http()
+            try:
+                conn.request("POST", f"/{ruta}", cuerpo, cabeceras)
+                respuesta = conn.getresponse()
+                return respuesta.status, respuesta.read()
+            except self.errores_de_conexion:
+                self._descartar_http()
+                # Solo se reintenta si falló una conexión reutilizada (el servicio la cerró
+                # por inactividad): una conexión nueva que falla no se reintenta, para no
+                # repetir una escritura que el servicio pudo haber recibido
+                if intento or not reutilizada:
+                    raise
+
+    def llamar(self, ruta, *args, **kwargs):
+        """Ejecuta ``objeto/metodo`` en el servicio y devuelve su resultado."""
+        cuerpo = json.dumps({"args": a_json(list(args)), "kwargs": a_json(kwargs)}, ensure_ascii=False).encode("utf-8")
+        with self._bloqueo:
+            self._en_curso += 1
+        inicio, error, filas = time.perf_counter(), None, 0
+        try:
+            estado, datos = self._enviar(ruta, cuerpo)
+            respuesta = json.loads(datos, object_hook=desde_json)
+            if estado == 200:
+                resultado = respuesta["resultado"]
+                filas = len(resultado) if isinstance(resultado, list) else 0
+                return resultado
+            tipo, mensaje = respuesta.get("tipo"), respuesta.get("error", f"Error {estado} del servicio")
+            if tipo == "StockInsuficiente":
+                error = StockInsuficiente(mensaje)
+            elif tipo == "ValueError":
+                error = ValueError(mensaje)
+            elif tipo == "SinConexion":
+                error = ConnectionError(mensaje)  # La base no responde: como si el servicio no estuviera
+            else:
+                error = ErrorServicio(mensaje)
+            raise error
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            with self._bloqueo:
+                self._en_curso -= 1
+            self.metricas.registrar_consulta(f"POST /{ruta}", time.perf_counter() - inicio, filas, error=error)
+
+    def estado_pool(self):
+        with self._bloqueo:
+            return {"tamano": len(self._abiertas), "en_uso": self._en_curso,
+                    "libres": len(self._abiertas) - self._en_curso}
+
+    def cerrar_pool(self):
+        with self._bloqueo:
+            abiertas, self._abiertas = self._abiertas, []
+        for conn in abiertas:
+            conn.close()
+
+
+class ProxyServicio:
+    """Objeto cuyos métodos (los de ``metodos``) se ejecutan en el servicio como ``objeto/metodo``."""
+
+    def __init__(self, conexion_servicio, objeto, metodos):
+        self.conexion_servicio = conexion_servicio
+        self._objeto = objeto
+        self._metodos = metodos
+
+    def __getattr__(self, nombre):
+        if nombre.startswith("_") or nombre not in self._metodos:
+            raise AttributeError(f"'{self._objeto}' no ofrece '{nombre}' a través del servicio")
+
+        def metodo(*args, **kwargs):
+            return self.conexion_servicio.llamar(f"{self._objeto}/{nombre}", *args, **kwargs)
+
+        metodo.__name__ = nombre
+        return metodo
+
+
+class AccesoRemoto(ProxyServicio):
+    """AccesoDatos a través del servicio: los recorridos completos se piden por páginas."""
+
+    COLUMNAS_PRODUCTOS = AccesoDatos.COLUMNAS_PRODUCTOS
+    COLUMNAS_CLIENTES = AccesoDatos.COLUMNAS_CLIENTES
+
+    def __init__(self, conexion_servicio):
+        super().__init__(conexion_servicio, "datos", AccesoDatos.METODOS_REMOTOS)
+
+    def _iterar(self, pagina, tamano_lote, filtro, **opciones):
+        ultimo = None
+        while True:
+            lote = pagina(despues_de=ultimo, limite=tamano_lote, filtro=filtro, **opciones)
+            if lote:
+                yield lote
+            if len(lote) < tamano_lote:
+                return
+            ultimo = lote[-1][0]
+
+    def iterar_productos(self, tamano_lote=1000, filtro=None):
+        # La exportación y el índice de búsqueda necesitan la descripcion completa
+        return self._iterar(self.pagina_productos, tamano_lote, filtro, completa=True)
+
+    def iterar_clientes(self, tamano_lote=1000, filtro=None):
+        return self._iterar(self.pagina_clientes, tamano_lote, filtro)
+
+
+# ------------------------------
+# Clase DiarioCambios (escritura diferida con diario local)
+# ------------------------------
+
+class DiarioCambios:
+    """Diario local (SQLite) de altas, ediciones, bajas y movimientos pendientes de enviar.
+
+    ``registrar`` guarda el cambio en disco y vuelve enseguida, aunque el servidor
+    esté lento o caído. ``vaciar`` (desde un hilo) agrupa los pendientes y los
+    aplica en una sola transacción en el servidor:
+
+    * Varias ediciones de la misma fila se envían como una; edición + baja, como baja.
+    * Los movimientos de stock se aplican como deltas (no tienen conflictos salvo
+      stock insuficiente).
+    * Un cambio en ``bloque`` (bajas o ediciones de varias filas a la vez) lleva los
+      ids y la versión de cada uno, y se aplica con una sentencia ``IN (...)`` por
+      tramo de ids: o todas sus filas o ninguna. Un recuento (``fijar``) lleva la
+      existencia final y se aplica con ServicioInventario.fijar_existencia.
+    * Una edición o baja lleva los valores que el usuario veía (``original``) y la
+      ``version`` de la fila (migraciones/008). Se aplica con ``WHERE version = %s``,
+      sin bloquear la fila; si otro usuario guardó antes, el cambio queda en
+      conflicto con los valores actuales del servidor en vez de pisar su trabajo.
+    * Cada cambio tiene un uuid que se guarda en ``cambios_aplicados`` en la misma
+      transacción: si la aplicación se cierra entre el commit en el servidor y el
+      borrado local, al reintentar se reconoce y no se aplica dos veces.
+    """
+
+    # tabla -> (clave primaria, columnas que se pueden escribir)
+    COLUMNAS = {
+        "productos": ("id_producto", ("nombre", "categoria", "precio", "cantidad", "descripcion", "umbral")),
+        "clientes": ("id_cliente", ("nombre", "apellido", "telefono", "correo_electronico", "usuario")),
+    }
+    OPERACIONES = ("insertar", "actualizar", "eliminar", "movimiento", "bloque")
+    MAX_POR_LOTE = 200
+    # Los uuids de cambios_aplicados solo hacen falta mientras una terminal pueda
+    # reenviar un cambio que ya llegó (se cerró antes de borrarlo de su diario)
+    RETENCION_APLICADOS_DIAS = 30
+    INTERVALO_PURGA_S = 3600
+    _proxima_purga = 0.0  # Por proceso: en servidor.py la comparten todas las terminales
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._bloqueo = threading.Lock()    # Una conexión compartida entre el hilo de Tk y el de envío
+        self._vaciando = threading.Lock()   # Nunca dos envíos a la vez
+        self._conn = sqlite3.connect(ruta, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = FULL")  # Un cambio registrado ya está en disco
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS cambios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            uuid TEXT NOT NULL,
+            tabla TEXT NOT NULL,
+            operacion TEXT NOT NULL,
+            clave INTEGER,
+            datos TEXT,
+            original TEXT,
+            estado TEXT NOT NULL DEFAULT 'pendiente',
+            motivo TEXT,
+            servidor TEXT,
+            creado TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )""")
+        # Diarios de versiones anteriores: valores del servidor en los conflictos
+        if "servidor" not in {fila[1] for fila in self._conn.execute("PRAGMA table_info(cambios)")}:
+            self._conn.execute("ALTER TABLE cambios ADD COLUMN servidor TEXT")
+
+    @staticmethod
+    def ruta_predeterminada(conexion_bd):
+        """Un diario por base de datos (según ``conexion_bd.identidad``): los cambios
+        pendientes de una base nunca se envían a otra."""
+        huella = hashlib.sha256(conexion_bd.identidad.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(os.path.expanduser("~"), f".almacen_diario_{huella}.db")
+
+    def registrar(self, tabla, operacion, clave=None, datos=None, original=None):
+        """Guarda un cambio en el diario."""
+        self.registrar_lote([(tabla, operacion, clave, datos, original)])
+
+    def registrar_lote(self, cambios):
+        """Guarda varios cambios (tabla, operacion, clave, datos, original) de una vez: o todos o ninguno."""
+        filas = []
+        for tabla, operacion, clave, datos, original in cambios:
+            if tabla not in self.COLUMNAS or operacion not in self.OPERACIONES:
+                raise ValueError(f"Cambio no válido: {operacion} en {tabla}")
+            if operacion == "movimiento" and tabla != "productos":
+                raise ValueError("Solo los productos tienen movimientos de stock")
+            filas.append((str(uuid.uuid4()), tabla, operacion, clave, json.dumps(datos, default=str),
+                          json.dumps(original, default=str) if original is not None else None))
+        with self._bloqueo:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("""
+                INSERT INTO cambios (uuid, tabla, operacion, clave, datos, original) VALUES (?, ?, ?, ?, ?, ?)
+                """, filas)
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def contar(self):
+        """(pendientes, en conflicto)"""
+        with self._bloqueo:
+            cuentas = dict(self._conn.execute("SELECT estado, COUNT(*) FROM cambios GROUP BY estado").fetchall())
+        return cuentas.get("pendiente", 0), cuentas.get("conflicto", 0)
+
+    def conflictos(self):
+        """(id, tabla, operacion, clave, datos, motivo, servidor); ``servidor`` son los valores
+        actuales de la fila (con su ``version``) o None si no se conocen."""
+        with self._bloqueo:
+            filas = self._conn.execute("""
+            SELECT id, tabla, operacion, clave, datos, motivo, servidor
+            FROM cambios WHERE estado = 'conflicto' ORDER BY id
+            """).fetchall()
+        return [(id_cambio, tabla, operacion, clave, json.loads(datos), motivo,
+                 json.loads(servidor) if servidor is not None else None)
+                for id_cambio, tabla, operacion, clave, datos, motivo, servidor in filas]
+
+    def descartar(self, id_cambio):
+        with self._bloqueo:
+            self._conn.execute("DELETE FROM cambios WHERE id = ?", (id_cambio,))
+
+    def forzar(self, id_cambio, actual=None):
+        """Vuelve a enviar un cambio en conflicto sobre los valores actuales del servidor.
+
+        Se aplica sobre los valores del servidor que se mostraron o, si el conflicto
+        no los trae (diarios anteriores), sobre ``actual``: la fila con su ``version``
+        leída del servidor al forzar. Si alguien más guarda mientras tanto, vuelve a
+        quedar en conflicto. Solo las altas y los movimientos se envían sin comparar.
+        """
+        with self._bloqueo:
+            fila = self._conn.execute("SELECT operacion, original, servidor FROM cambios WHERE id = ?",
+                                      (id_cambio,)).fetchone()
+            if fila and fila[0] == "bloque":
+                # Solo las filas en conflicto pasan a compararse con su valor del servidor
+                original = json.loads(fila[1]) if fila[1] else {}
+                for clave, valores in (json.loads(fila[2]) if fila[2] else {}).items():
+                    original[clave] = {c: v for c, v in valores.items() if c != "cantidad"}
+            else:
+                original = json.loads(fila[2]) if fila and fila[2] else actual
+                if original is not None:
+                    original = dict(original)
+                    original.pop("cantidad", None)  # La existencia se envía como delta: no se compara
+            self._conn.execute("""
+            UPDATE cambios SET estado = 'pendiente', original = ?, motivo = NULL, servidor = NULL WHERE id = ?
+            """, (json.dumps(original, default=str) if original is not None else None, id_cambio))
+
+    def _pendientes(self):
+        with self._bloqueo:
+            filas = self._conn.execute("""
+            SELECT id, uuid, tabla, operacion, clave, datos, original
+            FROM cambios WHERE estado = 'pendiente' ORDER BY id LIMIT ?
+            """, (self.MAX_POR_LOTE,)).fetchall()
+        return [(id_cambio, uuid_cambio, tabla, operacion, clave, json.loads(datos),
+                 json.loads(original) if original is not None else None)
+                for id_cambio, uuid_cambio, tabla, operacion, clave, datos, original in filas]
+
+    @staticmethod
+    def _agrupar(cambios):
+        """Junta los cambios sobre la misma fila, conservando el orden de llegada."""
+        grupos, por_fila = [], {}
+        for id_cambio, uuid_cambio, tabla, operacion, clave, datos, original in cambios:
+            llave = (tabla, operacion if operacion in ("insertar", "movimiento", "bloque") else "fila",
+                     id_cambio if operacion in ("insertar", "bloque") else clave)
+            grupo = por_fila.get(llave)
+            if grupo is None:
+                grupo = por_fila[llave] = {"ids": [], "uuids": [], "tabla": tabla, "operacion": operacion,
+                                           "clave": clave, "datos": {}, "original": original, "movimientos": []}
+                grupos.append(grupo)
+            elif grupo["operacion"] == "eliminar":
+                pass  # Lo que llegue después de una baja no tiene efecto
+            elif operacion == "eliminar":
+                grupo["operacion"] = "eliminar"
+            elif original is not None and grupo["original"] is not None:
+                # Para comparar vale lo que se vio la primera vez
+                grupo["original"] = {**original, **grupo["original"]}
+            grupo["ids"].append(id_cambio)
+            grupo["uuids"].append(uuid_cambio)
+            if operacion == "movimiento":
+                grupo["movimientos"].append(datos)
+            elif operacion != "eliminar":
+                grupo["datos"].update(datos)
+        return grupos
+
+    @staticmethod
+    def _iguales(a, b):
+        """Compara un valor del servidor con uno del diario (que vuelve como texto de JSON)."""
+        if a is None or b is None:
+            return a is None and b is None
+        try:
+            return Decimal(str(a)) == Decimal(str(b))  # 1.5 y 1.50 son el mismo precio
+        except InvalidOperation:
+            return str(a) == str(b)
+
+    @classmethod
+    def _aplicar(cls, cursor, conexion_bd, grupo):
+        """Aplica un grupo con el cursor de la transacción; devuelve el motivo si hay conflicto."""
+        tabla, operacion = grupo["tabla"], grupo["operacion"]
+        if operacion == "bloque":
+            return cls._aplicar_bloque(cursor, conexion_bd, grupo)
+        clave, columnas = cls.COLUMNAS[tabla]
+        datos = {c: v for c, v in grupo["datos"].items() if c in columnas}
+
+        if operacion == "insertar":
+            cursor.execute(f"INSERT INTO {tabla} ({', '.join(datos)}) VALUES ({', '.join(['%s'] * len(datos))})",
+                           tuple(datos.values()))
+            grupo["clave"] = cursor.lastrowid
+            return None
+
+        if operacion == "movimiento":
+            movimientos = [(grupo["clave"], m["tipo"], m["cantidad"], m.get("motivo"), m.get("usuario"))
+                           for m in grupo["movimientos"]]
+            try:
+                ServicioInventario(conexion_bd).aplicar(cursor, movimientos)
+            except StockInsuficiente as e:
+                return str(e)
+            return None
+
+        original = {c: v for c, v in (grupo["original"] or {}).items() if c in columnas}
+        version = (grupo["original"] or {}).get("version")
+        if version is not None:
+            return cls._aplicar_con_version(cursor, conexion_bd, grupo, datos, original, version)
+        if original:  # Cambios guardados en el diario antes de migraciones/008
+            bloqueo = " FOR UPDATE" if conexion_bd.motor == "mysql" else ""
+            cursor.execute(f"SELECT {', '.join(original)} FROM {tabla} WHERE {clave} = %s{bloqueo}", (grupo["clave"],))
+            actual = cursor.fetchone()
+            if actual is None:
+                return None if operacion == "eliminar" else "El registro ya no existe en el servidor."
+            # Es conflicto si otro cambió el valor a algo distinto de lo que queremos dejar
+            cambiados = [c for c, valor in zip(original, actual)
+                         if not cls._iguales(valor, original[c]) and not (c in datos and cls._iguales(valor, datos[c]))]
+            if cambiados:
+                return f"Otro usuario modificó {', '.join(cambiados)} en el servidor."
+
+        if operacion == "eliminar":
+            cursor.execute(f"DELETE FROM {tabla} WHERE {clave} = %s", (grupo["clave"],))
+        elif datos:
+            # También sin comparar: las terminales con la versión anterior tienen que chocar
+            asignaciones = ", ".join([f"{c} = %s" for c in datos] + ["version = version + 1"])
+            cursor.execute(f"UPDATE {tabla} SET {asignaciones} WHERE {clave} = %s", (*datos.values(), grupo["clave"]))
+        return None
+
+    @classmethod
+    def _aplicar_con_version(cls, cursor, conexion_bd, grupo, datos, original, version):
+        """Edición o baja condicionada a la versión que vio el usuario, sin bloquear la fila.
+
+        Si no se tocó ninguna fila, otro guardó antes: se lee la fila actual y, si lo
+        que cambió coincide con lo que este cambio quiere dejar, se reintenta sobre
+        la versión nueva. Si no, es conflicto y los valores del servidor quedan en
+        ``grupo["servidor"]`` para mostrarlos.
+        """
+        tabla, operacion = grupo["tabla"], grupo["operacion"]
+        clave, columnas = cls.COLUMNAS[tabla]
+        if operacion != "eliminar" and not datos:
+            return None
+        # La lectura de la fila en conflicto tiene que ver lo último confirmado, no la
+        # foto de la transacción (REPEATABLE READ); solo ocurre cuando hubo conflicto
+        lectura_actual = " LOCK IN SHARE MODE" if conexion_bd.motor == "mysql" else ""
+        for _ in range(2):
+            if operacion == "eliminar":
+                cursor.execute(f"DELETE FROM {tabla} WHERE {clave} = %s AND version = %s", (grupo["clave"], version))
+            else:
+                asignaciones = ", ".join([f"{c} = %s" for c in datos] + ["version = version + 1"])
+                cursor.execute(f"UPDATE {tabla} SET {asignaciones} WHERE {clave} = %s AND version = %s",
+                               (*datos.values(), grupo["clave"], version))
+            if cursor.rowcount:
+                return None
+
+            cursor.execute(f"SELECT version, {', '.join(columnas)} FROM {tabla} WHERE {clave} = %s{lectura_actual}",
+                           (grupo["clave"],))
+            actual = cursor.fetchone()
+            if actual is None:
+                return None if operacion == "eliminar" else "El registro ya no existe en el servidor."
+            servidor = dict(zip(("version",) + columnas, actual))
+            cambiados = [c for c in original if not cls._iguales(servidor[c], original[c])
+                         and not (c in datos and cls._iguales(servidor[c], datos[c]))]
+            if cambiados:
+                grupo["servidor"] = servidor
+                return f"Otro usuario modificó {', '.join(cambiados)} en el servidor."
+            version = servidor["version"]
+        grupo["servidor"] = servidor
+        return "Otro usuario modificó el registro mientras se guardaba."
+
+    @classmethod
+    def _aplicar_bloque(cls, cursor, conexion_bd, grupo):
+        """Baja o edición de varias filas (``datos["ids"]``) con una sentencia por tramo de ids.
+
+        Las filas se leen bloqueadas, por tramos y en orden de id. Cada una se compara
+        con su ``original`` con la regla de las ediciones sueltas: si cambió la versión
+        pero no lo que se compara, se acepta. Si alguna fila tiene conflicto no se
+        aplica ninguna y sus valores del servidor quedan en ``grupo["servidor"]``
+        ({clave: valores}). Las filas que ya no existen se saltan.
+        """
+        tabla, datos = grupo["tabla"], grupo["datos"]
+        clave, columnas = cls.COLUMNAS[tabla]
+        if datos["accion"] == "fijar":
+            # Existencia final de un recuento: la diferencia se calcula con la fila bloqueada
+            if tabla != "productos":
+                raise ValueError("Solo los productos tienen existencia")
+            try:
+                ServicioInventario(conexion_bd).fijar_existencia(cursor, datos["ids"], datos["cantidad"],
+                                                                 datos.get("motivo"), datos.get("usuario"))
+            except StockInsuficiente as e:
+                return str(e)
+            return None
+        valores = {c: v for c, v in datos.get("valores", {}).items() if c in columnas}
+        originales = grupo["original"] or {}
+        bloqueo = " FOR UPDATE" if conexion_bd.motor == "mysql" else ""
+        existentes, servidor = [], {}
+        for marcadores, tramo in tramos_in(sorted(int(i) for i in datos["ids"])):
+            cursor.execute(f"SELECT {clave}, version, {', '.join(columnas)} FROM {tabla} "
+                           f"WHERE {clave} IN ({marcadores}) ORDER BY {clave}{bloqueo}", tramo)
+            for fila in cursor.fetchall():
+                actual = dict(zip(("version",) + columnas, fila[1:]))
+                original = originales.get(str(fila[0]), {})
+                if original.get("version") != actual["version"] and any(
+                        not cls._iguales(actual[c], v) and not (c in valores and cls._iguales(actual[c], valores[c]))
+                        for c, v in original.items() if c in columnas):
+                    servidor[str(fila[0])] = actual
+                existentes.append(fila[0])
+        if servidor:
+            grupo["servidor"] = servidor
+            return f"Otro usuario modificó en el servidor los registros {', '.join(servidor)}."
+
+        if datos["accion"] == "eliminar":
+            sentencia, parametros = f"DELETE FROM {tabla} WHERE {clave} IN ({{ids}})", ()
+        elif valores:
+            asignaciones = ", ".join([f"{c} = %s" for c in valores] + ["version = version + 1"])
+            sentencia, parametros = f"UPDATE {tabla} SET {asignaciones} WHERE {clave} IN ({{ids}})", tuple(valores.values())
+        else:
+            return None
+        AccesoDatos(conexion_bd)._actualizar_en_bloque(sentencia, existentes, *parametros, cursor=cursor)
+        return None
+
+    @classmethod
+    def aplicar_grupos(cls, conexion_bd, grupos):
+        """Lado servidor de ``vaciar``: aplica los grupos en una transacción.
+
+        Devuelve (ids locales hechos, [(motivo, ids locales, valores del servidor)] en
+        conflicto, [(tabla, operacion, clave)] aplicados). También lo usa servidor.py.
+        Si la transacción cae en un interbloqueo se repite una vez. Como mucho una
+        vez por ``INTERVALO_PURGA_S`` se purgan los uuids aplicados antiguos.
+        """
+        resultado = conexion_bd.reintentar_interbloqueo(lambda: cls._aplicar_grupos(conexion_bd, grupos))
+        if time.monotonic() >= DiarioCambios._proxima_purga:
+            DiarioCambios._proxima_purga = time.monotonic() + cls.INTERVALO_PURGA_S
+            try:
+                cls.purgar_aplicados(conexion_bd)
+            except conexion_bd.Error as e:
+                print(f"No se pudieron purgar los cambios aplicados: {e}")  # Se reintenta en la próxima purga
+        return resultado
+
+    @classmethod
+    def purgar_aplicados(cls, conexion_bd, dias=None):
+        """Borra de ``cambios_aplicados`` los uuids de hace más de ``dias`` (por defecto
+        RETENCION_APLICADOS_DIAS). Devuelve cuántos se borraron."""
+        dias = cls.RETENCION_APLICADOS_DIAS if dias is None else int(dias)
+        if conexion_bd.motor == "mysql":
+            condicion = "aplicado < NOW() - INTERVAL %s DAY"
+        else:
+            condicion = "aplicado < datetime('now', '-' || %s || ' days')"  # CURRENT_TIMESTAMP de SQLite es UTC
+        with conexion_bd.transaccion() as cursor:
+            cursor.execute(f"DELETE FROM cambios_aplicados WHERE {condicion}", (dias,))
+            return cursor.rowcount
+
+    @classmethod
+    def _aplicar_grupos(cls, conexion_bd, grupos):
+        aplicados, hechos, conflictos = [], [], []
+        with conexion_bd.transaccion() as cursor:
+            uuids = [u for grupo in grupos for u in grupo["uuids"]]
+            cursor.execute(f"SELECT uuid FROM cambios_aplicados WHERE uuid IN ({', '.join(['%s'] * len(uuids))})",
+                           uuids)
+            ya_aplicados = {fila[0] for fila in cursor.fetchall()}
+            for grupo in grupos:
+                if ya_aplicados.issuperset(grupo["uuids"]):
+                    hechos.extend(grupo["ids"])  # Se aplicó antes de un corte: solo falta borrarlo
+                    continue
+                grupo.pop("servidor", None)  # De un intento anterior deshecho por un interbloqueo
+                try:
+                    motivo = cls._aplicar(cursor, conexion_bd, grupo)
+                except conexion_bd.errores_de_conexion:
+                    raise
+                except conexion_bd.Error as e:
+                    if getattr(e, "args", ())[:1] == (1213,):
+                        raise  # La transacción entera ya se deshizo: se repite desde el principio
+                    motivo = f"El servidor rechazó el cambio: {e}"
+                except (ValueError, TypeError, KeyError, ArithmeticError) as e:
+                    # Datos que no se pueden aplicar (p. ej. una cantidad que no es un número):
+                    # el cambio queda en conflicto en vez de trabar el envío de todo el diario
+                    motivo = f"Cambio no válido: {e!r}"
+                if motivo:
+                    conflictos.append((motivo, grupo["ids"], grupo.get("servidor")))
+                    continue
+                cursor.executemany("INSERT INTO cambios_aplicados (uuid) VALUES (%s)",
+                                   [(u,) for u in grupo["uuids"]])
+                hechos.extend(grupo["ids"])
+                if grupo["operacion"] == "bloque":
+                    operacion = "movimiento" if grupo["datos"]["accion"] == "fijar" else grupo["datos"]["accion"]
+                    aplicados.extend((grupo["tabla"], operacion, int(clave)) for clave in grupo["datos"]["ids"])
+                else:
+                    aplicados.append((grupo["tabla"], grupo["operacion"], grupo["clave"]))
+        return hechos, conflictos, aplicados
+
+    def vaciar(self, conexion_bd):
+        """Envía al servidor un lote de cambios pendientes en una transacción.
+
+        Devuelve la lista de cambios aplicados como (tabla, operacion, clave). Los
+        errores de conexión se propagan y los cambios siguen pendientes para el
+        siguiente intento; los conflictos quedan marcados en el diario.
+        """
+        with self._vaciando:
+            grupos = self._agrupar(self._pendientes())
+            if not grupos:
+                return []
+            if conexion_bd.motor == "servicio":
+                hechos, conflictos, aplicados = conexion_bd.llamar("diario/aplicar_grupos", grupos)
+            else:
+                hechos, conflictos, aplicados = self.aplicar_grupos(conexion_bd, grupos)
+
+            # El servidor ya confirmó: actualizar el diario local
+            with self._bloqueo:
+                self._conn.execute("BEGIN")
+                for motivo, ids, servidor in conflictos:
+                    servidor = json.dumps(servidor, default=str) if servidor is not None else None
+                    self._conn.executemany("UPDATE cambios SET estado = 'conflicto', motivo = ?, servidor = ? WHERE id = ?",
+                                           [(motivo, servidor, i) for i in ids])
+                self._conn.executemany("DELETE FROM cambios WHERE id = ?", [(i,) for i in hechos])
+                self._conn.execute("COMMIT")
+            return aplicados
+
+    def cerrar(self):
+        with self._bloqueo:
+            self._conn.close()
+
+
+class SincronizadorDiario:
+    """Envía el diario al servidor cada ``intervalo_ms`` o en cuanto se le avisa.
+
+    Como AlertasStock, el envío corre en ServicioBD y el siguiente se programa al
+    terminar el anterior. Sin conexión, la espera se duplica hasta
+    ``espera_maxima_ms``; los cambios pendientes de una sesión anterior se envían
+    en el primer intento. ``al_sincronizar(aplicados)`` se llama en el hilo de Tk.
+    """
+
+    def __init__(self, root, servicio_bd, diario, conexion_bd, al_sincronizar,
+                 intervalo_ms=5000, espera_maxima_ms=60000):
+        self.root = root
+        self.servicio_bd = servicio_bd
+        self.diario = diario
+        self.conexion_bd = conexion_bd
+        self.al_sincronizar = al_sincronizar
+        self.intervalo_ms = intervalo_ms
+        self.espera_maxima_ms = espera_maxima_ms
+        self.espera_ms = intervalo_ms
+        self.sin_conexion = False
+        self.activo = False
+        self._programado = None
+        self._enviando = False
+        self._repetir = False  # Llegó un aviso durante un envío
+
+    def iniciar(self):
+        if not self.activo:
+            self.activo = True
+            self.avisar()
+
+    def detener(self):
+        self.activo = False
+        if self._programado is not None:
+            self.root.after_cancel(self._programado)
+            self._programado = None
+
+    def avisar(self):
+        """Enviar ya (p. ej. después de registrar un cambio)."""
+        if not self.activo:
+            return
+        if self._enviando:
+            self._repetir = True
+            return
+        if self._programado is not None:
+            self.root.after_cancel(self._programado)
+            self._programado = None
+        self._enviando = True
+
+        def al_terminar(aplicados):
+            self._enviando = False
+            self.sin_conexion = False
+            self.espera_ms = self.intervalo_ms
+            self.al_sincronizar(aplicados)
+            # Un lote lleno indica que quedan más: seguir sin esperar
+            self._programar(0 if self._repetir or len(aplicados) >= DiarioCambios.MAX_POR_LOTE else self.espera_ms)
+
+        def al_fallar(error):
+            self._enviando = False
+            self.sin_conexion = True
+            print(f"No se pudo sincronizar el diario: {error}")
+            self.espera_ms = min(self.espera_ms * 2, self.espera_maxima_ms)
+            self.al_sincronizar([])
+            self._programar(self.espera_ms)
+
+        self.servicio_bd.ejecutar(lambda: self.diario.vaciar(self.conexion_bd), al_terminar, al_fallar=al_fallar)
+
+    def _programar(self, espera_ms):
+        self._repetir = False
+        if self.activo:
+            self._programado = self.root.after(espera_ms, self.avisar)
+
+
+# ------------------------------
+# Clase ImportadorProductos (carga masiva desde CSV)
+# ------------------------------
+
+class ImportadorProductos:
+    """Importa productos desde un archivo CSV por lotes.
+
+    El archivo se lee fila a fila, sin cargarlo completo en memoria. Cada fila se
+    valida y las válidas se insertan con ``executemany`` (un INSERT de varias filas
+    por lote), con un commit cada ``filas_por_transaccion`` filas. Opcionalmente se
+    usa ``LOAD DATA LOCAL INFILE`` si el servidor lo permite.
+
+    Columnas esperadas en la cabecera: nombre, categoria, precio, cantidad,
+    descripcion y, opcionalmente, id_producto.
+    """
+
+    COLUMNAS = ("nombre", "categoria", "precio", "cantidad", "descripcion")
+    PRECIO_MAXIMO = Decimal("99999999.99")  # Límite de decimal(10,2)
+    MAX_MOTIVOS = 20                         # Motivos de rechazo que se guardan en el resumen
+
+    def __init__(self, conexion_bd, tamano_lote=500, filas_por_transaccion=5000,
+                 actualizar_existentes=False, usar_load_data=False):
+        self.conexion_bd = conexion_bd
+        self.tamano_lote = tamano_lote
+        self.filas_por_transaccion = filas_por_transaccion
+        self.actualizar_existentes = actualizar_existentes
+        self.usar_load_data = usar_load_data
+
+    @classmethod
+    def validar(cls, fila):
+        """Convierte una fila del CSV a (id, nombre, categoria, precio, cantidad, descripcion).
+
+        Lanza ValueError con el motivo si la fila no es válida. Los formularios de
+        producto del Dashboard usan las mismas reglas.
+        """
+        texto = {columna: (fila.get(columna) or "").strip() for columna in cls.COLUMNAS + ("id_producto",)}
+        for columna in ("nombre", "categoria"):
+            if not texto[columna]:
+                raise ValueError(f"{columna} vacío")
+            if len(texto[columna]) > 255:
+                raise ValueError(f"{columna} supera 255 caracteres")
+
+        precio = texto["precio"]
+        if "," in precio and "." not in precio:
+            precio = precio.replace(",", ".")  # Separador decimal con coma
+        try:
+            precio = Decimal(precio)
+        except InvalidOperation:
+            raise ValueError(f"precio no numérico: {texto['precio']!r}")
+        if not precio.is_finite() or precio < 0 or precio > cls.PRECIO_MAXIMO:
+            raise ValueError(f"precio fuera de rango: {texto['precio']!r}")
+        if precio != precio.quantize(Decimal("0.01")):
+            raise ValueError(f"precio con más de 2 decimales: {texto['precio']!r}")
+
+        try:
+            cantidad = int(texto["cantidad"])
+        except ValueError:
+            raise ValueError(f"cantidad no entera: {texto['cantidad']!r}")
+        if cantidad < 0:
+            raise ValueError(f"cantidad negativa: {cantidad}")
+
+        id_producto = None
+        if texto["id_producto"]:
+            try:
+                id_producto = int(texto["id_producto"])
+            except ValueError:
+                raise ValueError(f"id_producto no entero: {texto['id_producto']!r}")
+
+        return (id_producto, texto["nombre"], texto["categoria"], precio, cantidad, texto["descripcion"])
+
+    def _leer(self, archivo):
+        """Generador de (número de línea, fila original, fila validada o None, motivo)."""
+        muestra = archivo.read(4096)
+        archivo.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+        except csv.Error:
+            dialecto = csv.excel
+        lector = csv.DictReader(archivo, dialect=dialecto)
+        faltantes = [c for c in self.COLUMNAS if c not in (lector.fieldnames or [])]
+        if faltantes:
+            raise ValueError(f"Faltan columnas en la cabecera: {', '.join(faltantes)}")
+        for fila in lector:
+            try:
+                yield lector.line_num, fila, self.validar(fila), None
+            except ValueError as e:
+                yield lector.line_num, fila, None, str(e)
+
+    def _sql_insertar(self, con_id):
+        columnas = ("id_producto",) + self.COLUMNAS if con_id else self.COLUMNAS
+        valores = ", ".join(["%s"] * len(columnas))
+        if self.conexion_bd.motor == "sqlite":
+            if con_id and self.actualizar_existentes:
+                actualizar = ", ".join([f"{c} = excluded.{c}" for c in self.COLUMNAS] + ["version = version + 1"])
+                return (f"INSERT INTO productos ({', '.join(columnas)}) VALUES ({valores}) "
+                        f"ON CONFLICT (id_producto) DO UPDATE SET {actualizar}")
+            ignorar = "OR IGNORE " if con_id else ""
+            return f"INSERT {ignorar}INTO productos ({', '.join(columnas)}) VALUES ({valores})"
+        if con_id and self.actualizar_existentes:
+            return (f"INSERT INTO productos ({', '.join(columnas)}) VALUES ({valores}) "
+                    f"ON DUPLICATE KEY UPDATE {self._actualizar_mysql()}")
+        # Sin actualizar, los ids que ya existen se omiten en lugar de abortar el lote
+        ignorar = "IGNORE " if con_id else ""
+        return f"INSERT {ignorar}INTO productos ({', '.join(columnas)}) VALUES ({valores})"
+
+    def _actualizar_mysql(self):
+        # La fila se actualiza en su lugar: conserva umbral y sube la versión (migraciones/008)
+        return ", ".join([f"{c} = VALUES({c})" for c in self.COLUMNAS] + ["version = version + 1"])
+
+    def importar(self, ruta, al_progresar=None, cancelar=None, ruta_rechazados=None):
+        """Importa el archivo y devuelve un resumen con filas procesadas, importadas y rechazadas.
+
+        ``al_progresar(procesadas, importadas, rechazadas, fraccion)`` se llama tras cada
+        lote (desde el hilo que importa); ``cancelar`` es un threading.Event opcional.
+        Las filas rechazadas se escriben en ``ruta_rechazados`` con el motivo.
+        """
+        if self.usar_load_data and self.conexion_bd.motor == "mysql":
+            try:
+                return self._importar_load_data(ruta, al_progresar, cancelar, ruta_rechazados)
+            except self.conexion_bd.Error as e:
+                print(f"LOAD DATA LOCAL INFILE no disponible ({e}); se importa por lotes.")
+        return self._importar_por_lotes(ruta, al_progresar, cancelar, ruta_rechazados)
+
+    def _recorrer(self, ruta, al_progresar, cancelar, ruta_rechazados, resumen):
+        """Lee y valida el archivo, registra los rechazos y entrega las filas válidas en lotes."""
+        tamano = max(os.path.getsize(ruta), 1)
+        rechazos = open(ruta_rechazados, "w", newline="", encoding="utf-8") if ruta_rechazados else None
+        escritor = None
+        try:
+            with open(ruta, newline="", encoding="utf-8-sig") as archivo:
+                lote = []
+                for linea, original, fila, motivo in self._leer(archivo):
+                    resumen["procesadas"] += 1
+                    if fila is None:
+                        resumen["rechazadas"] += 1
+                        if len(resumen["motivos"]) < self.MAX_MOTIVOS:
+                            resumen["motivos"].append(f"Línea {linea}: {motivo}")
+                        if rechazos:
+                            if escritor is None:
+                                escritor = csv.DictWriter(rechazos, fieldnames=list(original) + ["motivo"],
+                                                          extrasaction="ignore")
+                                escritor.writeheader()
+                            escritor.writerow({**original, "motivo": motivo})
+                        continue
+                    lote.append(fila)
+                    if len(lote) >= self.tamano_lote:
+                        yield lote
+                        lote = []
+                        if al_progresar:
+                            al_progresar(resumen["procesadas"], resumen["importadas"], resumen["rechazadas"],
+                                         archivo.buffer.tell() / tamano)
+                        if cancelar is not None and cancelar.is_set():
+                            resumen["cancelada"] = True
+                            return
+                if lote:
+                    yield lote
+        finally:
+            if rechazos:
+                rechazos.close()
+
+    def _nuevo_resumen(self):
+        return {"procesadas": 0, "importadas": 0, "rechazadas": 0, "motivos": [], "cancelada": False}
+
+    def _importar_por_lotes(self, ruta, al_progresar, cancelar, ruta_rechazados):
+        resumen = self._nuevo_resumen()
+        pendientes = 0
+        with self.conexion_bd.conexion() as conn:
+            cursor = conn.cursor()
+            try:
+                conn.begin()
+                for lote in self._recorrer(ruta, al_progresar, cancelar, ruta_rechazados, resumen):
+                    con_id = [fila for fila in lote if fila[0] is not None]
+                    sin_id = [fila[1:] for fila in lote if fila[0] is None]
+                    for filas, sql in ((con_id, self._sql_insertar(True)), (sin_id, self._sql_insertar(False))):
+                        if filas:
+                            cursor.executemany(sql, filas)
+                            # Con ON DUPLICATE KEY UPDATE una fila actualizada cuenta 2; IGNORE cuenta 0
+                            resumen["importadas"] += min(cursor.rowcount, len(filas)) if cursor.rowcount >= 0 else len(filas)
+                    pendientes += len(lote)
+                    if pendientes >= self.filas_por_transaccion:
+                        conn.commit()
+                        conn.begin()
+                        pendientes = 0
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        if al_progresar:
+            al_progresar(resumen["procesadas"], resumen["importadas"], resumen["rechazadas"], 1.0)
+        return resumen
+
+    def _importar_load_data(self, ruta, al_progresar, cancelar, ruta_rechazados):
+        resumen = self._nuevo_resumen()
+        # Las filas válidas se normalizan a un CSV temporal que el servidor carga de una vez
+        temporal = tempfile.NamedTemporaryFile("w", suffix=".csv", newline="", encoding="utf-8", delete=False)
+        try:
+            with temporal:
+                escritor = csv.writer(temporal, lineterminator="\n")
+                for lote in self._recorrer(ruta, al_progresar, cancelar, ruta_rechazados, resumen):
+                    escritor.writerows(["" if fila[0] is None else fila[0], *fila[1:]] for fila in lote)
+            if resumen["cancelada"]:
+                return resumen
+
+            # Para actualizar existentes se carga a una tabla de paso y se combina con
+            # ON DUPLICATE KEY UPDATE: REPLACE borraría y volvería a crear las filas,
+            # perdiendo su umbral y volviendo su versión a 0
+            destino = "importacion_productos" if self.actualizar_existentes else "productos"
+            with self.conexion_bd.conexion_directa(local_infile=True) as conn:
+                cursor = conn.cursor()
+                try:
+                    if self.actualizar_existentes:
+                        cursor.execute("""
+                        CREATE TEMPORARY TABLE importacion_productos (
+                          fila int NOT NULL AUTO_INCREMENT PRIMARY KEY,
+                          id_producto int NULL,
+                          nombre varchar(255) NOT NULL,
+                          categoria varchar(255) NOT NULL,
+                          precio decimal(10,2) NOT NULL,
+                          cantidad int NOT NULL,
+                          descripcion text
+                        ) DEFAULT CHARSET=utf8mb4
+                        """)
+                    conn.begin()
+                    cursor.execute(f"""
+                    LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE {destino} CHARACTER SET utf8mb4
+                    FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+                    LINES TERMINATED BY '\\n'
+                    (@id_producto, nombre, categoria, precio, cantidad, descripcion)
+                    SET id_producto = NULLIF(@id_producto, '')
+                    """, (temporal.name,))
+                    resumen["importadas"] = cursor.rowcount
+                    if self.actualizar_existentes:
+                        columnas = ", ".join(("id_producto",) + self.COLUMNAS)
+                        cursor.execute(f"""
+                        INSERT INTO productos ({columnas})
+                        SELECT {columnas} FROM importacion_productos ORDER BY fila
+                        ON DUPLICATE KEY UPDATE {self._actualizar_mysql()}
+                        """)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+        finally:
+            os.remove(temporal.name)
+        if al_progresar:
+            al_progresar(resumen["procesadas"], resumen["importadas"], resumen["rechazadas"], 1.0)
+        return resumen
+
+
+# ------------------------------
+# Clase ExportadorDatos (exportación a CSV y JSON Lines)
+# ------------------------------
+
+class ExportadorDatos:
+    """Exporta productos o clientes a CSV o JSON Lines.
+
+    Las filas llegan de la base de datos en lotes (cursor sin buffer) y se escriben
+    al disco a medida que llegan, así que la memoria no crece con el tamaño de la
+    tabla. Se escribe en un archivo temporal que reemplaza al destino al terminar.
+    """
+
+    FORMATOS = ("csv", "jsonl")
+
+    def __init__(self, datos, tamano_lote=1000):
+        self.datos = datos
+        self.tamano_lote = tamano_lote
+
+    def _origen(self, tabla, filtro, ids):
+        if tabla == "productos":
+            columnas, iterar, por_id = (self.datos.COLUMNAS_PRODUCTOS, self.datos.iterar_productos,
+                                        self.datos.productos_por_id)
+        elif tabla == "clientes":
+            columnas, iterar, por_id = self.datos.COLUMNAS_CLIENTES, self.datos.iterar_clientes, self.datos.clientes_por_id
+        else:
+            raise ValueError(f"Tabla no exportable: {tabla}")
+        if ids is None:
+            return columnas, iterar(self.tamano_lote, filtro)
+        return columnas, self._lotes_por_id(por_id, columnas, list(ids), filtro)
+
+    def _lotes_por_id(self, por_id, columnas, ids, filtro):
+        """Las filas completas de ``ids``, en ese orden, leídas por lotes y con ``filtro`` aplicado."""
+        posiciones = {columna: i for i, columna in enumerate(columnas.split(", "))}
+        condiciones = [(posiciones[columna], valor) for columna, valor in (filtro or {}).items()]
+        for inicio in range(0, len(ids), self.tamano_lote):
+            tramo = ids[inicio:inicio + self.tamano_lote]
+            filas = {fila[0]: fila for fila in por_id(tramo)}  # La clave es la primera columna
+            yield [filas[i] for i in tramo
+                   if i in filas and all(filas[i][posicion] == valor for posicion, valor in condiciones)]
+
+    def exportar(self, tabla, ruta, formato=None, filtro=None, al_progresar=None, cancelar=None, ids=None):
+        """Escribe ``tabla`` en ``ruta`` y devuelve el número de filas exportadas.
+
+        Si no se indica ``formato`` se deduce de la extensión (.csv o .jsonl).
+        ``filtro`` es ``{columna: valor}``; con ``ids`` se exportan solo esas filas
+        y en ese orden (p. ej. el resultado de una búsqueda).
+        ``al_progresar(filas)`` se llama después de cada lote.
+        """
+        formato = formato or os.path.splitext(ruta)[1].lstrip(".").lower()
+        if formato not in self.FORMATOS:
+            raise ValueError(f"Formato no soportado: {formato}")
+
+        columnas, lotes = self._origen(tabla, filtro, ids)
+        columnas = columnas.split(", ")
+        temporal = ruta + ".parcial"
+        filas, cancelado = 0, False
+        try:
+            with open(temporal, "w", newline="", encoding="utf-8") as archivo:
+                escritor = csv.writer(archivo) if formato == "csv" else None
+                if escritor:
+                    escritor.writerow(columnas)
+                for lote in lotes:
+                    if escritor:
+                        escritor.writerows(lote)
+                    else:
+                        archivo.writelines(json.dumps(dict(zip(columnas, fila)), ensure_ascii=False, default=str) + "\n"
+                                           for fila in lote)
+                    filas += len(lote)
+                    if al_progresar:
+                        al_progresar(filas)
+                    if cancelar is not None and cancelar.is_set():
+                        lotes.close()  # Devuelve la conexión al pool
+                        cancelado = True
+                        break
+            # Se borra con el archivo ya cerrado: en Windows no se puede borrar uno abierto
+            if cancelado:
+                os.remove(temporal)
+                return filas
+            os.replace(temporal, ruta)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        return filas
+
+
+# ------------------------------
+# Modelos Producto y Cliente (filas con tipos, compartidas por id)
+# ------------------------------
+
+class Modelo:
+    """Una fila de la base de datos con un atributo por columna.
+
+    Las subclases declaran ``CAMPOS`` (en el orden de AccesoDatos.COLUMNAS_*) como
+    ``__slots__``: sin ``__dict__`` por instancia, cada fila ocupa lo que una tupla
+    y los tipos se convierten una sola vez, al cargarla. Son inmutables por
+    convención; un cambio crea otra instancia con ``reemplazar``.
+    """
+
+    __slots__ = ("__weakref__",)  # Para el WeakValueDictionary de Catalogo
+    CAMPOS = ()
+    TIPOS = {}  # campo -> tipo; se convierte solo si el valor no llega ya con ese tipo
+
+    def __init__(self, *valores):
+        if len(valores) != len(self.CAMPOS):
+            raise ValueError(f"{type(self).__name__} espera {len(self.CAMPOS)} valores, no {len(valores)}")
+        for campo, valor in zip(self.CAMPOS, valores):
+            tipo = self.TIPOS.get(campo)
+            if tipo is not None and valor is not None and not isinstance(valor, tipo):
+                valor = tipo(str(valor))  # Por texto: Decimal(0.1) arrastraría el error del float
+            object.__setattr__(self, campo, valor)
+
+    @classmethod
+    def desde_fila(cls, fila):
+        """Modelo a partir de una fila de AccesoDatos, o el mismo modelo si ya lo es."""
+        return fila if isinstance(fila, cls) else cls(*fila)
+
+    @property
+    def clave(self):
+        return getattr(self, self.CAMPOS[0])
+
+    def valores(self):
+        """Los valores en el orden de las columnas (para el Treeview o para comparar).
+
+        El Treeview ignora los que sobran respecto de sus columnas, como ``version``.
+        """
+        return tuple(getattr(self, campo) for campo in self.CAMPOS)
+
+    def reemplazar(self, **cambios):
+        return type(self)(*(cambios[campo] if campo in cambios else getattr(self, campo) for campo in self.CAMPOS))
+
+    def __setattr__(self, campo, valor):
+        raise AttributeError(f"{type(self).__name__} es inmutable; use reemplazar()")
+
+    def __eq__(self, otro):
+        return otro is self or (type(otro) is type(self) and otro.valores() == self.valores())
+
+    def __hash__(self):
+        return hash(self.valores())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{c}={getattr(self, c)!r}' for c in self.CAMPOS)})"
+
+
+class Producto(Modelo):
+    """Producto de las listas: de la descripcion (TEXT) guarda solo el comienzo, en ``resumen``.
+
+    La descripcion completa se pide aparte (AccesoDatos.descripciones_productos).
+    """
+
+    __slots__ = CAMPOS = ("id_producto", "nombre", "categoria", "precio", "cantidad", "resumen", "version")
+    TIPOS = {"id_producto": int, "precio": Decimal, "cantidad": int, "version": int}
+
+    @classmethod
+    def desde_fila(cls, fila):
+        """Una fila completa o de lista da el mismo resumen, así el catálogo las reconoce iguales."""
+        if isinstance(fila, cls):
+            return fila
+        *valores, descripcion, version = fila
+        if descripcion and len(descripcion) > AccesoDatos.LARGO_RESUMEN:
+            descripcion = descripcion[:AccesoDatos.LARGO_RESUMEN] + "…"
+        return cls(*valores, descripcion, version)
+
+
+class Cliente(Modelo):
+    __slots__ = CAMPOS = ("id_cliente", "nombre", "apellido", "telefono", "correo_electronico", "usuario", "version")
+    TIPOS = {"id_cliente": int, "version": int}
+
+
+class Catalogo:
+    """Los modelos de una tabla por id, compartidos por las listas, la búsqueda y los formularios.
+
+    Una fila igual a la que ya está devuelve la misma instancia, así que la lista
+    y el índice de búsqueda comparten los objetos. Las referencias son débiles: un
+    modelo sigue en el catálogo mientras algo lo muestre, y las páginas que la
+    lista descarta no se acumulan.
+    """
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self._por_id = weakref.WeakValueDictionary()
+        self._bloqueo = threading.Lock()  # Se carga desde los hilos de ServicioBD
+
+    def __len__(self):
+        return len(self._por_id)
+
+    def cargar(self, fila):
+        """El modelo de esa fila, reemplazando en el catálogo la versión anterior si cambió."""
+        nuevo = self.modelo.desde_fila(fila)
+        with self._bloqueo:
+            actual = self._por_id.get(nuevo.clave)
+            if actual is not None and actual == nuevo:
+                return actual
+            self._por_id[nuevo.clave] = nuevo
+            return nuevo
+
+    def cargar_filas(self, filas):
+        return [self.cargar(fila) for fila in filas]
+
+    def obtener(self, clave):
+        """Última versión conocida del modelo con ese id, o None si nadie lo tiene cargado."""
+        return self._por_id.get(int(clave))
+
+    def quitar(self, clave):
+        with self._bloqueo:
+            self._por_id.pop(int(clave), None)
+
+
+class CacheLRU:
+    """Diccionario acotado: al pasar de ``capacidad`` descarta lo que se usó hace más tiempo."""
+
+    def __init__(self, capacidad=500):
+        self.capacidad = capacidad
+        self._valores = OrderedDict()
+
+    def __contains__(self, clave):
+        return clave in self._valores
+
+    def __len__(self):
+        return len(self._valores)
+
+    def get(self, clave, defecto=None):
+        if clave not in self._valores:
+            return defecto
+        self._valores.move_to_end(clave)
+        return self._valores[clave]
+
+    def __setitem__(self, clave, valor):
+        self._valores[clave] = valor
+        self._valores.move_to_end(clave)
+        while len(self._valores) > self.capacidad:
+            self._valores.popitem(last=False)
+
+    def descartar(self, clave):
+        self._valores.pop(clave, None)
+
+    def limpiar(self):
+        self._valores.clear()
+
+
+# ------------------------------
+# Clase IndiceBusqueda (búsqueda local mientras se escribe)
+# ------------------------------
+
+def normalizar_texto(texto):
+    """Minúsculas y sin acentos: 'Bocína' -> 'bocina'."""
+    descompuesto = unicodedata.normalize("NFKD", str(texto))
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+
+def separar_palabras(texto):
+    return re.findall(r"\w+", normalizar_texto(texto))
+
+
+class IndiceBusqueda:
+    """Índice invertido en memoria con búsqueda por prefijo.
+
+    Indexa las palabras (sin acentos) de las columnas de texto de cada fila,
+    descripcion completa incluida, y guarda el modelo del catálogo para mostrarlo
+    sin volver a la base de datos. Una consulta devuelve los productos en los que
+    cada palabra buscada es prefijo de alguna palabra indexada. Se construye una
+    vez y se actualiza con ``agregar``/``eliminar``.
+    """
+
+    def __init__(self, catalogo=None, columnas_texto=(1, 2, 5)):
+        self.catalogo = catalogo if catalogo is not None else Catalogo(Producto)
+        self.columnas_texto = columnas_texto  # Posiciones de nombre, categoria y descripcion
+        self.modelos = {}                     # id -> modelo (el mismo objeto que usa la lista)
+        self._palabras_de = {}                # id -> palabras indexadas de esa fila
+        self._ids_por_palabra = {}            # palabra -> set de ids
+        self._vocabulario = []                # Palabras ordenadas, para buscar prefijos con bisect
+        self._ultima = None                   # (palabras, ids) de la última búsqueda
+        self.listo = False                    # True cuando terminó la construcción inicial
+
+    def __len__(self):
+        return len(self.modelos)
+
+    def construir(self, lotes):
+        """Indexa todas las filas que entrega el generador de lotes (puede correr en un hilo)."""
+        for lote in lotes:
+            for fila in lote:
+                self.agregar(fila)
+        self.listo = True
+
+    def agregar(self, fila):
+        """Indexa una fila completa (AccesoDatos.COLUMNAS_PRODUCTOS) nueva o reemplaza la versión anterior."""
+        modelo = self.catalogo.cargar(fila)
+        id_fila = modelo.clave
+        if id_fila in self.modelos:
+            self.eliminar(id_fila)
+        palabras = set()
+        for posicion in self.columnas_texto:
+            if fila[posicion]:
+                palabras.update(separar_palabras(fila[posicion]))
+        self.modelos[id_fila] = modelo
+        self._palabras_de[id_fila] = palabras
+        for palabra in palabras:
+            ids = self._ids_por_palabra.get(palabra)
+            if ids is None:
+                ids = self._ids_por_palabra[palabra] = set()
+                bisect.insort(self._vocabulario, palabra)
+            ids.add(id_fila)
+        self._ultima = None
+
+    def eliminar(self, id_fila):
+        self.modelos.pop(id_fila, None)
+        for palabra in self._palabras_de.pop(id_fila, ()):
+            ids = self._ids_por_palabra[palabra]
+            ids.discard(id_fila)
+            if not ids:
+                del self._ids_por_palabra[palabra]
+                del self._vocabulario[bisect.bisect_left(self._vocabulario, palabra)]
+        self._ultima = None
+
+    def _ids_con_prefijo(self, prefijo):
+        inicio = bisect.bisect_left(self._vocabulario, prefijo)
+        ids = set()
+        for palabra in itertools.islice(self._vocabulario, inicio, None):
+            if not palabra.startswith(prefijo):
+                break
+            ids.update(self._ids_por_palabra[palabra])
+        return ids
+
+    def buscar(self, consulta, limite=500):
+        """Modelos (ordenados por id) que contienen todas las palabras buscadas como prefijo."""
+        palabras = tuple(separar_palabras(consulta))
+        if not palabras:
+            return []
+
+        anterior = self._ultima
+        if anterior and len(anterior[0]) == len(palabras) and palabras[:-1] == anterior[0][:-1] \
+                and palabras[-1].startswith(anterior[0][-1]):
+            # Se siguió escribiendo la última palabra: basta con filtrar el resultado anterior
+            ultima = palabras[-1]
+            ids = {i for i in anterior[1] if any(p.startswith(ultima) for p in self._palabras_de[i])}
+        else:
+            ids = None
+            # Empezar por los prefijos más largos, que suelen ser los más selectivos
+            for palabra in sorted(palabras, key=len, reverse=True):
+                coincidencias = self._ids_con_prefijo(palabra)
+                ids = coincidencias if ids is None else ids & coincidencias
+                if not ids:
+                    break
+        self._ultima = (palabras, ids)
+        return [self.modelos[i] for i in heapq.nsmallest(limite, ids)]
+
+
+# ------------------------------
+# Clase ServicioBD (trabajo de base de datos fuera del hilo de Tk)
+# ------------------------------
+
+class ServicioBD:
+    """Ejecuta funciones bloqueantes en un pool de hilos y entrega el resultado
+    en el hilo de Tk, programando los callbacks con ``root.after``.
+
+    - ``clave``: una nueva solicitud con la misma clave deja obsoleta a la anterior
+      (se cancela si aún no empezó y su resultado se descarta si ya estaba en curso).
+    - ``ventana``: limita las consultas simultáneas por ventana y controla su
+      indicador de carga.
+    - ``accion``: nombre con el que MetricasBD agrupa las consultas de la tarea;
+      por omisión, la función que llamó a ``ejecutar``.
+    """
+
+    def __init__(self, root, max_hilos=4, max_por_ventana=2, intervalo_ms=30):
+        self.root = root
+        self.max_por_ventana = max_por_ventana
+        self.intervalo_ms = intervalo_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix="bd")
+        self._terminadas = queue.Queue()  # Resultados que los hilos dejan para el hilo de Tk
+        self._avisos = queue.Queue()      # Avisos de progreso de tareas en curso
+        self._vigentes = {}               # clave -> solicitud vigente
+        self._en_curso = {}               # ventana -> nº de solicitudes enviadas al pool
+        self._en_espera = {}              # ventana -> deque de solicitudes por encima del límite
+        self._indicadores = {}            # ventana -> Label del indicador de carga
+        self._sondeando = False
+
+    def registrar_indicador(self, ventana, label):
+        """Asocia a la ventana un Label que muestra 'Cargando...' mientras haya consultas."""
+        self._indicadores[ventana] = label
+        self._actualizar_indicador(ventana)
+
+    def ejecutar(self, funcion, al_terminar=None, al_fallar=None, clave=None, ventana=None,
+                 mensaje_error="Hubo un problema al comunicarse con la base de datos.", accion=None):
+        """Encola ``funcion()`` y llama a ``al_terminar(resultado)`` en el hilo de Tk."""
+        if accion is None:
+            codigo = sys._getframe(1).f_code
+            accion = getattr(codigo, "co_qualname", codigo.co_name).replace("<locals>.", "")
+        solicitud = {
+            "funcion": funcion, "al_terminar": al_terminar, "al_fallar": al_fallar,
+            "clave": clave, "ventana": ventana, "mensaje_error": mensaje_error,
+            "accion": accion, "futuro": None, "obsoleta": False,
+        }
+        if clave is not None:
+            anterior = self._vigentes.get(clave)
+            if anterior is not None:
+                self._descartar(anterior)
+            self._vigentes[clave] = solicitud
+
+        if ventana is not None and self._en_curso.get(ventana, 0) >= self.max_por_ventana:
+            self._en_espera.setdefault(ventana, deque()).append(solicitud)
+        else:
+            self._enviar(solicitud)
+        self._actualizar_indicador(ventana)
+        return solicitud
+
+    def notificar(self, funcion, *args):
+        """Desde un hilo del pool: programa ``funcion(*args)`` en el hilo de Tk (p. ej. progreso)."""
+        self._avisos.put((funcion, args))
+
+    def cancelar(self, clave):
+        """Descarta la solicitud vigente con esa clave, si la hay."""
+        solicitud = self._vigentes.pop(clave, None)
+        if solicitud is not None:
+            self._descartar(solicitud)
+
+    def _descartar(self, solicitud):
+        solicitud["obsoleta"] = True
+        ventana = solicitud["ventana"]
+        espera = self._en_espera.get(ventana)
+        if espera and solicitud in espera:
+            espera.remove(solicitud)
+        elif solicitud["futuro"] is not None and solicitud["futuro"].cancel():
+            # Cancelada antes de empezar: su resultado nunca llegará a la cola
+            self._liberar(ventana)
+        self._actualizar_indicador(ventana)
+
+    def _enviar(self, solicitud):
+        ventana = solicitud["ventana"]
+        self._en_curso[ventana] = self._en_curso.get(ventana, 0) + 1
+        solicitud["futuro"] = self._executor.submit(self._trabajar, solicitud)
+        if not self._sondeando:
+            self._sondeando = True
+            self.root.after(self.intervalo_ms, self._procesar_terminadas)
+
+    def _trabajar(self, solicitud):
+        # Corre en un hilo del pool: nunca toca widgets
+        try:
+            with accion_ui(solicitud["accion"]):
+                resultado = solicitud["funcion"]()
+            self._terminadas.put((solicitud, True, resultado))
+        except Exception as e:
+            self._terminadas.put((solicitud, False, e))
+
+    def _liberar(self, ventana):
+        self._en_curso[ventana] = max(self._en_curso.get(ventana, 0) - 1, 0)
+        espera = self._en_espera.get(ventana)
+        while espera and self._en_curso[ventana] < self.max_por_ventana:
+            self._enviar(espera.popleft())
+        self._actualizar_indicador(ventana)
+
+    def _procesar_terminadas(self):
+        while True:
+            try:
+                funcion, args = self._avisos.get_nowait()
+            except queue.Empty:
+                break
+            self._llamar(funcion, *args)
+
+        while True:
+            try:
+                solicitud, exito, resultado = self._terminadas.get_nowait()
+            except queue.Empty:
+                break
+            self._liberar(solicitud["ventana"])
+            if solicitud["obsoleta"]:
+                continue
+            if self._vigentes.get(solicitud["clave"]) is solicitud:
+                del self._vigentes[solicitud["clave"]]
+            ventana = solicitud["ventana"]
+            if ventana is not None and not ventana.winfo_exists():
+                continue  # La ventana se cerró mientras la consulta estaba en curso
+            if exito:
+                if solicitud["al_terminar"]:
+                    self._llamar(solicitud["al_terminar"], resultado)
+            elif solicitud["al_fallar"]:
+                self._llamar(solicitud["al_fallar"], resultado)
+            else:
+                print(f"Error en la base de datos: {resultado}")
+                messagebox.showerror("Error", solicitud["mensaje_error"])
+
+        if any(self._en_curso.values()):
+            self.root.after(self.intervalo_ms, self._procesar_terminadas)
+        else:
+            self._sondeando = False
+
+    @staticmethod
+    def _llamar(funcion, *args):
+        # Un error en un callback no debe detener la entrega de los demás resultados
+        try:
+            funcion(*args)
+        except Exception as e:
+            print(f"Error en callback de la interfaz: {e}")
+
+    def _actualizar_indicador(self, ventana):
+        label = self._indicadores.get(ventana)
+        if label is None:
+            return
+        if not label.winfo_exists():
+            del self._indicadores[ventana]
+            return
+        ocupada = self._en_curso.get(ventana, 0) or self._en_espera.get(ventana)
+        label.config(text="Cargando..." if ocupada else "")
+        ventana.config(cursor="watch" if ocupada else "")
+
+    def cerrar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ------------------------------
+# Clase ListaVirtual (Treeview paginado)
+# ------------------------------
+
+class ListaVirtual:
+    """Muestra una tabla grande en un Treeview cargando páginas a medida que se desplaza.
+
+    Las páginas se piden con ``cargar_pagina(despues_de=..., antes_de=..., limite=...)``
+    (paginación por posición, ver AccesoDatos._pagina) y en el widget se conservan
+    como máximo ``max_filas`` filas: al avanzar se descartan las de arriba y al
+    volver se recuperan desde la base de datos. Las filas se convierten en modelos
+    del ``catalogo`` en el hilo de la consulta; el Treeview solo recibe el texto.
+
+    ``ordenar`` y ``filtrar_columnas`` pasan el orden (uno de ``ordenes``) y las
+    igualdades a la consulta; si todas las filas ya están en la lista se ordenan
+    y filtran aquí, sin volver al servidor.
+    """
+
+    def __init__(self, treeview, servicio_bd, cargar_pagina, catalogo, ordenes=None, tamano_pagina=200,
+                 max_filas=1000, mensaje_error="No se pudieron obtener los datos."):
+        self.treeview = treeview
+        self.servicio_bd = servicio_bd
+        self.cargar_pagina = cargar_pagina
+        self.catalogo = catalogo
+        self.ordenes = ordenes or {}  # Orden -> columnas del modelo (AccesoDatos.ORDENES_*)
+        self.orden = None             # None: por id
+        self.descendente = False
+        self.filtro_columnas = None   # {columna: valor} que se aplica a cada página, p. ej. la categoría
+        self._claves_orden = weakref.WeakKeyDictionary()  # modelo -> clave de orden ya calculada
+        self.tamano_pagina = tamano_pagina
+        self.max_filas = max_filas
+        self.mensaje_error = mensaje_error
+        self.hay_anteriores = False  # Se descartaron filas por arriba
+        self.hay_siguientes = True   # Quedan filas por cargar abajo
+        self._modelos = {}           # iid -> modelo mostrado, para los formularios y para comparar al refrescar
+        self.filtro = None           # Función que devuelve las filas filtradas, si hay filtro
+        self._filtro_opciones = {}   # Cómo se llamó a mostrar_filtradas, para repetirlo al refrescar
+        self._cargando = False
+
+        # Barra de desplazamiento: también detecta cuándo pedir la página siguiente
+        self.scrollbar = ttk.Scrollbar(treeview.master, orient="vertical", command=treeview.yview)
+        treeview.configure(yscrollcommand=self._al_desplazar)
+
+    def recargar(self):
+        """Vuelve a cargar desde la primera página (descarta cualquier carga en curso)."""
+        self.filtro = None
+        self.hay_anteriores = False
+        self.hay_siguientes = True
+        self._cargando = True
+        self._pedir({}, self._mostrar_primera)
+
+    def refrescar(self):
+        """Vuelve a consultar el rango de ids visible y aplica solo las diferencias.
+
+        Las filas se identifican por su id (iid del Treeview), así que la selección
+        y la posición de desplazamiento se conservan; el trabajo sobre el widget es
+        proporcional al número de filas que cambiaron.
+        """
+        if self.filtro is not None:
+            self.mostrar_filtradas(self.filtro, **self._filtro_opciones)
+            return
+        hijos = self.treeview.get_children()
+        if not hijos:
+            self.recargar()
+            return
+        # Sin filas descartadas por un extremo el rango queda abierto por ese lado:
+        # así también aparecen las filas nuevas que caen antes de la primera
+        rango = {"limite": self.max_filas}
+        if self.hay_anteriores:
+            rango["desde"] = self._posicion(self._modelos[hijos[0]])
+        if self.hay_siguientes:
+            rango["hasta"] = self._posicion(self._modelos[hijos[-1]])
+        self._cargando = True
+        self._pedir(rango, lambda filas: self._aplicar_diferencias(filas, rango))
+
+    def _posicion(self, modelo):
+        """Posición del modelo en el orden actual, como la espera AccesoDatos._pagina."""
+        if self.orden is None:
+            return modelo.clave
+        return tuple(getattr(modelo, columna) for columna in self.ordenes[self.orden]) + (modelo.clave,)
+
+    def _pedir(self, parametros, al_terminar):
+        ventana = self.treeview.winfo_toplevel()
+        parametros.setdefault("limite", self.tamano_pagina)
+        if self.orden is not None:
+            parametros.update(orden=self.orden, descendente=self.descendente)
+        if self.filtro_columnas:
+            parametros["filtro"] = self.filtro_columnas
+        self.servicio_bd.ejecutar(lambda: self.catalogo.cargar_filas(self.cargar_pagina(**parametros)), al_terminar,
+                                  al_fallar=self._al_fallar,
+                                  clave=("pagina", str(self.treeview)), ventana=ventana,
+                                  accion=f"ListaVirtual.{self.cargar_pagina.__name__}")
+
+    def _al_fallar(self, error):
+        self._cargando = False
+        print(f"Error al obtener la página: {error}")
+        messagebox.showerror("Error", self.mensaje_error)
+
+    def _mostrar_primera(self, filas):
+        self.treeview.delete(*self.treeview.get_children())
+        self._modelos.clear()
+        self._cargando = False
+        self._agregar_al_final(filas)
+
+    def _al_desplazar(self, primero, ultimo):
+        self.scrollbar.set(primero, ultimo)
+        if self._cargando:
+            return
+        primero, ultimo = float(primero), float(ultimo)
+        if ultimo > 0.9 and self.hay_siguientes:
+            hijos = self.treeview.get_children()
+            self._cargando = True
+            parametros = {"despues_de": self._posicion(self._modelos[hijos[-1]])} if hijos else {}
+            self._pedir(parametros, self._agregar_al_final)
+        elif primero < 0.1 and self.hay_anteriores:
+            hijos = self.treeview.get_children()
+            self._cargando = True
+            self._pedir({"antes_de": self._posicion(self._modelos[hijos[0]])}, self._agregar_al_principio)
+
+    def _fila_superior(self):
+        return self.treeview.identify_row(1)
+
+    def _restaurar_fila_superior(self, item):
+        # Mantener la misma fila arriba después de insertar o quitar filas
+        if item and self.treeview.exists(item):
+            total = len(self.treeview.get_children())
+            self.treeview.yview_moveto(self.treeview.index(item) / max(total, 1))
+
+    def modelo(self, iid):
+        """Modelo mostrado con ese iid, con sus tipos (el Treeview los pasa a texto)."""
+        return self._modelos.get(iid)
+
+    def modelos(self, iids):
+        return [self._modelos[iid] for iid in iids]
+
+    def _insertar(self, posicion, modelo):
+        iid = str(modelo.clave)
+        self._modelos[iid] = modelo
+        self.treeview.insert("", posicion, iid=iid, values=modelo.valores())
+
+    def _borrar(self, iids):
+        for iid in iids:
+            self._modelos.pop(iid, None)
+        if iids:
+            self.treeview.delete(*iids)
+
+    def _recortar_arriba(self):
+        hijos = self.treeview.get_children()
+        sobrantes = len(hijos) - self.max_filas
+        if sobrantes > 0:
+            self._borrar(hijos[:sobrantes])
+            self.hay_anteriores = True
+            return True
+        return False
+
+    def _agregar_al_final(self, filas):
+        self._cargando = False
+        self.hay_siguientes = len(filas) == self.tamano_pagina
+        superior = self._fila_superior()
+        for modelo in filas:
+            if str(modelo.clave) not in self._modelos:  # Pudo llegar antes con aplicar_cambios
+                self._insertar("end", modelo)
+        if self._recortar_arriba():
+            self._restaurar_fila_superior(superior)
+
+    def _agregar_al_principio(self, filas):
+        self._cargando = False
+        self.hay_anteriores = len(filas) == self.tamano_pagina
+        superior = self._fila_superior()
+        for posicion, modelo in enumerate(modelo for modelo in filas if str(modelo.clave) not in self._modelos):
+            self._insertar(posicion, modelo)
+        hijos = self.treeview.get_children()
+        sobrantes = len(hijos) - self.max_filas
+        if sobrantes > 0:
+            self._borrar(hijos[-sobrantes:])
+            self.hay_siguientes = True
+        self._restaurar_fila_superior(superior)
+
+    def mostrar_filtradas(self, obtener_filas, en_segundo_plano=False, al_mostrar=None):
+        """Muestra solo las filas que devuelve ``obtener_filas()``, en el orden en que vienen
+        (o en el de ``ordenar``) y que cumplen ``filtro_columnas``.
+
+        Con ``en_segundo_plano`` la función se ejecuta en ServicioBD (p. ej. una búsqueda
+        en el servidor), una búsqueda nueva descarta la anterior y el número de filas se
+        entrega a ``al_mostrar``; si no, se llama en el momento (p. ej. el índice local) y
+        se devuelve. Mientras haya filtro no se pagina; ``refrescar`` repite la búsqueda.
+        """
+        self.servicio_bd.cancelar(("pagina", str(self.treeview)))
+        self._cargando = False
+        self.filtro = obtener_filas
+        self._filtro_opciones = {"en_segundo_plano": en_segundo_plano, "al_mostrar": al_mostrar}
+        self.hay_anteriores = False
+        self.hay_siguientes = False
+
+        def mostrar(filas):
+            if self.filtro is not obtener_filas:
+                return  # Se quitó o cambió el filtro mientras se buscaba
+            superior = self._fila_superior()
+            self._sincronizar(self._ordenadas(filas))
+            self._restaurar_fila_superior(superior)
+            if al_mostrar:
+                al_mostrar(len(filas))
+            return len(filas)
+
+        def obtener_modelos():
+            return self._filtradas(self.catalogo.cargar_filas(obtener_filas()))
+
+        if en_segundo_plano:
+            self.servicio_bd.ejecutar(obtener_modelos, mostrar, al_fallar=self._al_fallar,
+                                      clave=("pagina", str(self.treeview)), ventana=self.treeview.winfo_toplevel())
+            return None
+        return mostrar(obtener_modelos())
+
+    def quitar_filtro(self):
+        if self.filtro is not None:
+            self.filtro = None
+            self.recargar()
+
+    def _todas_cargadas(self):
+        return self.filtro is not None or not (self.hay_anteriores or self.hay_siguientes or self._cargando)
+
+    def ordenar(self, orden, descendente=False):
+        """Ordena por ``orden`` (una clave de ``ordenes``) o, con None, por id.
+
+        Si todas las filas están en la lista (resultados de búsqueda o una tabla
+        pequeña) se reordenan aquí; si no, se pide la primera página al servidor,
+        que ordena con el índice de esas columnas.
+        """
+        if orden is not None and orden not in self.ordenes:
+            raise ValueError(f"Orden no válido: {orden}")
+        self.orden, self.descendente = orden, descendente
+        self._claves_orden = weakref.WeakKeyDictionary()
+        if not self._todas_cargadas():
+            self.recargar()
+        elif orden is None and self.filtro is not None:
+            self.refrescar()  # Vuelve al orden de la búsqueda (relevancia)
+        else:
+            superior = self._fila_superior()
+            self._sincronizar(self._ordenadas(self.modelos(self.treeview.get_children())))
+            self._restaurar_fila_superior(superior)
+
+    def _ordenadas(self, modelos):
+        if self.orden is None and self.filtro is not None:
+            return modelos
+        return sorted(modelos, key=self._clave_orden, reverse=self.descendente)
+
+    def _clave_orden(self, modelo):
+        # Se calcula una vez por modelo y orden: normalizar el texto es lo caro
+        clave = self._claves_orden.get(modelo)
+        if clave is None:
+            if self.orden is None:
+                clave = (modelo.clave,)
+            else:
+                valores = (getattr(modelo, columna) for columna in self.ordenes[self.orden])
+                clave = tuple(normalizar_texto(v) if isinstance(v, str) else v for v in valores) + (modelo.clave,)
+            self._claves_orden[modelo] = clave
+        return clave
+
+    def filtrar_columnas(self, filtro):
+        """Solo las filas con esos valores (``{columna: valor}``, None para todas)."""
+        self.filtro_columnas = filtro or None
+        if self.filtro is not None:
+            self.refrescar()  # Repite la búsqueda con el filtro nuevo
+        else:
+            self.recargar()
+
+    def _filtradas(self, modelos):
+        if not self.filtro_columnas:
+            return modelos
+        return [m for m in modelos if all(getattr(m, c) == v for c, v in self.filtro_columnas.items())]
+
+    def aplicar_cambios(self, modelos, eliminados=()):
+        """Aplica cambios que llegaron de otra terminal (MonitorCambios) sin volver a consultar.
+
+        Quita los ids eliminados, actualiza en su lugar las filas cuyo orden no
+        cambió y mueve las demás con una búsqueda binaria entre las cargadas. Una
+        fila nueva solo se agrega si cae dentro del tramo cargado; con una búsqueda
+        activa solo se actualizan las que ya aparecen.
+        """
+        superior = self._fila_superior()
+        borrar = [str(clave) for clave in eliminados if str(clave) in self._modelos]
+        for modelo in modelos:
+            iid = str(modelo.clave)
+            if iid in self._modelos and not self._filtradas([modelo]):
+                borrar.append(iid)  # Ya no es de la categoría mostrada
+        self._borrar(borrar)
+
+        for modelo in self._filtradas(modelos):
+            iid = str(modelo.clave)
+            actual = self._modelos.get(iid)
+            if actual is modelo:
+                continue  # Es el cambio de esta misma terminal, ya mostrado
+            if actual is not None:
+                # Con resultados por relevancia la fila no se mueve
+                if (self.orden is None and self.filtro is not None) or self._clave_orden(actual) == self._clave_orden(modelo):
+                    self._modelos[iid] = modelo
+                    self.treeview.item(iid, values=modelo.valores())
+                    continue
+                self._borrar([iid])
+            elif self.filtro is not None or self._cargando:
+                continue  # No es parte de la búsqueda, o la página que llega ya lo trae
+            posicion = self._posicion_insercion(modelo)
+            if ((posicion == 0 and self.hay_anteriores)
+                    or (posicion == len(self.treeview.get_children()) and self.hay_siguientes)):
+                continue  # Cae fuera del tramo cargado: aparecerá al desplazarse
+            self._insertar(posicion, modelo)
+        self._restaurar_fila_superior(superior)
+
+    def _posicion_insercion(self, modelo):
+        """Índice donde va el modelo entre las filas mostradas, en el orden actual."""
+        hijos = self.treeview.get_children()
+        clave = self._clave_orden(modelo)
+        bajo, alto = 0, len(hijos)
+        while bajo < alto:
+            medio = (bajo + alto) // 2
+            otra = self._clave_orden(self._modelos[hijos[medio]])
+            if (otra > clave) if self.descendente else (otra < clave):
+                bajo = medio + 1
+            else:
+                alto = medio
+        return bajo
+
+    def _aplicar_diferencias(self, filas, rango):
+        self._cargando = False
+        superior = self._fila_superior()
+        self._sincronizar(filas)
+        if "hasta" not in rango:
+            self.hay_siguientes = len(filas) == rango["limite"]
+            self._recortar_arriba()
+        self._restaurar_fila_superior(superior)
+
+    def _sincronizar(self, filas):
+        """Deja en el widget exactamente ``filas``, en su orden, tocando solo las que cambian."""
+        nuevas = {str(modelo.clave) for modelo in filas}
+
+        # Filas que ya no existen en el rango consultado
+        self._borrar([iid for iid in self.treeview.get_children() if iid not in nuevas])
+
+        # Cada fila nueva se inserta en su posición. Si ambas listas vienen ordenadas por
+        # id no hay que mover nada; con resultados por relevancia se mueven las que cambian.
+        orden = list(self.treeview.get_children())
+        for posicion, modelo in enumerate(filas):
+            iid = str(modelo.clave)
+            actual = self._modelos.get(iid)
+            if actual is None:
+                self._insertar(posicion, modelo)
+                orden.insert(posicion, iid)
+                continue
+            if orden[posicion] != iid:
+                self.treeview.move(iid, "", posicion)
+                orden.remove(iid)
+                orden.insert(posicion, iid)
+            if actual != modelo:  # El catálogo devuelve la misma instancia si no cambió
+                self._modelos[iid] = modelo
+                self.treeview.item(iid, values=modelo.valores())
 
 
 # ------------------------------
@@ -103,20 +3319,28 @@ class Usuario:
         return self.__fecha_creacion
 
     # Método para verificar el login
+    @staticmethod
+    def nombre_de_login(conexion, usuarios, contrasena):
+        """nombre_usuario si las credenciales son válidas; None si no"""
+        with conexion.cursor() as cursor:
+            # Realizamos la consulta para buscar el nombre de usuario y contraseña
+            cursor.execute(
+                "SELECT nombre_usuario FROM usuarios WHERE usuarios=%s AND contrasena=%s", 
+                (usuarios, contrasena)
+            )
+            usuario = cursor.fetchone()
+        return usuario[0] if usuario else None
+
     def verificar_login(self, conexion: ConexionBD):
-        conexion.conectar()
-        # Realizamos la consulta para buscar el nombre de usuario y contraseña
-        conexion.cursor.execute(
-            "SELECT nombre_usuario FROM usuarios WHERE usuarios=%s AND contrasena=%s", 
-            (self.__usuarios, self.__contrasena)
-        )
-        usuario = conexion.cursor.fetchone()
-        conexion.cerrar()
+        if conexion.motor == "servicio":
+            nombre = conexion.llamar("usuarios/nombre_de_login", self.__usuarios, self.__contrasena)
+        else:
+            nombre = self.nombre_de_login(conexion, self.__usuarios, self.__contrasena)
 
         # Si se encuentra un usuario, asignamos el nombre de usuario a la variable global
-        if usuario:
+        if nombre is not None:
             global usuario_logueado
-            usuario_logueado = usuario[0]  # Asignamos nombre_usuario
+            usuario_logueado = nombre  # Asignamos nombre_usuario
             return True  # Login exitoso
         else:
             usuario_logueado = None
@@ -124,22 +3348,23 @@ class Usuario:
 
     # Método para registrar un nuevo usuario
     def registrar_usuario(self, conexion: ConexionBD):
-        conexion.conectar()
+        if conexion.motor == "servicio":
+            return conexion.llamar("usuarios/registrar", self.__usuarios, self.__contrasena, self.__rol, self.__estado)
         try:
             # Generar token único
             self.__token = str(uuid.uuid4()) #token para identificar usuarios de manera unica
             fecha_creacion = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            conexion.cursor.execute(""" 
-                INSERT INTO usuarios (usuarios, contrasena, rol, estado, token, fecha_creacion)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (self.__usuarios, self.__contrasena, self.__rol, self.__estado, self.__token, fecha_creacion))
-            conexion.conn.commit()
+            with conexion.transaccion() as cursor:
+                cursor.execute(""" 
+                    INSERT INTO usuarios (usuarios, contrasena, rol, estado, token, fecha_creacion)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (self.__usuarios, self.__contrasena, self.__rol, self.__estado, self.__token, fecha_creacion))
             print("Usuario registrado con éxito.")
-        except pymysql.MySQLError as err:
+            return True
+        except conexion.Error as err:
+            # Puede ejecutarse fuera del hilo de Tk: el mensaje lo muestra la ventana
             print(f"Error al registrar usuario: {err}")
-            messagebox.showerror("Error", f"No se pudo registrar el usuario: {err}")
-        finally:
-            conexion.cerrar()
+            return False
 
 
 # ------------------------------
@@ -158,9 +3383,10 @@ class VentanaBase:
 # ------------------------------
 
 class VentanaLogin(VentanaBase):
-    def __init__(self, root, conexion_bd):
+    def __init__(self, root, conexion_bd, servicio_bd=None):
         super().__init__(root)
         self.conexion_bd = conexion_bd
+        self.servicio_bd = servicio_bd or ServicioBD(root)
         self.root.title("Login")
         self.root.geometry("400x500")
         self.root.config(bg="#f0f0f0")  # Fondo claro
@@ -192,6 +3418,11 @@ class VentanaLogin(VentanaBase):
         self.boton_registrarse = tk.Button(self.root, text="Registrarse", command=self.registrarse, bg="#95a5a6", fg="white", font=("Helvetica", 10), relief="flat", width=20)
         self.boton_registrarse.pack(pady=5)
 
+        # Indicador de carga mientras se consulta la base de datos
+        self.label_cargando = tk.Label(self.root, text="", font=("Helvetica", 10), bg="#f0f0f0", fg="#7f8c8d")
+        self.label_cargando.pack(pady=5)
+        self.servicio_bd.registrar_indicador(self.root, self.label_cargando)
+
         # Efectos de hover para los botones
         self.boton_login.bind("<Enter>", lambda e: self.hover_boton(self.boton_login, True))
         self.boton_login.bind("<Leave>", lambda e: self.hover_boton(self.boton_login, False))
@@ -211,36 +3442,105 @@ class VentanaLogin(VentanaBase):
         contrasena = self.entry_contrasena.get()
 
         usuario = Usuario(usuarios, "", contrasena, "", "", "")
-        if usuario.verificar_login(self.conexion_bd):
-            print("Login exitoso")
-            messagebox.showinfo("Login exitoso", "Bienvenido!")
-            self.root.withdraw()  # Ocultar la ventana de login
-            dashboard = Dashboard(self.root, self.conexion_bd)
-            dashboard.mostrar_dashboard()  # Mostrar el Dashboard
-        else:
-            messagebox.showerror("Error", "Nombre de usuario o contraseña incorrectos.")
+
+        def al_verificar(exito):
+            if exito:
+                print("Login exitoso")
+                messagebox.showinfo("Login exitoso", "Bienvenido!")
+                self.root.withdraw()  # Ocultar la ventana de login
+                dashboard = Dashboard(self.root, self.conexion_bd, self.servicio_bd)
+                dashboard.mostrar_dashboard()  # Mostrar el Dashboard
+            else:
+                messagebox.showerror("Error", "Nombre de usuario o contraseña incorrectos.")
+
+        # La verificación se hace en un hilo del pool para no congelar la ventana
+        self.servicio_bd.ejecutar(lambda: usuario.verificar_login(self.conexion_bd), al_verificar,
+                                  clave="login", ventana=self.root,
+                                  mensaje_error="No se pudo conectar con la base de datos.")
 
     def registrarse(self):
         """Abrir la ventana de registro"""
         ventana_registro = tk.Toplevel(self.root)
-        VentanaRegistro(ventana_registro, self.conexion_bd)
+        VentanaRegistro(ventana_registro, self.conexion_bd, self.servicio_bd)
 # ------------------------------
 # Clase Dashboard
 # ------------------------------
 
 class Dashboard:
-    def __init__(self, root, conexion_bd):
+    # Por encima de este número de productos se busca en el servidor (FULLTEXT)
+    # en lugar de construir el índice en memoria
+    LIMITE_INDICE_LOCAL = 50000
+
+    def __init__(self, root, conexion_bd, servicio_bd=None):
         self.root = root
         self.conexion_bd = conexion_bd
+        # Directo a la base o a través de servidor.py, según la conexión
+        self.datos = conexion_bd.acceso_datos()
+        self.inventario = conexion_bd.servicio_inventario()
+        self.servicio_bd = servicio_bd or ServicioBD(root)
         self.ventana_dashboard = None
         self.frame_contenido = None
+        self.treeview_resumen = None  # Tabla de indicadores por categoría del Dashboard
+        self.label_alertas = None     # Aviso de stock bajo en el encabezado del Dashboard
+        self.alertas_stock = AlertasStock(root, self.servicio_bd, self.datos, self.mostrar_alertas_stock)
+        # Cambios de otras terminales: las listas abiertas se actualizan sin recargar
+        self.monitor_cambios = MonitorCambios(root, self.servicio_bd, self.datos, self._al_recibir_cambios)
+        # Modelos por id compartidos por las listas, el índice de búsqueda y los formularios
+        self.catalogo_productos = Catalogo(Producto)
+        self.catalogo_clientes = Catalogo(Cliente)
+        # Descripciones completas de productos (las listas traen solo el comienzo)
+        self.descripciones = CacheLRU(capacidad=500)
+        # Índice de búsqueda local de productos (se construye al abrir la gestión de productos)
+        self.indice_productos = None
+        self.busqueda_en_servidor = False  # True si el catálogo es demasiado grande para el índice local
+        self._indexando = False
+        self._cambios_indice = []    # Cambios hechos mientras el índice se construye
+        self._al_indice_listo = []   # Funciones a llamar cuando el índice esté listo
+        self.ventana_usuarios = None   # Ventanas de gestión: una sola instancia de cada una
+        self.ventana_productos = None
+        self.ventana_diagnostico = None
+        self.treeview_usuarios = None  # Listas que se refrescan cuando el diario llega al servidor
+        self.treeview_productos = None
+        # Diario local: altas, ediciones y bajas se guardan al instante y se envían en segundo plano
+        self.diario = DiarioCambios(os.environ.get("ALMACEN_DIARIO") or DiarioCambios.ruta_predeterminada(conexion_bd))
+        self.sincronizador = SincronizadorDiario(root, self.servicio_bd, self.diario, conexion_bd, self._al_sincronizar)
+        self.label_sincronizacion = None  # Cambios sin enviar o en conflicto, en el encabezado
         self.usuario_logueado = "admin"
+
+    @staticmethod
+    def _traer_al_frente(ventana):
+        """Si la ventana sigue abierta la muestra encima de las demás y devuelve True"""
+        if ventana is None or not ventana.winfo_exists():
+            return False
+        ventana.deiconify()  # Por si estaba minimizada
+        ventana.lift()
+        ventana.focus_force()
+        return True
+
+    @staticmethod
+    def _encabezados_ordenables(treeview, ordenes):
+        """Ordena la lista al hacer clic en los encabezados de ``ordenes`` ({encabezado: orden}).
+
+        Un segundo clic en el mismo encabezado invierte el orden; el de orden None
+        vuelve al orden por id. El encabezado activo muestra una flecha.
+        """
+        lista = treeview.lista_virtual
+        textos = {encabezado: treeview.heading(encabezado, "text") for encabezado in ordenes}
+
+        def ordenar(encabezado, orden):
+            descendente = orden is not None and lista.orden == orden and not lista.descendente
+            lista.ordenar(orden, descendente)
+            for otro, texto in textos.items():
+                flecha = (" ▼" if descendente else " ▲") if otro == encabezado and orden is not None else ""
+                treeview.heading(otro, text=texto + flecha)
+
+        for encabezado, orden in ordenes.items():
+            treeview.heading(encabezado, command=lambda e=encabezado, o=orden: ordenar(e, o))
+
     def mostrar_dashboard(self):
-        # Definir las rutas de las imágenes
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        icono_usuarios_path = os.path.join(script_dir, "recursos/1.png")
-        icono_productos_path = os.path.join(script_dir, "recursos/2.png")
-        fondo_path = os.path.join(script_dir, "recursos/fondo.png")
+        # Si ya está abierto, solo traerlo al frente (conserva los datos ya cargados)
+        if self._traer_al_frente(self.ventana_dashboard):
+            return
 
         # Crear la ventana del Dashboard
         self.ventana_dashboard = tk.Toplevel(self.root)
@@ -260,13 +3560,26 @@ class Dashboard:
         label_usuario = tk.Label(encabezado, text=f"Usuario: {self.usuario_logueado}", font=("Arial", 12), fg="#808080")
         label_usuario.pack(side="right", padx=20)
 
+        # Aviso de stock bajo (lo actualiza AlertasStock)
+        self.label_alertas = tk.Label(encabezado, text="", font=("Arial", 12, "bold"), fg="#E67E22")
+        self.label_alertas.pack(side="right", padx=20)
+        self.alertas_stock.iniciar()
+        self.monitor_cambios.iniciar()
+
+        # Estado del diario local; un clic abre los cambios en conflicto
+        self.label_sincronizacion = tk.Label(encabezado, text="", font=("Arial", 12), fg="#F1C40F", cursor="hand2")
+        self.label_sincronizacion.pack(side="right", padx=20)
+        self.label_sincronizacion.bind("<Button-1>", lambda event: self.resolver_conflictos())
+        self.mostrar_estado_diario()
+        self.sincronizador.iniciar()  # Envía también lo pendiente de sesiones anteriores
+
         # Menú izquierdo
         menu_izquierdo = tk.Frame(self.ventana_dashboard, width=200, height=600, bg="#2C3E50")
         menu_izquierdo.pack(side="left", fill="y", anchor="n")
 
         # Cargar iconos
-        icono_usuarios = PhotoImage(file=icono_usuarios_path)
-        icono_productos = PhotoImage(file=icono_productos_path)
+        icono_usuarios = imagen_recurso("1.png")
+        icono_productos = imagen_recurso("2.png")
 
         # Botones del menú izquierdo
         boton_dashboard = tk.Button(menu_izquierdo, text="Dashboard", bg="#34495E", fg="white", font=("Arial", 12), command=self.mostrar_dashboard)
@@ -280,6 +3593,9 @@ class Dashboard:
         boton_productos.image = icono_productos  # Para evitar que se borre el icono
         boton_productos.pack(pady=10)
 
+        boton_diagnostico = tk.Button(menu_izquierdo, text="Diagnóstico", bg="#34495E", fg="white", font=("Arial", 12), command=self.mostrar_diagnostico)
+        boton_diagnostico.pack(pady=10)
+
         # Botón "Cerrar sesión" en la parte inferior del menú izquierdo
         boton_salir = tk.Button(menu_izquierdo, text="Cerrar sesión", bg="#E74C3C", fg="white", font=("Arial", 12), command=self.cerrar_sesion)
         boton_salir.pack(side="bottom", pady=20)
@@ -289,7 +3605,7 @@ class Dashboard:
         self.frame_contenido.pack(side="right", fill="both", expand=True)
 
         # Cargar imagen de fondo
-        fondo_imagen = PhotoImage(file=fondo_path)
+        fondo_imagen = imagen_recurso("fondo.png")
 
         # Crear un label con la imagen de fondo, que respeta sus dimensiones originales
         label_fondo = tk.Label(self.frame_contenido, image=fondo_imagen)
@@ -298,11 +3614,121 @@ class Dashboard:
         # Es importante mantener una referencia a la imagen para evitar que se elimine
         label_fondo.image = fondo_imagen
 
+        # Indicadores de inventario sobre el fondo
+        frame_resumen = tk.Frame(self.frame_contenido, bg="#ecf0f1")
+        frame_resumen.pack(padx=20, pady=20, fill="x")
+
+        self.labels_resumen = {}
+        for columna, (clave, titulo) in enumerate((("productos", "Productos"), ("unidades", "Unidades"),
+                                                   ("valor", "Valor del stock"), ("agotados", "Agotados"))):
+            tarjeta = tk.Frame(frame_resumen, bg="white", padx=10, pady=10)
+            tarjeta.grid(row=0, column=columna, padx=5, sticky="nsew")
+            frame_resumen.grid_columnconfigure(columna, weight=1)
+            tk.Label(tarjeta, text=titulo, font=("Arial", 10), fg="#7f8c8d", bg="white").pack()
+            self.labels_resumen[clave] = tk.Label(tarjeta, text="...", font=("Arial", 16, "bold"), bg="white")
+            self.labels_resumen[clave].pack()
+
+        columnas = ("Categoría", "Productos", "Unidades", "Valor", "Agotados")
+        self.treeview_resumen = ttk.Treeview(frame_resumen, columns=columnas, show="headings", height=8)
+        for columna in columnas:
+            self.treeview_resumen.heading(columna, text=columna)
+            self.treeview_resumen.column(columna, width=150 if columna == "Categoría" else 90, anchor="w")
+        self.treeview_resumen.grid(row=1, column=0, columnspan=4, pady=10, sticky="ew")
+
+        self.actualizar_resumen()
+
+    def mostrar_diagnostico(self):
+        """Tiempos de las consultas (MetricasBD): por forma de consulta y las más lentas"""
+        if self._traer_al_frente(self.ventana_diagnostico):
+            return
+        metricas = self.conexion_bd.metricas
+        ventana = self.ventana_diagnostico = tk.Toplevel(self.ventana_dashboard)
+        ventana.title("Diagnóstico de la base de datos")
+        ventana.geometry("1000x600")
+
+        label_estado = tk.Label(ventana, text="", font=("Arial", 11), justify="left")
+        label_estado.pack(pady=10, padx=20, anchor="w")
+
+        columnas = ("Consulta", "Veces", "Media ms", "p95 ms", "Máx ms", "Filas", "Errores", "Acción")
+        treeview_consultas = ttk.Treeview(ventana, columns=columnas, show="headings", height=12)
+        for columna, ancho in zip(columnas, (380, 60, 70, 70, 70, 70, 60, 200)):
+            treeview_consultas.heading(columna, text=columna)
+            treeview_consultas.column(columna, width=ancho, anchor="w")
+        treeview_consultas.pack(padx=20, fill="both", expand=True)
+
+        tk.Label(ventana, text="Consultas lentas", font=("Arial", 12, "bold")).pack(pady=(10, 0))
+        columnas_lentas = ("Fecha", "ms", "Acción", "Consulta")
+        treeview_lentas = ttk.Treeview(ventana, columns=columnas_lentas, show="headings", height=6)
+        for columna, ancho in zip(columnas_lentas, (150, 70, 200, 560)):
+            treeview_lentas.heading(columna, text=columna)
+            treeview_lentas.column(columna, width=ancho, anchor="w")
+        treeview_lentas.pack(padx=20, fill="both", expand=True)
+
+        def cargar():
+            resumen = metricas.resumen()
+            pool, conexiones, esperas = self.conexion_bd.estado_pool(), resumen["conexiones"], resumen["esperas_pool"]
+            label_estado.config(text=(
+                f"Pool: {pool['en_uso']} en uso, {pool['libres']} libres de {pool['tamano']}    "
+                f"Conexiones abiertas: {conexiones['veces']} (media {conexiones['media_ms']} ms, p95 {conexiones['p95_ms']} ms)    "
+                f"Espera por conexión: p95 {esperas['p95_ms']} ms\n"
+                f"Desde {resumen['desde']}, consultas lentas: {resumen['umbral_lenta_ms']} ms o más"))
+            treeview_consultas.delete(*treeview_consultas.get_children())
+            for consulta in resumen["consultas"]:
+                accion = max(consulta["acciones"], key=consulta["acciones"].get) if consulta["acciones"] else ""
+                treeview_consultas.insert("", "end", values=(consulta["consulta"], consulta["veces"], consulta["media_ms"],
+                                                              consulta["p95_ms"], consulta["max_ms"], consulta["filas"],
+                                                              consulta["errores"], accion))
+            treeview_lentas.delete(*treeview_lentas.get_children())
+            for lenta in reversed(resumen["lentas"]):
+                treeview_lentas.insert("", "end", values=(lenta["fecha"], lenta["ms"], lenta["accion"], lenta["consulta"]))
+
+        def refrescar_periodicamente():
+            if ventana.winfo_exists():
+                cargar()
+                ventana.after(2000, refrescar_periodicamente)
+
+        def exportar():
+            ruta = filedialog.asksaveasfilename(parent=ventana, title="Exportar diagnóstico", defaultextension=".json",
+                                                filetypes=[("JSON", "*.json")],
+                                                initialfile=f"diagnostico_{datetime.now():%Y%m%d_%H%M%S}.json")
+            if not ruta:
+                return
+            try:
+                metricas.exportar_json(ruta)
+            except OSError as e:
+                print(f"Error al exportar el diagnóstico: {e}")
+                messagebox.showerror("Error", "No se pudo guardar el archivo.", parent=ventana)
+                return
+            messagebox.showinfo("Éxito", f"Diagnóstico guardado en {ruta}", parent=ventana)
+
+        def reiniciar():
+            metricas.reiniciar()
+            cargar()
+
+        frame_botones = tk.Frame(ventana)
+        frame_botones.pack(pady=10)
+        tk.Button(frame_botones, text="Actualizar", bg="#3498DB", fg="white", font=("Arial", 12),
+                  command=cargar).grid(row=0, column=0, padx=10)
+        tk.Button(frame_botones, text="Exportar JSON", bg="#16A085", fg="white", font=("Arial", 12),
+                  command=exportar).grid(row=0, column=1, padx=10)
+        tk.Button(frame_botones, text="Reiniciar", bg="#F39C12", fg="white", font=("Arial", 12),
+                  command=reiniciar).grid(row=0, column=2, padx=10)
+        tk.Button(frame_botones, text="Salir", bg="#95A5A6", fg="white", font=("Arial", 12),
+                  command=ventana.destroy).grid(row=0, column=3, padx=10)
+
+        refrescar_periodicamente()
+
     def on_closing(self):
         """Este método se ejecuta al intentar cerrar la ventana del Dashboard."""
         respuesta = messagebox.askyesno("Cerrar ventana", "¿Estás seguro de que quieres salir, no es mejor darle a cerrar sesion (:?")
         if respuesta:
             self.ventana_dashboard.destroy()  # Cierra la ventana
+            self.alertas_stock.detener()
+            self.monitor_cambios.detener()
+            self.sincronizador.detener()
+            self.servicio_bd.cerrar()  # Detener los hilos de base de datos
+            self.conexion_bd.cerrar_pool()  # Cerrar las conexiones del pool
+            self._cerrar_diario()
             self.root.quit()  # Termina la ejecución del programa
             print("Sesión cerrada y aplicación cerrada")
         else:
@@ -314,6 +3740,12 @@ class Dashboard:
         respuesta = messagebox.askyesno("Cerrar sesión", "¿Estás seguro de que quieres cerrar la sesión?")
         if respuesta:
             self.ventana_dashboard.destroy()  # Destruir la ventana del dashboard
+            self.alertas_stock.detener()
+            self.monitor_cambios.detener()
+            self.sincronizador.detener()
+            self.servicio_bd.cerrar()  # Detener los hilos de base de datos
+            self.conexion_bd.cerrar_pool()  # Cerrar las conexiones del pool
+            self._cerrar_diario()
             self.root.quit()  # Termina la ejecución de la aplicación
             print("Sesión cerrada y aplicación cerrada")
         else:
@@ -321,10 +3753,14 @@ class Dashboard:
     #GESTION USUARIOS
     def gestion_usuarios(self):
         """Función que abre la ventana de gestión de usuarios y muestra un listado con sus detalles"""
+        # Si ya está abierta se trae al frente con sus datos y su posición de desplazamiento;
+        # se refresca con "Actualizar" o cuando se modifican los datos
+        if self._traer_al_frente(self.ventana_usuarios):
+            return
         print("Abriendo gestión de usuarios...")
 
         # Crear la nueva ventana para gestionar usuarios
-        ventana_usuarios = tk.Toplevel(self.ventana_dashboard)
+        ventana_usuarios = self.ventana_usuarios = tk.Toplevel(self.ventana_dashboard)
         ventana_usuarios.title("Gestión de Usuarios")
         ventana_usuarios.geometry("800x600")
 
@@ -332,11 +3768,26 @@ class Dashboard:
         label_titulo = tk.Label(ventana_usuarios, text="Listado de Usuarios Registrados", font=("Arial", 14))
         label_titulo.pack(pady=10)
 
+        # Indicador de carga mientras las consultas corren en segundo plano
+        label_cargando = tk.Label(ventana_usuarios, text="", font=("Arial", 10), fg="#7f8c8d")
+        label_cargando.pack()
+        self.servicio_bd.registrar_indicador(ventana_usuarios, label_cargando)
+
         # Crear el árbol de visualización de usuarios (usando Treeview de tkinter)
         columnas = ("ID Cliente", "Nombre", "Apellido", "Número de Teléfono", "Correo Electrónico", "Usuario")
 
-        treeview = ttk.Treeview(ventana_usuarios, columns=columnas, show="headings", height=15)
-        treeview.pack(pady=10, padx=20, fill="both", expand=True)
+        frame_lista = tk.Frame(ventana_usuarios)
+        frame_lista.pack(pady=10, padx=20, fill="both", expand=True)
+
+        treeview = self.treeview_usuarios = ttk.Treeview(frame_lista, columns=columnas, show="headings", height=15,
+                                                          selectmode="extended")  # Varias filas con Ctrl/Mayús
+        treeview.pack(side="left", fill="both", expand=True)
+
+        # Lista virtual: carga páginas por id a medida que se desplaza
+        treeview.lista_virtual = ListaVirtual(treeview, self.servicio_bd, self.datos.pagina_clientes,
+                                              self.catalogo_clientes, AccesoDatos.ORDENES_CLIENTES,
+                                              mensaje_error="No se pudieron obtener los datos de los usuarios.")
+        treeview.lista_virtual.scrollbar.pack(side="right", fill="y")
 
         # Configurar las columnas
         treeview.heading("ID Cliente", text="ID Cliente")
@@ -354,50 +3805,44 @@ class Dashboard:
         treeview.column("Correo Electrónico", width=200, anchor="w")
         treeview.column("Usuario", width=150, anchor="w")
 
-        # Conectar a la base de datos para obtener la lista de usuarios
-        self.conexion_bd.conectar()
+        # Clic en un encabezado para ordenar (otro clic invierte el orden)
+        self._encabezados_ordenables(treeview, {"ID Cliente": None, "Apellido": "apellido"})
 
-        try:
-            # Consulta SQL para obtener los datos de la tabla clientes
-            query = """
-            SELECT id_cliente, nombre, apellido, telefono, correo_electronico, usuario FROM clientes
-            """
-            self.conexion_bd.cursor.execute(query)
-            usuarios = self.conexion_bd.cursor.fetchall()
-
-            # Agregar los usuarios al treeview
-            for usuario in usuarios:
-                treeview.insert("", "end", values=usuario)
-
-        except pymysql.MySQLError as e:
-            print(f"Error al obtener usuarios: {e}")
-            messagebox.showerror("Error", "No se pudieron obtener los datos de los usuarios.")
-
-        finally:
-            self.conexion_bd.cerrar()
+        # Cargar la lista de usuarios en segundo plano, sin congelar la ventana
+        self.actualizar_usuarios(treeview)
 
         # Función para cambiar el color de fondo de una fila seleccionada
-        # Función para cambiar el color de fondo de una fila seleccionada y mostrar un alert
         def seleccionar_fila(event):
             item = treeview.focus()  # Obtener la fila seleccionada
             if item:
                 # Cambiar el color de fondo a verde
                 treeview.item(item, tags="seleccionada")
 
-                # Obtener los datos del usuario seleccionado
-                usuario_seleccionado = treeview.item(item)['values']
+                # Con Shift o Ctrl se eligen varias filas: solo se informa cuántas
+                seleccion = treeview.selection()
+                if len(seleccion) > 1:
+                    label_mensaje.config(text=f"{len(seleccion)} usuarios seleccionados", fg="green")
+                    return
 
-                # Mostrar un alert con el mensaje de éxito
-                messagebox.showinfo("Éxito", f"Usuario seleccionado: {usuario_seleccionado[1]} {usuario_seleccionado[2]}", icon='info')
+                # Obtener los datos del usuario seleccionado
+                cliente = treeview.lista_virtual.modelo(item)
 
                 # Crear un mensaje visual dentro de la ventana (por ejemplo, debajo del treeview)
-                label_mensaje.config(text=f"Usuario seleccionado: {usuario_seleccionado[1]} {usuario_seleccionado[2]}", fg="green")
+                label_mensaje.config(text=f"Usuario seleccionado: {cliente.nombre} {cliente.apellido}", fg="green")
+
+        # El aviso con los datos solo aparece con doble clic, para no interrumpir la selección
+        def mostrar_detalle(event):
+            item = treeview.identify_row(event.y)
+            if item:
+                cliente = treeview.lista_virtual.modelo(item)
+                messagebox.showinfo("Usuario", f"Usuario seleccionado: {cliente.nombre} {cliente.apellido}", icon='info', parent=treeview)
 
         # Añadir estilo para filas seleccionadas
         treeview.tag_configure("seleccionada", background="lightgreen")
 
         # Asociar la función de cambio de color con el evento de clic en las filas
         treeview.bind("<ButtonRelease-1>", seleccionar_fila)
+        treeview.bind("<Double-1>", mostrar_detalle)
 
         # Crear un label para mostrar el mensaje de éxito (lo pondremos debajo del treeview)
         label_mensaje = tk.Label(ventana_usuarios, text="", font=("Arial", 12), fg="green")
@@ -429,32 +3874,14 @@ class Dashboard:
         # Botón de salir
         boton_salir = tk.Button(frame_botones, text="Salir", bg="#95A5A6", fg="white", font=("Arial", 12), command=ventana_usuarios.destroy)
         boton_salir.grid(row=0, column=3, padx=10)
-    def actualizar_usuarios(self, treeview):
-        # Limpiar los datos actuales en el treeview
-        for item in treeview.get_children():
-            treeview.delete(item)
 
-        # Volver a obtener los datos actualizados de la base de datos
-        self.conexion_bd.conectar()
-
-        try:
-            # Consulta SQL para obtener los datos actualizados de la tabla clientes
-            query = """
-            SELECT id_cliente, nombre, apellido, telefono, correo_electronico, usuario FROM clientes
-            """
-            self.conexion_bd.cursor.execute(query)
-            usuarios = self.conexion_bd.cursor.fetchall()
-
-            # Agregar los usuarios al treeview
-            for usuario in usuarios:
-                treeview.insert("", "end", values=usuario)
-
-        except pymysql.MySQLError as e:
-            print(f"Error al obtener usuarios: {e}")
-            messagebox.showerror("Error", "No se pudieron obtener los datos de los usuarios.")
-
-        finally:
-            self.conexion_bd.cerrar()
+        # Botón de exportar clientes a CSV o JSON Lines
+        boton_exportar = tk.Button(frame_botones, text="Exportar", bg="#16A085", fg="white", font=("Arial", 12),
+                                   command=lambda: self.exportar_datos("clientes", treeview))
+        boton_exportar.grid(row=1, column=0, padx=10, pady=10)
+    def actualizar_usuarios(self, treeview):
+        """Refresca la lista de usuarios aplicando solo los cambios; un nuevo clic descarta la carga anterior"""
+        treeview.lista_virtual.refrescar()
     def abrir_ventana_nuevo_cliente(self, treeview):
         """Función para abrir la ventana para agregar un nuevo cliente"""
         ventana_nuevo_cliente = tk.Toplevel(self.ventana_dashboard)
@@ -494,23 +3921,13 @@ class Dashboard:
             usuario = entry_usuario.get()
 
             if nombre and apellido and telefono and correo and usuario:
-                try:
-                    self.conexion_bd.conectar()
-                    query_insertar = """
-                    INSERT INTO clientes (nombre, apellido, telefono, correo_electronico, usuario)
-                    VALUES (%s, %s, %s, %s, %s)
-                    """
-                    self.conexion_bd.cursor.execute(query_insertar, (nombre, apellido, telefono, correo, usuario))
-                    self.conexion_bd.conn.commit()
+                datos = {"nombre": nombre, "apellido": apellido, "telefono": telefono,
+                         "correo_electronico": correo, "usuario": usuario}
+                # Se guarda en el diario local; la lista se refresca cuando llega al servidor
+                if self._registrar_cambio(("clientes", "insertar", None, datos, None)):
                     messagebox.showinfo("Éxito", "Nuevo cliente agregado.")
                     ventana_nuevo_cliente.destroy()
 
-                    # Aquí se llama a la función para actualizar el treeview de la ventana principal
-                    self.actualizar_usuarios(treeview)  # Recargar la lista de usuarios
-                except pymysql.MySQLError as e:
-                    print(f"Error al agregar el cliente: {e}")
-                    messagebox.showerror("Error", "Hubo un problema al agregar el cliente.")
-
         boton_guardar = tk.Button(ventana_nuevo_cliente, text="Guardar", command=guardar_nuevo_cliente)
         boton_guardar.pack(pady=20)
     def eliminar_usuario(self, treeview):
@@ -518,22 +3935,24 @@ class Dashboard:
         if not selected_items:
             messagebox.showerror("Error", "Por favor seleccione un usuario para eliminar.")
             return
+        if len(selected_items) > 1:
+            # Varios: una confirmación y una sola baja en bloque en el diario, con la versión de cada uno
+            clientes = treeview.lista_virtual.modelos(selected_items)
+            if not messagebox.askyesno("Confirmar", f"¿Está seguro que desea eliminar {len(clientes)} usuarios?"):
+                return
+            originales = {cliente.id_cliente: self._valores_originales(cliente, "clientes") for cliente in clientes}
+            if self._registrar_cambio(self._cambio_en_bloque("clientes", "eliminar", originales)):
+                messagebox.showinfo("Éxito", f"{len(clientes)} usuarios eliminados.")
+            return
 
-        selected_item = selected_items[0]
-        id_cliente = treeview.item(selected_item)['values'][0]
+        cliente = treeview.lista_virtual.modelo(selected_items[0])
+        original = self._valores_originales(cliente, "clientes")
 
         respuesta = messagebox.askyesno("Confirmar", "¿Está seguro que desea eliminar este usuario?")
         if respuesta:
-            self.conexion_bd.conectar()
-            try:
-                query = "DELETE FROM clientes WHERE id_cliente = %s"
-                self.conexion_bd.cursor.execute(query, (id_cliente,))
-                self.conexion_bd.conn.commit()
+            # Se guarda en el diario local; la lista se refresca cuando llega al servidor
+            if self._registrar_cambio(("clientes", "eliminar", cliente.id_cliente, None, original)):
                 messagebox.showinfo("Éxito", "Usuario eliminado exitosamente.")
-                self.actualizar_usuarios(treeview)  # Recargar la lista de usuarios
-            except pymysql.MySQLError as e:
-                print(f"Error al eliminar el usuario: {e}")
-                messagebox.showerror("Error", "Hubo un problema al eliminar el usuario.")
     def editar_usuario(self, treeview):
 
         selected_items = treeview.selection()
@@ -541,13 +3960,9 @@ class Dashboard:
             messagebox.showerror("Error", "Por favor seleccione un usuario para editar.")
             return
 
-        selected_item = selected_items[0]
-        id_cliente = treeview.item(selected_item)['values'][0]
-        nombre = treeview.item(selected_item)['values'][1]
-        apellido = treeview.item(selected_item)['values'][2]
-        telefono = treeview.item(selected_item)['values'][3]
-        correo = treeview.item(selected_item)['values'][4]
-        usuario = treeview.item(selected_item)['values'][5]
+        # Los valores del modelo, con sus tipos (el Treeview los pasa a texto)
+        cliente = treeview.lista_virtual.modelo(selected_items[0])
+        original = self._valores_originales(cliente, "clientes")
 
         # Crear la ventana de edición
         ventana_editar = tk.Toplevel(self.ventana_dashboard)
@@ -558,31 +3973,31 @@ class Dashboard:
         label_nombre = tk.Label(ventana_editar, text="Nombre:")
         label_nombre.pack(pady=10)
         entry_nombre = tk.Entry(ventana_editar)
-        entry_nombre.insert(0, nombre)  # Rellenar con el valor actual
+        entry_nombre.insert(0, cliente.nombre)  # Rellenar con el valor actual
         entry_nombre.pack(pady=10)
 
         label_apellido = tk.Label(ventana_editar, text="Apellido:")
         label_apellido.pack(pady=10)
         entry_apellido = tk.Entry(ventana_editar)
-        entry_apellido.insert(0, apellido)  # Rellenar con el valor actual
+        entry_apellido.insert(0, cliente.apellido)  # Rellenar con el valor actual
         entry_apellido.pack(pady=10)
 
         label_telefono = tk.Label(ventana_editar, text="Teléfono:")
         label_telefono.pack(pady=10)
         entry_telefono = tk.Entry(ventana_editar)
-        entry_telefono.insert(0, telefono)  # Rellenar con el valor actual
+        entry_telefono.insert(0, cliente.telefono)  # Rellenar con el valor actual
         entry_telefono.pack(pady=10)
 
         label_correo = tk.Label(ventana_editar, text="Correo Electrónico:")
         label_correo.pack(pady=10)
         entry_correo = tk.Entry(ventana_editar)
-        entry_correo.insert(0, correo)  # Rellenar con el valor actual
+        entry_correo.insert(0, cliente.correo_electronico)  # Rellenar con el valor actual
         entry_correo.pack(pady=10)
 
         label_usuario = tk.Label(ventana_editar, text="Usuario:")
         label_usuario.pack(pady=10)
         entry_usuario = tk.Entry(ventana_editar)
-        entry_usuario.insert(0, usuario)  # Rellenar con el valor actual
+        entry_usuario.insert(0, cliente.usuario)  # Rellenar con el valor actual
         entry_usuario.pack(pady=10)
 
         def guardar_edicion():
@@ -595,32 +4010,28 @@ class Dashboard:
 
             # Actualizar en la base de datos
             if nuevo_nombre and nuevo_apellido and nuevo_telefono and nuevo_correo and nuevo_usuario:
-                try:
-                    self.conexion_bd.conectar()
-                    query_actualizar = """
-                    UPDATE clientes
-                    SET nombre = %s, apellido = %s, telefono = %s, correo_electronico = %s, usuario = %s
-                    WHERE id_cliente = %s
-                    """
-                    self.conexion_bd.cursor.execute(query_actualizar, (nuevo_nombre, nuevo_apellido, nuevo_telefono, nuevo_correo, nuevo_usuario, id_cliente))
-                    self.conexion_bd.conn.commit()
+                datos = {"nombre": nuevo_nombre, "apellido": nuevo_apellido, "telefono": nuevo_telefono,
+                         "correo_electronico": nuevo_correo, "usuario": nuevo_usuario}
+                # Se guarda en el diario local; si otro usuario cambió el cliente mientras
+                # tanto, el cambio queda en conflicto en vez de sobrescribirlo
+                if self._registrar_cambio(("clientes", "actualizar", cliente.id_cliente, datos, original)):
                     messagebox.showinfo("Éxito", "Datos del cliente actualizados.")
                     ventana_editar.destroy()
-                    self.actualizar_usuarios(treeview)  # Recargar los datos en el Treeview
-                except pymysql.MySQLError as e:
-                    print(f"Error al actualizar el cliente: {e}")
-                    messagebox.showerror("Error", "Hubo un problema al actualizar los datos.")
-
-            # Botón para guardar la edición
-            boton_guardar = tk.Button(ventana_editar, text="Guardar", command=guardar_edicion)
-            boton_guardar.pack(pady=20)
+
+        # Botón para guardar la edición
+        boton_guardar = tk.Button(ventana_editar, text="Guardar", command=guardar_edicion)
+        boton_guardar.pack(pady=20)
     #GESTION2 PRODUCTOS
     def gestion_productos(self):
         """Función que abre la ventana de gestión de productos y muestra un listado con sus detalles"""
+        # Si ya está abierta se trae al frente con sus datos, búsqueda y desplazamiento;
+        # se refresca con "Actualizar" o cuando se modifican los datos
+        if self._traer_al_frente(self.ventana_productos):
+            return
         print("Abriendo gestión de productos...")
 
         # Crear la nueva ventana para gestionar productos
-        ventana_productos = tk.Toplevel(self.ventana_dashboard)
+        ventana_productos = self.ventana_productos = tk.Toplevel(self.ventana_dashboard)
         ventana_productos.title("Gestión de Productos")
         ventana_productos.geometry("800x600")
 
@@ -628,11 +4039,57 @@ class Dashboard:
         label_titulo = tk.Label(ventana_productos, text="Listado de Productos Registrados", font=("Arial", 14))
         label_titulo.pack(pady=10)
 
+        # Indicador de carga mientras las consultas corren en segundo plano
+        label_cargando = tk.Label(ventana_productos, text="", font=("Arial", 10), fg="#7f8c8d")
+        label_cargando.pack()
+        self.servicio_bd.registrar_indicador(ventana_productos, label_cargando)
+
+        # Búsqueda mientras se escribe, sobre el índice local (sin consultar la base de datos)
+        frame_busqueda = tk.Frame(ventana_productos)
+        frame_busqueda.pack(pady=5, padx=20, fill="x")
+
+        label_buscar = tk.Label(frame_busqueda, text="Buscar:", font=("Arial", 12))
+        label_buscar.pack(side="left")
+
+        entry_buscar = tk.Entry(frame_busqueda, font=("Arial", 12))
+        entry_buscar.pack(side="left", fill="x", expand=True, padx=10)
+
+        label_resultados = tk.Label(frame_busqueda, text="", font=("Arial", 10), fg="#7f8c8d")
+        label_resultados.pack(side="right")
+
+        # Filtro por categoría: se aplica en el servidor a cada página y también a la búsqueda
+        todas = "Todas las categorías"
+        combo_categoria = ttk.Combobox(frame_busqueda, values=(todas,), state="readonly", width=22)
+        combo_categoria.current(0)
+        combo_categoria.pack(side="right", padx=10)
+
+        def cargar_categorias():
+            def al_terminar(categorias):
+                if combo_categoria.winfo_exists():
+                    combo_categoria["values"] = (todas,) + tuple(sorted(fila[0] for fila in categorias))
+
+            self.servicio_bd.ejecutar(self.datos.resumen_inventario, al_terminar, clave="categorias_productos",
+                                      ventana=ventana_productos)
+
+        # Al desplegarlo se vuelven a pedir: las categorías nuevas aparecen desde el siguiente despliegue
+        combo_categoria.configure(postcommand=cargar_categorias)
+        cargar_categorias()
+
         # Crear el árbol de visualización de productos (usando Treeview de tkinter)
         columnas = ("ID Producto", "Nombre", "Categoría", "Precio", "Cantidad", "Descripción")
 
-        treeview = ttk.Treeview(ventana_productos, columns=columnas, show="headings", height=15)
-        treeview.pack(pady=10, padx=20, fill="both", expand=True)
+        frame_lista = tk.Frame(ventana_productos)
+        frame_lista.pack(pady=10, padx=20, fill="both", expand=True)
+
+        treeview = self.treeview_productos = ttk.Treeview(frame_lista, columns=columnas, show="headings", height=15,
+                                                           selectmode="extended")  # Varias filas con Ctrl/Mayús
+        treeview.pack(side="left", fill="both", expand=True)
+
+        # Lista virtual: carga páginas por id a medida que se desplaza
+        treeview.lista_virtual = ListaVirtual(treeview, self.servicio_bd, self.datos.pagina_productos,
+                                              self.catalogo_productos, AccesoDatos.ORDENES_PRODUCTOS,
+                                              mensaje_error="No se pudieron obtener los datos de los productos.")
+        treeview.lista_virtual.scrollbar.pack(side="right", fill="y")
 
         # Configurar las columnas
         treeview.heading("ID Producto", text="ID Producto")
@@ -650,54 +4107,117 @@ class Dashboard:
         treeview.column("Cantidad", width=100, anchor="w")
         treeview.column("Descripción", width=200, anchor="w")
 
-        # Conectar a la base de datos para obtener la lista de productos
-        self.conexion_bd.conectar()
-
-        try:
-            # Consulta SQL para obtener los datos de la tabla productos
-            query = """
-            SELECT id_producto, nombre, categoria, precio, cantidad, descripcion FROM productos
-            """
-            self.conexion_bd.cursor.execute(query)
-            productos = self.conexion_bd.cursor.fetchall()
-
-            # Agregar los productos al treeview
-            for producto in productos:
-                treeview.insert("", "end", values=producto)
-
-        except pymysql.MySQLError as e:
-            print(f"Error al obtener productos: {e}")
-            messagebox.showerror("Error", "No se pudieron obtener los datos de los productos.")
-
-        finally:
-            self.conexion_bd.cerrar()
+        # Clic en un encabezado para ordenar (otro clic invierte el orden)
+        self._encabezados_ordenables(treeview, {"ID Producto": None, "Nombre": "nombre", "Categoría": "categoria",
+                                                "Precio": "precio", "Cantidad": "cantidad"})
+
+        # Cargar la lista de productos en segundo plano, sin congelar la ventana
+        self.actualizar_productos(treeview)
+
+        # Elegir búsqueda local o en el servidor (y construir el índice si toca)
+        # mientras el usuario ve la primera página
+        self.preparar_indice_productos()
+
+        def buscar():
+            if not entry_buscar.winfo_exists():
+                return
+            texto = entry_buscar.get().strip()
+            if not texto:
+                label_resultados.config(text="")
+                treeview.lista_virtual.quitar_filtro()
+                return
+            inicio = time.perf_counter()
+
+            def mostrar_total(total):
+                if label_resultados.winfo_exists():
+                    label_resultados.config(text=f"{total} resultados ({(time.perf_counter() - inicio) * 1000:.0f} ms)")
+
+            if self.busqueda_en_servidor:
+                # Catálogo grande: búsqueda FULLTEXT por relevancia, sin traer filas de más
+                label_resultados.config(text="Buscando...")
+                treeview.lista_virtual.mostrar_filtradas(lambda: self.datos.buscar_productos(texto),
+                                                         en_segundo_plano=True, al_mostrar=mostrar_total)
+                return
+            if self.indice_productos is None:
+                label_resultados.config(text="Indexando catálogo...")
+                self.preparar_indice_productos(buscar)  # Repetir la búsqueda cuando esté listo
+                return
+            mostrar_total(treeview.lista_virtual.mostrar_filtradas(lambda: self.indice_productos.buscar(texto)))
+
+        busqueda_pendiente = [None]
+
+        def al_escribir(event):
+            # Esperar una pausa breve entre teclas antes de filtrar
+            if busqueda_pendiente[0]:
+                ventana_productos.after_cancel(busqueda_pendiente[0])
+            busqueda_pendiente[0] = ventana_productos.after(100, buscar)
+
+        entry_buscar.bind("<KeyRelease>", al_escribir)
+
+        def al_elegir_categoria(event):
+            categoria = combo_categoria.get()
+            treeview.lista_virtual.filtrar_columnas(None if categoria == todas else {"categoria": categoria})
+
+        combo_categoria.bind("<<ComboboxSelected>>", al_elegir_categoria)
 
-        # Función para cambiar el color de fondo de una fila seleccionada y mostrar un alert
+        # Función para cambiar el color de fondo de una fila seleccionada
         def seleccionar_fila(event):
             item = treeview.focus()  # Obtener la fila seleccionada
             if item:
                 # Cambiar el color de fondo a verde
                 treeview.item(item, tags="seleccionada")
 
-                # Obtener los datos del producto seleccionado
-                producto_seleccionado = treeview.item(item)['values']
+                # Con Shift o Ctrl se eligen varias filas: solo se informa cuántas
+                seleccion = treeview.selection()
+                if len(seleccion) > 1:
+                    label_mensaje.config(text=f"{len(seleccion)} productos seleccionados", fg="green")
+                    return
 
-                # Mostrar un alert con el mensaje de éxito
-                messagebox.showinfo("Éxito", f"Producto seleccionado: {producto_seleccionado[1]}", icon='info')
+                # Obtener los datos del producto seleccionado
+                producto = treeview.lista_virtual.modelo(item)
 
                 # Crear un mensaje visual dentro de la ventana (por ejemplo, debajo del treeview)
-                label_mensaje.config(text=f"Producto seleccionado: {producto_seleccionado[1]}", fg="green")
+                label_mensaje.config(text=f"Producto seleccionado: {producto.nombre}", fg="green")
+
+        # El aviso con los datos solo aparece con doble clic, para no interrumpir la selección
+        def mostrar_detalle(event):
+            item = treeview.identify_row(event.y)
+            if item:
+                producto = treeview.lista_virtual.modelo(item)
+                messagebox.showinfo("Producto", f"Producto seleccionado: {producto.nombre}", icon='info', parent=treeview)
 
         # Añadir estilo para filas seleccionadas
         treeview.tag_configure("seleccionada", background="lightgreen")
 
         # Asociar la función de cambio de color con el evento de clic en las filas
         treeview.bind("<ButtonRelease-1>", seleccionar_fila)
+        treeview.bind("<Double-1>", mostrar_detalle)
 
         # Crear un label para mostrar el mensaje de éxito (lo pondremos debajo del treeview)
         label_mensaje = tk.Label(ventana_productos, text="", font=("Arial", 12), fg="green")
         label_mensaje.pack(pady=10)
 
+        # Descripción completa del producto seleccionado (la lista muestra solo el comienzo)
+        label_descripcion = tk.Label(ventana_productos, text="", font=("Arial", 10), wraplength=740, justify="left")
+        label_descripcion.pack(padx=20, fill="x")
+
+        def mostrar_descripcion(event):
+            seleccion = treeview.selection()
+            if len(seleccion) != 1:
+                label_descripcion.config(text="")
+                return
+            producto = treeview.lista_virtual.modelo(seleccion[0])
+
+            def mostrar(descripcion):
+                # Puede llegar después de que el usuario eligió otra fila o cerró la ventana
+                if label_descripcion.winfo_exists() and treeview.selection() == seleccion:
+                    label_descripcion.config(text=descripcion or "")
+
+            self.descripcion_producto(producto.id_producto, mostrar, clave=("descripcion", str(treeview)),
+                                      ventana=ventana_productos)
+
+        treeview.bind("<<TreeviewSelect>>", mostrar_descripcion)
+
         # Botones de gestión
         frame_botones = tk.Frame(ventana_productos)
         frame_botones.pack(pady=20)
@@ -724,32 +4244,619 @@ class Dashboard:
         # Botón de salir
         boton_salir = tk.Button(frame_botones, text="Salir", bg="#95A5A6", fg="white", font=("Arial", 12), command=ventana_productos.destroy)
         boton_salir.grid(row=0, column=3, padx=10)
-    def actualizar_productos(self, treeview):
-        # Limpiar los datos actuales en el treeview
-        for item in treeview.get_children():
-            treeview.delete(item)
 
-        # Volver a obtener los datos actualizados de la base de datos
-        self.conexion_bd.conectar()
+        # Botón de importar productos desde CSV
+        boton_importar = tk.Button(frame_botones, text="Importar CSV", bg="#8E44AD", fg="white", font=("Arial", 12),
+                                   command=lambda: self.importar_productos(treeview))
+        boton_importar.grid(row=1, column=0, padx=10, pady=10)
+
+        # Botón de exportar productos a CSV o JSON Lines
+        boton_exportar = tk.Button(frame_botones, text="Exportar", bg="#16A085", fg="white", font=("Arial", 12),
+                                   command=lambda: self.exportar_datos("productos", treeview))
+        boton_exportar.grid(row=1, column=1, padx=10, pady=10)
+
+        # Botón de registrar entradas, salidas o ajustes de stock
+        boton_movimiento = tk.Button(frame_botones, text="Movimiento de stock", bg="#D35400", fg="white", font=("Arial", 12),
+                                     command=lambda: self.registrar_movimiento(treeview))
+        boton_movimiento.grid(row=1, column=2, padx=10, pady=10)
+
+        # Botón de fijar el umbral de reposición (aviso de stock bajo)
+        boton_umbral = tk.Button(frame_botones, text="Umbral de stock", bg="#F39C12", fg="white", font=("Arial", 12),
+                                 command=lambda: self.fijar_umbral(treeview))
+        boton_umbral.grid(row=1, column=3, padx=10, pady=10)
+
+        # Cambios sobre todos los productos seleccionados, en una transacción
+        boton_categoria = tk.Button(frame_botones, text="Cambiar categoría", bg="#2980B9", fg="white", font=("Arial", 12),
+                                    command=lambda: self.cambiar_categoria(treeview))
+        boton_categoria.grid(row=2, column=0, padx=10)
+
+        boton_existencia = tk.Button(frame_botones, text="Fijar existencia", bg="#D35400", fg="white", font=("Arial", 12),
+                                     command=lambda: self.fijar_existencia(treeview))
+        boton_existencia.grid(row=2, column=1, padx=10)
+
+    def preparar_indice_productos(self, al_listo=None):
+        """Construye una sola vez, en segundo plano, el índice de búsqueda de productos.
+
+        Si el catálogo supera ``LIMITE_INDICE_LOCAL`` productos no se construye: la
+        búsqueda pasa a hacerse en el servidor con el índice FULLTEXT.
+        """
+        if self.indice_productos is not None or self.busqueda_en_servidor:
+            if al_listo:
+                al_listo()
+            return
+        if al_listo:
+            self._al_indice_listo.append(al_listo)
+        if self._indexando:
+            return
+        self._indexando = True
+
+        def construir():
+            if self.datos.estimar_total_productos() > self.LIMITE_INDICE_LOCAL:
+                return None
+            indice = IndiceBusqueda(self.catalogo_productos)
+            indice.construir(self.datos.iterar_productos())
+            return indice
+
+        def al_terminar(indice):
+            # Aplicar los cambios hechos desde esta ventana mientras se construía
+            for fila, eliminar in self._cambios_indice if indice is not None else ():
+                if eliminar is not None:
+                    indice.eliminar(eliminar)
+                else:
+                    indice.agregar(fila)
+            self.busqueda_en_servidor = indice is None
+            self._cambios_indice = []
+            self._indexando = False
+            self.indice_productos = indice
+            pendientes, self._al_indice_listo = self._al_indice_listo, []
+            for funcion in pendientes:
+                funcion()
+
+        def al_fallar(error):
+            self._indexando = False
+            self._al_indice_listo = []
+            print(f"Error al construir el índice de productos: {error}")
+
+        self.servicio_bd.ejecutar(construir, al_terminar, al_fallar=al_fallar, clave="indice_productos")
+
+    def actualizar_indice_productos(self, fila=None, eliminar=None):
+        """Aplica al índice de búsqueda un producto nuevo o editado, o una eliminación"""
+        if self.indice_productos is None:
+            if self._indexando:
+                self._cambios_indice.append((fila, eliminar))
+            return
+        if eliminar is not None:
+            self.indice_productos.eliminar(eliminar)
+        else:
+            self.indice_productos.agregar(fila)
+
+    def reindexar_productos(self, ids):
+        """Vuelve a leer esos productos del servidor y los actualiza en el índice de búsqueda"""
+        if not ids or (self.indice_productos is None and not self._indexando):
+            return
+
+        def al_terminar(filas):
+            for fila in filas:
+                self.actualizar_indice_productos(fila)
+
+        # El índice recibe las filas tal como quedaron en el servidor (ids nuevos, existencia real)
+        self.servicio_bd.ejecutar(lambda: self.datos.productos_por_id(ids), al_terminar)
+
+    def invalidar_indice_productos(self):
+        """Descarta el índice tras cambios masivos; se reconstruye con la próxima búsqueda"""
+        self.indice_productos = None
+        self.busqueda_en_servidor = False  # El tamaño del catálogo se vuelve a evaluar
+        self._cambios_indice = []
+        if self._indexando:
+            self._indexando = False
+            self.preparar_indice_productos()  # Reemplaza a la construcción en curso (misma clave)
 
+    def actualizar_productos(self, treeview):
+        """Refresca la lista de productos aplicando solo los cambios; un nuevo clic descarta la carga anterior"""
+        treeview.lista_virtual.refrescar()
+        self.actualizar_resumen()  # Los indicadores cambian con cada alta, edición o movimiento
+        self.alertas_stock.revisar()  # La existencia pudo cruzar algún umbral
+
+    def actualizar_resumen(self):
+        """Vuelve a leer los indicadores de inventario del Dashboard, si está abierto"""
+        if self.treeview_resumen is None or not self.treeview_resumen.winfo_exists():
+            return
+
+        def al_terminar(categorias):
+            if not self.treeview_resumen.winfo_exists():
+                return
+            totales = {
+                "productos": sum(fila[1] for fila in categorias),
+                "unidades": sum(fila[2] for fila in categorias),
+                "valor": sum((fila[3] for fila in categorias), Decimal(0)),
+                "agotados": sum(fila[4] for fila in categorias),
+            }
+            for clave, total in totales.items():
+                texto = f"${total:,.2f}" if clave == "valor" else f"{total:,}"
+                self.labels_resumen[clave].config(text=texto)
+            self.treeview_resumen.delete(*self.treeview_resumen.get_children())
+            for categoria, productos, unidades, valor, agotados in categorias:
+                self.treeview_resumen.insert("", "end", values=(categoria, productos, unidades, f"{valor:,.2f}", agotados))
+
+        self.servicio_bd.ejecutar(self.datos.resumen_inventario, al_terminar, clave="resumen_inventario",
+                                  ventana=self.ventana_dashboard,
+                                  mensaje_error="No se pudieron obtener los indicadores de inventario.")
+
+    def mostrar_alertas_stock(self, nuevos, total):
+        """Un solo aviso por revisión con todos los productos que acaban de quedar bajo su umbral"""
+        if self.label_alertas is not None and self.label_alertas.winfo_exists():
+            self.label_alertas.config(text=f"⚠ {total} productos con stock bajo" if total else "")
+        if not nuevos:
+            return
+        lineas = [f"• {nombre}: {cantidad} (umbral {umbral})" for _, nombre, cantidad, umbral in nuevos[:10]]
+        if len(nuevos) > 10:
+            lineas.append(f"... y {len(nuevos) - 10} más")
+        messagebox.showwarning("Stock bajo", "Productos por debajo de su umbral de reposición:\n\n" + "\n".join(lineas))
+
+    def fijar_umbral(self, treeview):
+        """Pide el umbral de reposición y lo aplica a los productos seleccionados"""
+        seleccion = treeview.selection()
+        if not seleccion:
+            messagebox.showerror("Error", "Por favor seleccione uno o más productos.")
+            return
+        texto = simpledialog.askstring("Umbral de stock", "Avisar cuando la cantidad llegue a\n(vacío: sin aviso):",
+                                       parent=treeview.winfo_toplevel())
+        if texto is None:
+            return
+        # Sin umbral (NULL) el producto no avisa nunca, ni siquiera agotado (migraciones/010)
+        try:
+            umbral = int(texto) if texto.strip() else None
+        except ValueError:
+            messagebox.showerror("Error", "El umbral debe ser un número entero.")
+            return
+        if umbral is not None and umbral < 0:
+            messagebox.showerror("Error", "El umbral no puede ser negativo.")
+            return
+        # Una edición en bloque en el diario. El umbral no está en la lista: solo se
+        # envía la versión, y si otro guardó antes se aplica sobre la nueva
+        originales = {producto.id_producto: {"version": producto.version}
+                      for producto in treeview.lista_virtual.modelos(seleccion)}
+        if self._registrar_cambio(self._cambio_en_bloque("productos", "actualizar", originales, {"umbral": umbral})):
+            messagebox.showinfo("Éxito", "Umbral actualizado.")
+
+    def cambiar_categoria(self, treeview):
+        """Asigna una categoría a todos los productos seleccionados, a través del diario"""
+        seleccion = treeview.selection()
+        if not seleccion:
+            messagebox.showerror("Error", "Por favor seleccione uno o más productos.")
+            return
+        categoria = simpledialog.askstring("Cambiar categoría", f"Nueva categoría para {len(seleccion)} productos:",
+                                           parent=treeview.winfo_toplevel())
+        if not categoria or not categoria.strip():
+            return
+        categoria = categoria.strip()
+        # Una edición en bloque en el diario: si otro cambió la categoría de alguno
+        # mientras tanto, el bloque queda en conflicto; otros cambios no la impiden
+        originales = {producto.id_producto: {"categoria": producto.categoria, "version": producto.version}
+                      for producto in treeview.lista_virtual.modelos(seleccion) if producto.categoria != categoria}
+        if not originales or self._registrar_cambio(
+                self._cambio_en_bloque("productos", "actualizar", originales, {"categoria": categoria})):
+            messagebox.showinfo("Éxito", f"{len(originales)} productos pasaron a {categoria}.")
+
+    def fijar_existencia(self, treeview):
+        """Deja la misma existencia en todos los productos seleccionados (recuento), como ajustes en el diario"""
+        seleccion = treeview.selection()
+        if not seleccion:
+            messagebox.showerror("Error", "Por favor seleccione uno o más productos.")
+            return
+        cantidad = simpledialog.askinteger("Fijar existencia", f"Existencia para {len(seleccion)} productos:",
+                                           parent=treeview.winfo_toplevel(), minvalue=0)
+        if cantidad is None:
+            return
+        # Un recuento es un valor absoluto: el diario guarda la existencia final y al
+        # aplicarlo se registra como ajuste la diferencia con la existencia del momento
+        ids = [producto.id_producto for producto in treeview.lista_virtual.modelos(seleccion)]
+        cambio = ("productos", "bloque", None, {"accion": "fijar", "ids": ids, "cantidad": cantidad,
+                                                "motivo": "Existencia fijada", "usuario": self.usuario_logueado}, None)
+        if self._registrar_cambio(cambio):
+            messagebox.showinfo("Éxito", f"Existencia de {len(ids)} productos fijada en {cantidad}.")
+
+    @staticmethod
+    def _validar_producto(nombre, categoria, precio, cantidad, descripcion):
+        """{columna: valor} con precio Decimal y cantidad int, con las reglas de la importación
+        (ImportadorProductos.validar); None tras avisar si algún dato no es válido."""
+        try:
+            _, *valores = ImportadorProductos.validar({"nombre": nombre, "categoria": categoria, "precio": precio,
+                                                       "cantidad": cantidad, "descripcion": descripcion})
+        except ValueError as e:
+            messagebox.showerror("Error", f"Datos no válidos: {e}.")
+            return None
+        return dict(zip(ImportadorProductos.COLUMNAS, valores))
+
+    @staticmethod
+    def _cambio_en_bloque(tabla, accion, originales, valores=None):
+        """Un solo cambio del diario para varias filas. ``originales`` es {clave: valores
+        que ve el usuario, con su versión}; se aplica con una sentencia por tramo de ids."""
+        datos = {"accion": accion, "ids": list(originales)}
+        if valores is not None:
+            datos["valores"] = valores
+        return tabla, "bloque", None, datos, {str(clave): original for clave, original in originales.items()}
+
+    def _registrar_cambio(self, *cambios):
+        """Guarda los cambios (tabla, operacion, clave, datos, original) en el diario local.
+
+        No espera al servidor: el sincronizador los envía en segundo plano y las
+        listas se refrescan cuando llegan. Devuelve False si no se pudieron guardar.
+        """
         try:
-            # Consulta SQL para obtener los datos actualizados de la tabla productos
-            query = """
-            SELECT id_producto, nombre, categoria, precio, cantidad, descripcion FROM productos
-            """
-            self.conexion_bd.cursor.execute(query)
-            productos = self.conexion_bd.cursor.fetchall()
+            self.diario.registrar_lote(cambios)
+        except sqlite3.Error as e:
+            print(f"Error al guardar en el diario local: {e}")
+            messagebox.showerror("Error", "No se pudo guardar el cambio en el diario local.")
+            return False
+        self.mostrar_estado_diario()
+        self.sincronizador.avisar()
+        return True
+
+    @staticmethod
+    def _valores_originales(modelo, tabla, descripcion=None):
+        """{columna: valor} del modelo tal como lo ve el usuario, para detectar conflictos al enviar.
+
+        El modelo de producto solo tiene el resumen de la descripcion: se compara
+        la descripcion completa si se conoce y, si no, no se compara.
+        """
+        _, columnas = DiarioCambios.COLUMNAS[tabla]
+        original = {columna: getattr(modelo, columna) for columna in columnas if columna in modelo.CAMPOS}
+        if descripcion is not None:
+            original["descripcion"] = descripcion
+        # La existencia cambia con cada movimiento y se envía como delta: no se compara
+        original.pop("cantidad", None)
+        # El servidor solo acepta el cambio si la fila sigue en esta versión
+        original["version"] = modelo.version
+        return original
+
+    def descripcion_producto(self, id_producto, al_obtener, clave=None, ventana=None):
+        """Llama a ``al_obtener(descripcion)`` con la descripcion completa del producto.
+
+        Sale de la caché LRU si está; si no, se pide al servidor en segundo plano.
+        """
+        if id_producto in self.descripciones:
+            al_obtener(self.descripciones.get(id_producto))
+            return
 
-            # Agregar los productos al treeview
-            for producto in productos:
-                treeview.insert("", "end", values=producto)
+        def al_terminar(descripciones):
+            descripcion = descripciones.get(id_producto)
+            self.descripciones[id_producto] = descripcion
+            al_obtener(descripcion)
 
-        except pymysql.MySQLError as e:
-            print(f"Error al obtener productos: {e}")
-            messagebox.showerror("Error", "No se pudieron obtener los datos de los productos.")
+        self.servicio_bd.ejecutar(lambda: self.datos.descripciones_productos([id_producto]), al_terminar,
+                                  clave=clave, ventana=ventana,
+                                  mensaje_error="No se pudo obtener la descripción del producto.")
 
-        finally:
-            self.conexion_bd.cerrar()
+    def mostrar_estado_diario(self):
+        if self.label_sincronizacion is None or not self.label_sincronizacion.winfo_exists():
+            return
+        pendientes, conflictos = self.diario.contar()
+        partes = []
+        if pendientes:
+            partes.append(f"⟳ {pendientes} cambios sin enviar" + (" (sin conexión)" if self.sincronizador.sin_conexion else ""))
+        if conflictos:
+            partes.append(f"⚠ {conflictos} en conflicto")
+        self.label_sincronizacion.config(text="  ".join(partes), fg="#E74C3C" if conflictos else "#F1C40F")
+
+    def _al_sincronizar(self, aplicados):
+        """Se llama tras cada envío del diario con los cambios que llegaron al servidor"""
+        self.mostrar_estado_diario()
+        if not aplicados:
+            return
+        if self.monitor_cambios.listo:
+            # Lo enviado llega a las listas y al índice como cualquier otro cambio
+            self.monitor_cambios.revisar()
+            return
+        tablas = {tabla for tabla, _, _ in aplicados}
+        if "clientes" in tablas and self.treeview_usuarios is not None and self.treeview_usuarios.winfo_exists():
+            self.actualizar_usuarios(self.treeview_usuarios)
+        if "productos" not in tablas:
+            return
+
+        for tabla, _, clave in aplicados:
+            if tabla == "productos":
+                self.descripciones.descartar(clave)
+        eliminados = {clave for tabla, operacion, clave in aplicados if tabla == "productos" and operacion == "eliminar"}
+        for id_producto in eliminados:
+            self.actualizar_indice_productos(eliminar=id_producto)
+        self.reindexar_productos({clave for tabla, _, clave in aplicados if tabla == "productos"} - eliminados)
+
+        if self.treeview_productos is not None and self.treeview_productos.winfo_exists():
+            self.actualizar_productos(self.treeview_productos)
+        else:
+            self.actualizar_resumen()
+            self.alertas_stock.revisar()
+
+    def _al_recibir_cambios(self, cambios):
+        """Aplica a las listas abiertas y al índice lo que cambió en otras terminales
+        (MonitorCambios). Con ``None`` hubo demasiados cambios y se recarga todo."""
+        productos_abiertos = self.treeview_productos is not None and self.treeview_productos.winfo_exists()
+        clientes_abiertos = self.treeview_usuarios is not None and self.treeview_usuarios.winfo_exists()
+        if cambios is None:
+            self.descripciones.limpiar()
+            self.invalidar_indice_productos()
+            if clientes_abiertos:
+                self.actualizar_usuarios(self.treeview_usuarios)
+            if productos_abiertos:
+                self.actualizar_productos(self.treeview_productos)
+            else:
+                self.actualizar_resumen()
+                self.alertas_stock.revisar()
+            return
+
+        eliminados = cambios["eliminados"]
+        if cambios["clientes"] or eliminados["clientes"]:
+            modelos = self.catalogo_clientes.cargar_filas(cambios["clientes"])
+            for id_cliente in eliminados["clientes"]:
+                self.catalogo_clientes.quitar(id_cliente)
+            if clientes_abiertos:
+                self.treeview_usuarios.lista_virtual.aplicar_cambios(modelos, eliminados["clientes"])
+        if not (cambios["productos"] or eliminados["productos"]):
+            return
+
+        for fila in cambios["productos"]:
+            self.descripciones.descartar(fila[0])
+            self.actualizar_indice_productos(fila)
+        for id_producto in eliminados["productos"]:
+            self.descripciones.descartar(id_producto)
+            self.catalogo_productos.quitar(id_producto)
+            self.actualizar_indice_productos(eliminar=id_producto)
+        if productos_abiertos:
+            modelos = self.catalogo_productos.cargar_filas(cambios["productos"])
+            self.treeview_productos.lista_virtual.aplicar_cambios(modelos, eliminados["productos"])
+        self.actualizar_resumen()
+        self.alertas_stock.revisar()
+
+    def resolver_conflictos(self):
+        """Lista los cambios que el servidor no aceptó, con los valores actuales del servidor,
+        para reenviarlos sobre esos valores o descartarlos"""
+        conflictos = self.diario.conflictos()
+        if not conflictos:
+            return
+
+        ventana_conflictos = tk.Toplevel(self.ventana_dashboard)
+        ventana_conflictos.title("Cambios en conflicto")
+        ventana_conflictos.geometry("800x550")
+
+        columnas = ("ID", "Tabla", "Operación", "Registro", "Datos", "Motivo")
+        treeview = ttk.Treeview(ventana_conflictos, columns=columnas, show="headings", height=8)
+        for columna, ancho in zip(columnas, (50, 80, 90, 70, 250, 250)):
+            treeview.heading(columna, text=columna)
+            treeview.column(columna, width=ancho, anchor="w")
+        treeview.pack(pady=10, padx=20, fill="both", expand=True)
+
+        # El cambio seleccionado junto a lo que hay ahora en el servidor
+        columnas_comparacion = ("Campo", "Mi cambio", "Servidor")
+        treeview_comparacion = ttk.Treeview(ventana_conflictos, columns=columnas_comparacion, show="headings", height=6)
+        for columna, ancho in zip(columnas_comparacion, (150, 300, 300)):
+            treeview_comparacion.heading(columna, text=columna)
+            treeview_comparacion.column(columna, width=ancho, anchor="w")
+        treeview_comparacion.tag_configure("distinto", foreground="#E74C3C")
+        treeview_comparacion.pack(pady=5, padx=20, fill="x")
+        por_id = {}
+
+        def cargar():
+            treeview.delete(*treeview.get_children())
+            treeview_comparacion.delete(*treeview_comparacion.get_children())
+            por_id.clear()
+            for conflicto in self.diario.conflictos():
+                id_cambio, tabla, operacion, clave, datos, motivo, servidor = conflicto
+                por_id[str(id_cambio)] = conflicto
+                treeview.insert("", "end", iid=str(id_cambio),
+                                values=(id_cambio, tabla, operacion, clave or "", json.dumps(datos, ensure_ascii=False), motivo))
+
+        def comparar(event=None):
+            treeview_comparacion.delete(*treeview_comparacion.get_children())
+            seleccion = treeview.selection()
+            if not seleccion or seleccion[0] not in por_id:
+                return
+            _, _, operacion, _, datos, _, servidor = por_id[seleccion[0]]
+            if servidor is None:
+                treeview_comparacion.insert("", "end", values=("", "", "Valores del servidor no disponibles"))
+                return
+            # Un cambio en bloque trae los valores de cada fila en conflicto: {clave: valores}
+            if operacion == "bloque":
+                filas, datos = [(f"{clave} · ", valores) for clave, valores in servidor.items()], datos.get("valores", {})
+            else:
+                filas = [("", servidor)]
+            for prefijo, valores in filas:
+                for campo in [c for c in valores if c != "version"]:
+                    mio = datos.get(campo, valores[campo])
+                    distinto = campo in datos and not DiarioCambios._iguales(valores[campo], mio)
+                    treeview_comparacion.insert("", "end", values=(prefijo + campo, mio, valores[campo]),
+                                                tags=("distinto",) if distinto else ())
+                treeview_comparacion.insert("", "end", values=(prefijo + "version", "", valores["version"]))
+
+        treeview.bind("<<TreeviewSelect>>", comparar)
+
+        def resolver(accion):
+            seleccion = treeview.selection()
+            if not seleccion:
+                messagebox.showerror("Error", "Por favor seleccione uno o más cambios.", parent=ventana_conflictos)
+                return
+            for iid in seleccion:
+                accion(int(iid))
+            cargar()
+            self.mostrar_estado_diario()
+            self.sincronizador.avisar()
+
+        def forzar():
+            # Los conflictos sin valores del servidor (diarios anteriores) se reenvían sobre
+            # la fila y la versión que hay ahora en el servidor, nunca sin comparar
+            faltan = {}
+            for iid in treeview.selection():
+                _, tabla, operacion, clave, _, _, servidor = por_id[iid]
+                if servidor is None and clave is not None and operacion in ("actualizar", "eliminar"):
+                    faltan.setdefault(tabla, []).append(clave)
+
+            def leer_actuales():
+                actuales = {}
+                for tabla, claves in faltan.items():
+                    if tabla == "productos":
+                        columnas, filas = self.datos.COLUMNAS_PRODUCTOS, self.datos.productos_por_id(claves)
+                    else:
+                        columnas, filas = self.datos.COLUMNAS_CLIENTES, self.datos.clientes_por_id(claves)
+                    actuales.update({(tabla, fila[0]): dict(zip(columnas.split(", "), fila)) for fila in filas})
+                return actuales
+
+            def al_terminar(actuales):
+                resolver(lambda id_cambio: self.diario.forzar(
+                    id_cambio, actuales.get((por_id[str(id_cambio)][1], por_id[str(id_cambio)][3]))))
+
+            self.servicio_bd.ejecutar(leer_actuales, al_terminar, ventana=ventana_conflictos,
+                                      mensaje_error="No se pudieron leer los valores del servidor.")
+
+        frame_botones = tk.Frame(ventana_conflictos)
+        frame_botones.pack(pady=10)
+        # Forzar: se reenvía sobre los valores del servidor mostrados (si otro vuelve a
+        # guardar antes, queda otra vez en conflicto); Descartar: se queda lo del servidor
+        tk.Button(frame_botones, text="Forzar", bg="#F39C12", fg="white", font=("Arial", 12),
+                  command=forzar).grid(row=0, column=0, padx=10)
+        tk.Button(frame_botones, text="Descartar", bg="#E74C3C", fg="white", font=("Arial", 12),
+                  command=lambda: resolver(self.diario.descartar)).grid(row=0, column=1, padx=10)
+        tk.Button(frame_botones, text="Cerrar", bg="#95A5A6", fg="white", font=("Arial", 12),
+                  command=ventana_conflictos.destroy).grid(row=0, column=2, padx=10)
+        cargar()
+
+    def _cerrar_diario(self):
+        pendientes, conflictos = self.diario.contar()
+        if pendientes or conflictos:
+            # Quedan en el archivo: se envían al volver a abrir la aplicación
+            print(f"Quedan {pendientes} cambios sin enviar y {conflictos} en conflicto en {self.diario.ruta}")
+        self.diario.cerrar()
+
+    def exportar_datos(self, tabla, treeview):
+        """Exporta a CSV o JSON Lines en segundo plano, escribiendo por lotes, lo que muestra la lista:
+        con el filtro de columnas (p. ej. la categoría) y, si hay una búsqueda, solo sus resultados"""
+        lista = treeview.lista_virtual
+        filtro = lista.filtro_columnas
+        # Mientras hay búsqueda todas las filas están en la lista (no se pagina)
+        ids = [modelo.clave for modelo in lista.modelos(treeview.get_children())] if lista.filtro is not None else None
+        ruta = filedialog.asksaveasfilename(parent=treeview.winfo_toplevel(), title=f"Exportar {tabla}",
+                                            initialfile=f"{tabla}.csv", defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")])
+        if not ruta:
+            return
+
+        ventana_exportar = tk.Toplevel(self.ventana_dashboard)
+        ventana_exportar.title(f"Exportar {tabla.capitalize()}")
+        ventana_exportar.geometry("400x180")
+
+        label_archivo = tk.Label(ventana_exportar, text=f"Archivo: {os.path.basename(ruta)}", font=("Arial", 12))
+        label_archivo.pack(pady=10)
+        label_estado = tk.Label(ventana_exportar, text="Exportando...", font=("Arial", 10))
+        label_estado.pack(pady=5)
+
+        cancelar = threading.Event()
+
+        def al_progresar(filas):
+            label_estado.config(text=f"Filas exportadas: {filas}")
+
+        def al_terminar(filas):
+            if cancelar.is_set():
+                return
+            messagebox.showinfo("Exportación terminada", f"Se exportaron {filas} filas a:\n{ruta}")
+            ventana_exportar.destroy()
+
+        def cerrar():
+            cancelar.set()
+            ventana_exportar.destroy()
+
+        ventana_exportar.protocol("WM_DELETE_WINDOW", cerrar)
+        boton_cancelar = tk.Button(ventana_exportar, text="Cancelar", bg="#95A5A6", fg="white", font=("Arial", 12), command=cerrar)
+        boton_cancelar.pack(pady=10)
+
+        exportador = ExportadorDatos(self.datos)
+        progreso = lambda filas: self.servicio_bd.notificar(al_progresar, filas)
+        self.servicio_bd.ejecutar(lambda: exportador.exportar(tabla, ruta, filtro=filtro, al_progresar=progreso,
+                                                              cancelar=cancelar, ids=ids),
+                                  al_terminar, ventana=ventana_exportar, mensaje_error="No se pudo exportar el archivo.")
+    def importar_productos(self, treeview):
+        """Importa productos desde un archivo CSV en segundo plano, mostrando el progreso"""
+        if self.conexion_bd.motor == "servicio":
+            messagebox.showinfo("Importar CSV", "La importación necesita conexión directa a la base de datos.")
+            return
+        ruta = filedialog.askopenfilename(parent=treeview.winfo_toplevel(), title="Importar productos",
+                                          filetypes=[("Archivos CSV", "*.csv"), ("Todos los archivos", "*.*")])
+        if not ruta:
+            return
+
+        ventana_importar = tk.Toplevel(self.ventana_dashboard)
+        ventana_importar.title("Importar Productos")
+        ventana_importar.geometry("450x320")
+
+        label_archivo = tk.Label(ventana_importar, text=f"Archivo: {os.path.basename(ruta)}", font=("Arial", 12))
+        label_archivo.pack(pady=10)
+
+        var_actualizar = tk.BooleanVar(value=False)
+        check_actualizar = tk.Checkbutton(ventana_importar, text="Actualizar productos existentes (mismo ID)", variable=var_actualizar)
+        check_actualizar.pack(pady=5)
+
+        var_load_data = tk.BooleanVar(value=False)
+        check_load_data = tk.Checkbutton(ventana_importar, text="Usar LOAD DATA LOCAL INFILE si el servidor lo permite", variable=var_load_data)
+        check_load_data.pack(pady=5)
+
+        barra_progreso = ttk.Progressbar(ventana_importar, maximum=1.0, length=350)
+        barra_progreso.pack(pady=10)
+
+        label_estado = tk.Label(ventana_importar, text="", font=("Arial", 10))
+        label_estado.pack(pady=5)
+
+        cancelar = threading.Event()
+        ruta_rechazados = os.path.splitext(ruta)[0] + ".rechazados.csv"
+
+        def al_progresar(procesadas, importadas, rechazadas, fraccion):
+            if not ventana_importar.winfo_exists():
+                return  # Se canceló: el último lote todavía puede estar en curso
+            barra_progreso["value"] = fraccion
+            label_estado.config(text=f"Procesadas: {procesadas}  Importadas: {importadas}  Rechazadas: {rechazadas}")
+
+        def al_terminar(resumen):
+            # Aunque se haya cancelado y la ventana ya no exista, los lotes confirmados
+            # están en la base: el índice, las descripciones y la lista se refrescan igual
+            self.invalidar_indice_productos()  # El índice se reconstruye con los productos importados
+            self.descripciones.limpiar()  # La importación pudo cambiar descripciones
+            if treeview.winfo_exists():
+                self.actualizar_productos(treeview)  # Refrescar la lista de productos
+            else:
+                self.actualizar_resumen()
+                self.alertas_stock.revisar()
+            if not ventana_importar.winfo_exists():
+                return
+            mensaje = (f"Filas procesadas: {resumen['procesadas']}\n"
+                       f"Productos importados: {resumen['importadas']}\n"
+                       f"Filas rechazadas: {resumen['rechazadas']}")
+            if resumen["cancelada"]:
+                mensaje = "Importación cancelada.\n" + mensaje
+            if resumen["rechazadas"]:
+                mensaje += "\n\n" + "\n".join(resumen["motivos"][:5])
+                mensaje += f"\n\nDetalle de rechazos en: {ruta_rechazados}"
+            messagebox.showinfo("Importación terminada", mensaje)
+            ventana_importar.destroy()
+
+        def iniciar():
+            boton_iniciar.config(state="disabled")
+            importador = ImportadorProductos(self.conexion_bd, actualizar_existentes=var_actualizar.get(),
+                                             usar_load_data=var_load_data.get())
+            progreso = lambda *datos: self.servicio_bd.notificar(al_progresar, *datos)
+            # Atada al Dashboard y no a ventana_importar: al cancelar se cierra la ventana,
+            # pero al_terminar tiene que llegar para refrescar lo ya importado
+            self.servicio_bd.ejecutar(lambda: importador.importar(ruta, progreso, cancelar, ruta_rechazados), al_terminar,
+                                      ventana=self.ventana_dashboard, mensaje_error="No se pudo importar el archivo.")
+
+        def cerrar():
+            cancelar.set()  # Los lotes ya confirmados se conservan
+            ventana_importar.destroy()
+
+        ventana_importar.protocol("WM_DELETE_WINDOW", cerrar)
+
+        frame_botones = tk.Frame(ventana_importar)
+        frame_botones.pack(pady=10)
+        boton_iniciar = tk.Button(frame_botones, text="Importar", bg="#2ECC71", fg="white", font=("Arial", 12), command=iniciar)
+        boton_iniciar.grid(row=0, column=0, padx=10)
+        boton_cancelar = tk.Button(frame_botones, text="Cancelar", bg="#95A5A6", fg="white", font=("Arial", 12), command=cerrar)
+        boton_cancelar.grid(row=0, column=1, padx=10)
     def abrir_ventana_nuevo_producto(self, treeview):
         """Función para abrir la ventana para agregar un nuevo producto"""
         ventana_nuevo_producto = tk.Toplevel(self.ventana_dashboard)
@@ -789,23 +4896,15 @@ class Dashboard:
             descripcion = entry_descripcion.get()
 
             if nombre and categoria and precio and cantidad and descripcion:
-                try:
-                    self.conexion_bd.conectar()
-                    query_insertar = """
-                    INSERT INTO productos (nombre, categoria, precio, cantidad, descripcion)
-                    VALUES (%s, %s, %s, %s, %s)
-                    """
-                    self.conexion_bd.cursor.execute(query_insertar, (nombre, categoria, precio, cantidad, descripcion))
-                    self.conexion_bd.conn.commit()
+                datos = self._validar_producto(nombre, categoria, precio, cantidad, descripcion)
+                if datos is None:
+                    return
+                # Se guarda en el diario local; la lista y el índice de búsqueda se
+                # actualizan cuando llega al servidor (ahí recibe su id)
+                if self._registrar_cambio(("productos", "insertar", None, datos, None)):
                     messagebox.showinfo("Éxito", "Nuevo producto agregado.")
                     ventana_nuevo_producto.destroy()
 
-                    # Aquí se llama a la función para actualizar el treeview de la ventana principal
-                    self.actualizar_productos(treeview)  # Recargar la lista de productos
-                except pymysql.MySQLError as e:
-                    print(f"Error al agregar el producto: {e}")
-                    messagebox.showerror("Error", "Hubo un problema al agregar el producto.")
-
         boton_guardar = tk.Button(ventana_nuevo_producto, text="Guardar", command=guardar_nuevo_producto)
         boton_guardar.pack(pady=20)
     def eliminar_producto(self, treeview):
@@ -813,35 +4912,41 @@ class Dashboard:
         if not selected_items:
             messagebox.showerror("Error", "Por favor seleccione un producto para eliminar.")
             return
+        if len(selected_items) > 1:
+            # Varios: una confirmación y una sola baja en bloque en el diario, con la versión de cada uno
+            productos = treeview.lista_virtual.modelos(selected_items)
+            if not messagebox.askyesno("Confirmar", f"¿Está seguro que desea eliminar {len(productos)} productos?"):
+                return
+            originales = {producto.id_producto: self._valores_originales(producto, "productos",
+                                                                         self.descripciones.get(producto.id_producto))
+                          for producto in productos}
+            if self._registrar_cambio(self._cambio_en_bloque("productos", "eliminar", originales)):
+                messagebox.showinfo("Éxito", f"{len(productos)} productos eliminados.")
+            return
 
-        selected_item = selected_items[0]
-        id_producto = treeview.item(selected_item)['values'][0]
+        producto = treeview.lista_virtual.modelo(selected_items[0])
+        original = self._valores_originales(producto, "productos", self.descripciones.get(producto.id_producto))
 
         respuesta = messagebox.askyesno("Confirmar", "¿Está seguro que desea eliminar este producto?")
         if respuesta:
-            self.conexion_bd.conectar()
-            try:
-                query = "DELETE FROM productos WHERE id_producto = %s"
-                self.conexion_bd.cursor.execute(query, (id_producto,))
-                self.conexion_bd.conn.commit()
+            # Se guarda en el diario local; la lista se refresca cuando llega al servidor
+            if self._registrar_cambio(("productos", "eliminar", producto.id_producto, None, original)):
                 messagebox.showinfo("Éxito", "Producto eliminado exitosamente.")
-                self.actualizar_productos(treeview)  # Recargar la lista de productos
-            except pymysql.MySQLError as e:
-                print(f"Error al eliminar el producto: {e}")
-                messagebox.showerror("Error", "Hubo un problema al eliminar el producto.")
     def editar_producto(self, treeview):
         selected_items = treeview.selection()
         if not selected_items:
             messagebox.showerror("Error", "Por favor seleccione un producto para editar.")
             return
 
-        selected_item = selected_items[0]
-        id_producto = treeview.item(selected_item)['values'][0]
-        nombre = treeview.item(selected_item)['values'][1]
-        categoria = treeview.item(selected_item)['values'][2]
-        precio = treeview.item(selected_item)['values'][3]
-        cantidad = treeview.item(selected_item)['values'][4]
-        descripcion = treeview.item(selected_item)['values'][5]
+        # Los valores del modelo, con sus tipos (precio Decimal, cantidad int); la
+        # descripcion completa se pide (o sale de la caché) antes de abrir el formulario
+        producto = treeview.lista_virtual.modelo(selected_items[0])
+        self.descripcion_producto(producto.id_producto,
+                                  lambda descripcion: self._ventana_editar_producto(producto, descripcion),
+                                  ventana=treeview.winfo_toplevel())
+
+    def _ventana_editar_producto(self, producto, descripcion):
+        original = self._valores_originales(producto, "productos", descripcion)
 
         # Crear la ventana de edición
         ventana_editar = tk.Toplevel(self.ventana_dashboard)
@@ -851,31 +4956,31 @@ class Dashboard:
         label_nombre = tk.Label(ventana_editar, text="Nombre:")
         label_nombre.pack(pady=10)
         entry_nombre = tk.Entry(ventana_editar)
-        entry_nombre.insert(0, nombre)  # Rellenar con el valor actual
+        entry_nombre.insert(0, producto.nombre)  # Rellenar con el valor actual
         entry_nombre.pack(pady=10)
 
         label_categoria = tk.Label(ventana_editar, text="Categoría:")
         label_categoria.pack(pady=10)
         entry_categoria = tk.Entry(ventana_editar)
-        entry_categoria.insert(0, categoria)  # Rellenar con el valor actual
+        entry_categoria.insert(0, producto.categoria)  # Rellenar con el valor actual
         entry_categoria.pack(pady=10)
 
         label_precio = tk.Label(ventana_editar, text="Precio:")
         label_precio.pack(pady=10)
         entry_precio = tk.Entry(ventana_editar)
-        entry_precio.insert(0, precio)  # Rellenar con el valor actual
+        entry_precio.insert(0, producto.precio)  # Rellenar con el valor actual
         entry_precio.pack(pady=10)
 
         label_cantidad = tk.Label(ventana_editar, text="Cantidad:")
         label_cantidad.pack(pady=10)
         entry_cantidad = tk.Entry(ventana_editar)
-        entry_cantidad.insert(0, cantidad)  # Rellenar con el valor actual
+        entry_cantidad.insert(0, producto.cantidad)  # Rellenar con el valor actual
         entry_cantidad.pack(pady=10)
 
         label_descripcion = tk.Label(ventana_editar, text="Descripción:")
         label_descripcion.pack(pady=10)
         entry_descripcion = tk.Entry(ventana_editar)
-        entry_descripcion.insert(0, descripcion)  # Rellenar con el valor actual
+        entry_descripcion.insert(0, descripcion or "")  # Rellenar con el valor actual
         entry_descripcion.pack(pady=10)
 
         def guardar_edicion():
@@ -888,33 +4993,98 @@ class Dashboard:
 
             # Actualizar en la base de datos
             if nuevo_nombre and nueva_categoria and nuevo_precio and nueva_cantidad and nueva_descripcion:
-                try:
-                    self.conexion_bd.conectar()
-                    query_actualizar = """
-                    UPDATE productos
-                    SET nombre = %s, categoria = %s, precio = %s, cantidad = %s, descripcion = %s
-                    WHERE id_producto = %s
-                    """
-                    self.conexion_bd.cursor.execute(query_actualizar, (nuevo_nombre, nueva_categoria, nuevo_precio, nueva_cantidad, nueva_descripcion, id_producto))
-                    self.conexion_bd.conn.commit()
+                datos = self._validar_producto(nuevo_nombre, nueva_categoria, nuevo_precio, nueva_cantidad,
+                                               nueva_descripcion)
+                if datos is None:
+                    return
+                # El cambio de cantidad se registra como ajuste (delta), no se sobrescribe
+                delta = datos.pop("cantidad") - producto.cantidad
+                cambios = [("productos", "actualizar", producto.id_producto, datos, original)]
+                if delta:
+                    cambios.append(("productos", "movimiento", producto.id_producto,
+                                    {"tipo": "ajuste", "cantidad": delta, "motivo": "Edición de producto",
+                                     "usuario": self.usuario_logueado}, None))
+                # Datos y ajuste se guardan juntos en el diario local y se envían en segundo plano
+                if self._registrar_cambio(*cambios):
+                    self.descripciones.descartar(producto.id_producto)
                     messagebox.showinfo("Éxito", "Producto actualizado.")
                     ventana_editar.destroy()
-                    self.actualizar_productos(treeview)  # Recargar los datos en el Treeview
-                except pymysql.MySQLError as e:
-                    print(f"Error al actualizar el producto: {e}")
-                    messagebox.showerror("Error", "Hubo un problema al actualizar los datos.")
 
         # Botón para guardar la edición
         boton_guardar = tk.Button(ventana_editar, text="Guardar", command=guardar_edicion)
         boton_guardar.pack(pady=20)
 
+    def _error_de_stock(self, error):
+        print(f"Error al registrar el movimiento: {error}")
+        if isinstance(error, StockInsuficiente):
+            messagebox.showerror("Stock insuficiente", str(error))
+        else:
+            messagebox.showerror("Error", "Hubo un problema al actualizar el stock.")
+
+    def registrar_movimiento(self, treeview):
+        """Entrada, salida o ajuste de stock para los productos seleccionados, en una sola transacción"""
+        seleccion = treeview.selection()
+        if not seleccion:
+            messagebox.showerror("Error", "Por favor seleccione uno o más productos.")
+            return
+        productos = treeview.lista_virtual.modelos(seleccion)
+
+        ventana_movimiento = tk.Toplevel(self.ventana_dashboard)
+        ventana_movimiento.title("Movimiento de stock")
+        ventana_movimiento.geometry("400x360")
+
+        texto = productos[0].nombre if len(productos) == 1 else f"{len(productos)} productos seleccionados"
+        label_productos = tk.Label(ventana_movimiento, text=texto, font=("Arial", 12, "bold"))
+        label_productos.pack(pady=10)
+
+        label_tipo = tk.Label(ventana_movimiento, text="Tipo:")
+        label_tipo.pack(pady=5)
+        combo_tipo = ttk.Combobox(ventana_movimiento, values=ServicioInventario.TIPOS, state="readonly")
+        combo_tipo.current(0)
+        combo_tipo.pack(pady=5)
+
+        label_cantidad = tk.Label(ventana_movimiento, text="Cantidad (los ajustes admiten signo):")
+        label_cantidad.pack(pady=5)
+        entry_cantidad = tk.Entry(ventana_movimiento)
+        entry_cantidad.pack(pady=5)
+
+        label_motivo = tk.Label(ventana_movimiento, text="Motivo:")
+        label_motivo.pack(pady=5)
+        entry_motivo = tk.Entry(ventana_movimiento)
+        entry_motivo.pack(pady=5)
+
+        def guardar_movimiento():
+            tipo = combo_tipo.get()
+            try:
+                cantidad = int(entry_cantidad.get())
+            except ValueError:
+                messagebox.showerror("Error", "La cantidad debe ser un número entero.")
+                return
+            motivo = entry_motivo.get() or None
+            movimientos = [(producto.id_producto, tipo, cantidad, motivo) for producto in productos]
+
+            def al_terminar(existencias):
+                # El índice recibe la existencia real tras el movimiento (con la fila completa)
+                self.reindexar_productos([producto.id_producto for producto in productos])
+                messagebox.showinfo("Éxito", "Stock actualizado.")
+                ventana_movimiento.destroy()
+                self.actualizar_productos(treeview)
+
+            self.servicio_bd.ejecutar(lambda: self.inventario.registrar_lote(movimientos, self.usuario_logueado),
+                                      al_terminar, al_fallar=self._error_de_stock,
+                                      ventana=treeview.winfo_toplevel())
+
+        boton_guardar = tk.Button(ventana_movimiento, text="Guardar", command=guardar_movimiento)
+        boton_guardar.pack(pady=20)
+
 # ------------------------------
 # Clase VentanaRegistro
 # ------------------------------
 class VentanaRegistro(VentanaBase):
-    def __init__(self, root, conexion_bd):
+    def __init__(self, root, conexion_bd, servicio_bd):
         super().__init__(root)
         self.conexion_bd = conexion_bd
+        self.servicio_bd = servicio_bd
         self.root.title("Registro de Usuario")
         self.root.geometry("400x300")
 
@@ -957,9 +5127,16 @@ class VentanaRegistro(VentanaBase):
         contrasena = self.entry_registro_contrasena.get()
 
         nuevo_usuario = Usuario(nombre_usuario, nombre, contrasena, "Usuario", "Activo")
-        nuevo_usuario.registrar_usuario(self.conexion_bd)
-        messagebox.showinfo("Registro exitoso", "Usuario registrado correctamente.")
-        self.root.destroy()  # Cerrar la ventana de registro
+
+        def al_registrar(exito):
+            if exito:
+                messagebox.showinfo("Registro exitoso", "Usuario registrado correctamente.")
+                self.root.destroy()  # Cerrar la ventana de registro
+            else:
+                messagebox.showerror("Error", "No se pudo registrar el usuario.")
+
+        self.servicio_bd.ejecutar(lambda: nuevo_usuario.registrar_usuario(self.conexion_bd), al_registrar,
+                                  clave=("registro", self.root), ventana=self.root)
 
 # ------------------------------
 # ejecución
@@ -970,17 +5147,96 @@ def on_closing():
     # Aquí puedes mostrar un mensaje de confirmación o realizar alguna otra acción antes de cerrar
     respuesta = tk.messagebox.askokcancel("Cerrar", "¿Estás seguro de que quieres salir?")
     if respuesta:
+        servicio_bd.cerrar()  # Detener los hilos de base de datos
+        conexion.cerrar_pool()  # Cerrar las conexiones del pool
         root.destroy()  # Si la respuesta es afirmativa, se cierra la ventana
     else:
         return  # Si la respuesta es negativa, no hace nada (la ventana permanece abierta)
 
+def crear_conexion(metricas=None, tamano_pool=5):
+    """Conexión directa a la base: con ALMACEN_SQLITE=ruta.db, un archivo SQLite local; si no, MySQL"""
+    if os.environ.get("ALMACEN_SQLITE"):
+        return ConexionSQLite(os.environ["ALMACEN_SQLITE"], tamano_pool=tamano_pool, metricas=metricas)
+    return ConexionBD("almacenitla-db.ctam6uiuy8ez.us-east-1.rds.amazonaws.com", "estuditlafinal", "itla123.", "almacenadol_db",
+                      tamano_pool=tamano_pool, metricas=metricas)
+
+def ejecutar_comando(argumentos, conexion_bd):
+    """Modo de línea de comandos: exportar e importar sin abrir la interfaz.
+
+    Ejemplos:
+        python index.py exportar productos productos.csv --categoria ELECTRONICOS
+        python index.py exportar clientes clientes.jsonl
+        python index.py importar catalogo.csv --actualizar
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="index.py", description="Gestión de productos de almacén")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    exportar = subcomandos.add_parser("exportar", help="Exporta productos o clientes a CSV o JSON Lines")
+    exportar.add_argument("tabla", choices=("productos", "clientes"))
+    exportar.add_argument("ruta")
+    exportar.add_argument("--formato", choices=ExportadorDatos.FORMATOS)
+    exportar.add_argument("--categoria", help="Exportar solo los productos de esta categoría")
+
+    importar = subcomandos.add_parser("importar", help="Importa productos desde un CSV")
+    importar.add_argument("ruta")
+    importar.add_argument("--actualizar", action="store_true", help="Actualizar productos existentes (mismo ID)")
+    importar.add_argument("--load-data", action="store_true", help="Usar LOAD DATA LOCAL INFILE si se permite")
+
+    args = parser.parse_args(argumentos)
+    try:
+        if args.comando == "exportar":
+            filtro = {"categoria": args.categoria} if args.categoria and args.tabla == "productos" else None
+            filas = ExportadorDatos(conexion_bd.acceso_datos()).exportar(args.tabla, args.ruta, args.formato, filtro)
+            print(f"Se exportaron {filas} filas a {args.ruta}")
+        elif conexion_bd.motor == "servicio":
+            print("Error: la importación necesita conexión directa a la base de datos (sin ALMACEN_SERVICIO).")
+            return 1
+        else:
+            importador = ImportadorProductos(conexion_bd, actualizar_existentes=args.actualizar, usar_load_data=args.load_data)
+            resumen = importador.importar(args.ruta, ruta_rechazados=os.path.splitext(args.ruta)[0] + ".rechazados.csv")
+            print(f"Procesadas: {resumen['procesadas']}  Importadas: {resumen['importadas']}  Rechazadas: {resumen['rechazadas']}")
+            for motivo in resumen["motivos"]:
+                print(f"  {motivo}")
+    except (conexion_bd.Error, OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        conexion_bd.cerrar_pool()
+    return 0
+
 if __name__ == "__main__":
+    # Métricas de consultas: umbral de consulta lenta y archivo opcional donde registrarlas
+    metricas = MetricasBD(umbral_lenta_ms=float(os.environ.get("ALMACEN_UMBRAL_LENTAS_MS", 200)),
+                          ruta_log_lentas=os.environ.get("ALMACEN_LOG_LENTAS"))
+    # Con ALMACEN_SERVICIO=http://host:puerto se trabaja a través de servidor.py (sin conexión propia a la base)
+    if os.environ.get("ALMACEN_SERVICIO"):
+        conexion = ConexionServicio(os.environ["ALMACEN_SERVICIO"], token=os.environ.get("ALMACEN_SERVICIO_TOKEN"),
+                                    metricas=metricas)
+    else:
+        conexion = crear_conexion(metricas)
+    # Con argumentos se ejecuta un comando (exportar/importar) sin abrir la interfaz
+    if len(sys.argv) > 1:
+        sys.exit(ejecutar_comando(sys.argv[1:], conexion))
     root = tk.Tk()
     # Interceptar el evento de cierre de la ventana (clic en la "X")
     root.protocol("WM_DELETE_WINDOW", on_closing)
-    # Conexión a la base e datos
-    conexion = ConexionBD("almacenitla-db.ctam6uiuy8ez.us-east-1.rds.amazonaws.com", "estuditlafinal", "itla123.", "almacenadol_db")
+    # Pool de hilos para las consultas, compartido por todas las ventanas
+    servicio_bd = ServicioBD(root)
     # Crear y mostrar la ventana de login
-    ventana_login = VentanaLogin(root, conexion)
+    ventana_login = VentanaLogin(root, conexion, servicio_bd)
+
+    def al_mostrar_login(event):
+        # Tiempo desde el arranque del intérprete hasta que la ventana de login está en pantalla
+        if event.widget is root:
+            root.unbind("<Map>")
+            if os.environ.get("ALMACEN_MEDIR_ARRANQUE"):
+                print(f"Ventana de login visible en {(time.perf_counter() - INICIO_PROCESO) * 1000:.0f} ms")
+            # El driver de MySQL se carga ahora, en segundo plano, mientras el usuario escribe
+            if conexion.motor == "mysql":
+                servicio_bd.ejecutar(precargar_driver, mensaje_error="No se pudo cargar el driver de MySQL.")
+
+    root.bind("<Map>", al_mostrar_login)
     # Iniciar el bucle principal de la interfaz
     root.mainloop()
\ No newline at end of file
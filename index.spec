@@ -1,12 +1,21 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+# Compilación en carpeta (onedir): el ejecutable arranca sin descomprimir
+# todo en un directorio temporal en cada inicio, como hacía el modo onefile.
+# Solo se empaquetan las imágenes que usa la aplicación (no el PDF ni 3.png).
+# Sin UPX: descomprimir las DLL comprimidas también retrasa el arranque.
+
+recursos = [(f'recursos/{nombre}', 'recursos') for nombre in ('1.png', '2.png', 'fondo.png')]
+# Esquema que ConexionSQLite ejecuta al crear la base local (RUTA_ESQUEMA: junto a index.py)
+recursos.append(('almacenadol_sqlite.sql', '.'))
 
 a = Analysis(
     ['index.py'],
     pathex=[],
     binaries=[],
-    datas=[('recursos', 'recursos')],
-    hiddenimports=[],
+    datas=recursos,
+    # pymysql se importa de forma diferida (importlib), el análisis no lo detecta solo
+    hiddenimports=['pymysql'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -19,16 +28,13 @@ pyz = PYZ(a.pure)
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='index',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -36,3 +42,13 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
 )
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='index',
+)
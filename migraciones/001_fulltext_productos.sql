@@ -0,0 +1,14 @@
+--
+-- Migración 001: índices FULLTEXT para la búsqueda de productos en el servidor
+--
+-- `ft_nombre_descripcion` resuelve el MATCH del WHERE y `ft_nombre` permite dar
+-- más peso a las coincidencias en el nombre al ordenar por relevancia.
+-- En tablas grandes, crear los índices puede tardar varios minutos.
+--
+
+-- InnoDB crea un solo índice FULLTEXT por sentencia
+ALTER TABLE `productos`
+  ADD FULLTEXT KEY `ft_nombre` (`nombre`);
+
+ALTER TABLE `productos`
+  ADD FULLTEXT KEY `ft_nombre_descripcion` (`nombre`,`descripcion`);
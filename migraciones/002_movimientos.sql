@@ -0,0 +1,19 @@
+--
+-- Migración 002: libro de movimientos de stock
+--
+-- Cada entrada, salida o ajuste queda registrado con su delta (`cantidad`
+-- con signo); `productos.cantidad` se actualiza con el mismo delta en la
+-- misma transacción.
+--
+
+CREATE TABLE `movimientos` (
+  `id_movimiento` bigint(20) NOT NULL AUTO_INCREMENT,
+  `id_producto` int(11) NOT NULL,
+  `tipo` enum('entrada','salida','ajuste') NOT NULL,
+  `cantidad` int(11) NOT NULL,
+  `motivo` varchar(255) DEFAULT NULL,
+  `usuario` varchar(100) DEFAULT NULL,
+  `fecha` timestamp NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`id_movimiento`),
+  KEY `idx_movimientos_producto` (`id_producto`,`id_movimiento`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
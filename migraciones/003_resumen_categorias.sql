@@ -0,0 +1,69 @@
+--
+-- Migración 003: indicadores de inventario mantenidos por disparadores
+--
+-- `resumen_categorias` guarda por categoría el número de productos, las
+-- unidades, el valor del stock (precio * cantidad) y los productos agotados.
+-- Los disparadores de `productos` lo actualizan en la misma transacción que
+-- cada alta, cambio o baja (incluidos los movimientos de stock y las
+-- importaciones), así que el Dashboard lo lee sin recorrer `productos`.
+-- Ejecutar con la aplicación detenida: los cambios hechos entre la carga
+-- inicial y la creación de los disparadores no quedarían contados.
+--
+
+CREATE TABLE `resumen_categorias` (
+  `categoria` varchar(255) NOT NULL,
+  `productos` int(11) NOT NULL DEFAULT 0,
+  `unidades` bigint(20) NOT NULL DEFAULT 0,
+  `valor` decimal(16,2) NOT NULL DEFAULT 0.00,
+  `agotados` int(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`categoria`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- Carga inicial: el único recorrido completo de la tabla
+INSERT INTO `resumen_categorias` (`categoria`, `productos`, `unidades`, `valor`, `agotados`)
+SELECT `categoria`, COUNT(*), SUM(`cantidad`), SUM(`precio` * `cantidad`), SUM(`cantidad` <= 0)
+FROM `productos`
+GROUP BY `categoria`;
+
+DELIMITER $$
+CREATE TRIGGER `trg_productos_resumen_insert` AFTER INSERT ON `productos` FOR EACH ROW BEGIN
+  INSERT INTO `resumen_categorias` (`categoria`, `productos`, `unidades`, `valor`, `agotados`)
+  VALUES (NEW.`categoria`, 1, NEW.`cantidad`, NEW.`precio` * NEW.`cantidad`, NEW.`cantidad` <= 0)
+  ON DUPLICATE KEY UPDATE
+    `productos` = `productos` + 1,
+    `unidades` = `unidades` + VALUES(`unidades`),
+    `valor` = `valor` + VALUES(`valor`),
+    `agotados` = `agotados` + VALUES(`agotados`);
+END
+$$
+CREATE TRIGGER `trg_productos_resumen_update` AFTER UPDATE ON `productos` FOR EACH ROW BEGIN
+  -- Solo las columnas que suma el resumen: ediciones de nombre, descripción o
+  -- umbral no tocan `resumen_categorias` ni bloquean la fila de la categoría
+  IF NOT (OLD.`categoria` <=> NEW.`categoria` AND OLD.`precio` <=> NEW.`precio`
+          AND OLD.`cantidad` <=> NEW.`cantidad`) THEN
+    UPDATE `resumen_categorias`
+    SET `productos` = `productos` - 1,
+        `unidades` = `unidades` - OLD.`cantidad`,
+        `valor` = `valor` - OLD.`precio` * OLD.`cantidad`,
+        `agotados` = `agotados` - (OLD.`cantidad` <= 0)
+    WHERE `categoria` = OLD.`categoria`;
+    INSERT INTO `resumen_categorias` (`categoria`, `productos`, `unidades`, `valor`, `agotados`)
+    VALUES (NEW.`categoria`, 1, NEW.`cantidad`, NEW.`precio` * NEW.`cantidad`, NEW.`cantidad` <= 0)
+    ON DUPLICATE KEY UPDATE
+      `productos` = `productos` + 1,
+      `unidades` = `unidades` + VALUES(`unidades`),
+      `valor` = `valor` + VALUES(`valor`),
+      `agotados` = `agotados` + VALUES(`agotados`);
+  END IF;
+END
+$$
+CREATE TRIGGER `trg_productos_resumen_delete` AFTER DELETE ON `productos` FOR EACH ROW BEGIN
+  UPDATE `resumen_categorias`
+  SET `productos` = `productos` - 1,
+      `unidades` = `unidades` - OLD.`cantidad`,
+      `valor` = `valor` - OLD.`precio` * OLD.`cantidad`,
+      `agotados` = `agotados` - (OLD.`cantidad` <= 0)
+  WHERE `categoria` = OLD.`categoria`;
+END
+$$
+DELIMITER ;
@@ -0,0 +1,13 @@
+--
+-- Migración 004: umbral de reposición para los avisos de stock bajo
+--
+-- La condición `cantidad <= umbral` compara dos columnas y no puede usar un
+-- índice sobre (cantidad, umbral) como rango. La columna generada `faltante`
+-- (umbral - cantidad) sí: `faltante >= 0` recorre solo las entradas del índice
+-- de los productos que están bajos.
+--
+
+ALTER TABLE `productos`
+  ADD COLUMN `umbral` int(11) NOT NULL DEFAULT 0,
+  ADD COLUMN `faltante` int(11) GENERATED ALWAYS AS (`umbral` - `cantidad`) STORED,
+  ADD KEY `idx_productos_faltante` (`faltante`);
@@ -0,0 +1,15 @@
+--
+-- Migración 005: cambios del diario local ya aplicados
+--
+-- Cada cambio que el cliente guarda en su diario (DiarioCambios) lleva un uuid.
+-- Se inserta aquí en la misma transacción que aplica el cambio: si el cliente
+-- se cierra antes de borrar su copia local, al reintentar lo reconoce y no lo
+-- aplica dos veces. Las filas antiguas se pueden borrar cuando ningún cliente
+-- tenga cambios pendientes de esas fechas.
+--
+
+CREATE TABLE IF NOT EXISTS `cambios_aplicados` (
+  `uuid` char(36) NOT NULL,
+  `aplicado` timestamp NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`uuid`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
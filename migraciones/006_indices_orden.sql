@@ -0,0 +1,19 @@
+--
+-- Migración 006: índices para ordenar y filtrar las listas en el servidor
+--
+-- Las listas de productos y clientes se pueden ordenar por columna y filtrar por
+-- categoría (AccesoDatos.ORDENES_*). Se paginan por posición: `WHERE (columna,
+-- id) > (valor, id)` con `ORDER BY columna, id`. Como InnoDB agrega la clave
+-- primaria al final de cada índice secundario, cada página recorre solo `limite`
+-- entradas del índice, sin ordenar la tabla. (categoria, nombre) sirve también
+-- para filtrar por categoría y ordenar por nombre.
+--
+
+ALTER TABLE `productos`
+  ADD KEY `idx_productos_categoria_nombre` (`categoria`,`nombre`),
+  ADD KEY `idx_productos_nombre` (`nombre`),
+  ADD KEY `idx_productos_precio` (`precio`),
+  ADD KEY `idx_productos_cantidad` (`cantidad`);
+
+ALTER TABLE `clientes`
+  ADD KEY `idx_clientes_apellido_nombre` (`apellido`,`nombre`);
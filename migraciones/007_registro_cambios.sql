@@ -0,0 +1,44 @@
+--
+-- Migración 007: registro de cambios para sincronizar las terminales abiertas
+--
+-- Cada alta, cambio o baja de `productos` y `clientes` (por cualquier camino:
+-- formularios, diario, importaciones, movimientos de stock) deja una fila con su
+-- tabla y su id. Cada terminal pregunta cada pocos segundos por las filas con
+-- `seq` mayor que la última que vio (AccesoDatos.cambios_desde) y solo vuelve a
+-- leer esos registros: el costo de cada consulta depende de los cambios, no del
+-- tamaño de las tablas.
+--
+-- Un `seq` reservado por una transacción que todavía no terminó puede aparecer
+-- después de otros mayores; MonitorCambios vuelve a pedir esos huecos durante
+-- un rato antes de darlos por descartados (rollback). Las filas de más de un
+-- día se pueden borrar: una terminal que vuelve después de tanto recarga todo.
+--
+
+CREATE TABLE IF NOT EXISTS `registro_cambios` (
+  `seq` bigint(20) NOT NULL AUTO_INCREMENT,
+  `tabla` varchar(20) NOT NULL,
+  `clave` int(11) NOT NULL,
+  `fecha` timestamp NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`seq`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+DELIMITER $$
+CREATE TRIGGER `trg_productos_registro_insert` AFTER INSERT ON `productos` FOR EACH ROW
+  INSERT INTO `registro_cambios` (`tabla`, `clave`) VALUES ('productos', NEW.`id_producto`)
+$$
+CREATE TRIGGER `trg_productos_registro_update` AFTER UPDATE ON `productos` FOR EACH ROW
+  INSERT INTO `registro_cambios` (`tabla`, `clave`) VALUES ('productos', NEW.`id_producto`)
+$$
+CREATE TRIGGER `trg_productos_registro_delete` AFTER DELETE ON `productos` FOR EACH ROW
+  INSERT INTO `registro_cambios` (`tabla`, `clave`) VALUES ('productos', OLD.`id_producto`)
+$$
+CREATE TRIGGER `trg_clientes_registro_insert` AFTER INSERT ON `clientes` FOR EACH ROW
+  INSERT INTO `registro_cambios` (`tabla`, `clave`) VALUES ('clientes', NEW.`id_cliente`)
+$$
+CREATE TRIGGER `trg_clientes_registro_update` AFTER UPDATE ON `clientes` FOR EACH ROW
+  INSERT INTO `registro_cambios` (`tabla`, `clave`) VALUES ('clientes', NEW.`id_cliente`)
+$$
+CREATE TRIGGER `trg_clientes_registro_delete` AFTER DELETE ON `clientes` FOR EACH ROW
+  INSERT INTO `registro_cambios` (`tabla`, `clave`) VALUES ('clientes', OLD.`id_cliente`)
+$$
+DELIMITER ;
@@ -0,0 +1,16 @@
+--
+-- Migración 008: número de versión por fila para las ediciones concurrentes
+--
+-- Cada edición de nombre, categoría, precio o descripción (o de los datos de un
+-- cliente) suma 1 a `version`. El diario envía la versión que tenía el
+-- formulario y actualiza con `WHERE ... AND version = %s`: si otra terminal
+-- guardó antes no se toca ninguna fila y el cambio queda en conflicto, sin
+-- bloquear la fila con SELECT ... FOR UPDATE. Los movimientos de stock no
+-- cambian la versión: una venta no invalida la edición del nombre.
+--
+
+ALTER TABLE `productos`
+  ADD COLUMN `version` int(11) NOT NULL DEFAULT 0;
+
+ALTER TABLE `clientes`
+  ADD COLUMN `version` int(11) NOT NULL DEFAULT 0;
@@ -0,0 +1,35 @@
+--
+-- Migración 009: el resumen por categoría solo se toca si cambia lo que suma
+--
+-- El disparador de la migración 003 restaba y volvía a sumar la fila en
+-- `resumen_categorias` en cada UPDATE de `productos`, aunque solo cambiara el
+-- nombre, la descripción, el umbral o la versión. Eso bloqueaba la fila de la
+-- categoría en cada edición y serializaba (o interbloqueaba) ediciones sin
+-- relación. Ahora solo actúa si cambian la categoría, el precio o la cantidad.
+--
+
+DROP TRIGGER IF EXISTS `trg_productos_resumen_update`;
+
+DELIMITER $$
+CREATE TRIGGER `trg_productos_resumen_update` AFTER UPDATE ON `productos` FOR EACH ROW BEGIN
+  -- Solo las columnas que suma el resumen: ediciones de nombre, descripción o
+  -- umbral no tocan `resumen_categorias` ni bloquean la fila de la categoría
+  IF NOT (OLD.`categoria` <=> NEW.`categoria` AND OLD.`precio` <=> NEW.`precio`
+          AND OLD.`cantidad` <=> NEW.`cantidad`) THEN
+    UPDATE `resumen_categorias`
+    SET `productos` = `productos` - 1,
+        `unidades` = `unidades` - OLD.`cantidad`,
+        `valor` = `valor` - OLD.`precio` * OLD.`cantidad`,
+        `agotados` = `agotados` - (OLD.`cantidad` <= 0)
+    WHERE `categoria` = OLD.`categoria`;
+    INSERT INTO `resumen_categorias` (`categoria`, `productos`, `unidades`, `valor`, `agotados`)
+    VALUES (NEW.`categoria`, 1, NEW.`cantidad`, NEW.`precio` * NEW.`cantidad`, NEW.`cantidad` <= 0)
+    ON DUPLICATE KEY UPDATE
+      `productos` = `productos` + 1,
+      `unidades` = `unidades` + VALUES(`unidades`),
+      `valor` = `valor` + VALUES(`valor`),
+      `agotados` = `agotados` + VALUES(`agotados`);
+  END IF;
+END
+$$
+DELIMITER ;
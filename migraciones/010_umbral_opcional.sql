@@ -0,0 +1,18 @@
+--
+-- Migración 010: el umbral de reposición es opcional
+--
+-- Con `umbral` NOT NULL DEFAULT 0 todo producto agotado generaba un aviso de
+-- stock bajo, aunque nadie le hubiera fijado un umbral. Ahora sin umbral es
+-- NULL: `faltante` (umbral - cantidad) también es NULL y `faltante >= 0` no lo
+-- incluye, así que solo avisan los productos con umbral fijado.
+--
+-- El 0 que tenían los productos era casi siempre el valor por defecto y pasa a
+-- NULL. Quien quiera el aviso al agotarse puede volver a fijar el umbral en 0.
+-- El UPDATE anota cada producto en `registro_cambios`: ejecutar con la
+-- aplicación detenida.
+--
+
+ALTER TABLE `productos`
+  MODIFY COLUMN `umbral` int(11) DEFAULT NULL;
+
+UPDATE `productos` SET `umbral` = NULL WHERE `umbral` = 0;
@@ -0,0 +1,11 @@
+--
+-- Migración 011: índice para purgar `cambios_aplicados` por antigüedad
+--
+-- DiarioCambios.aplicar_grupos borra, como mucho una vez por hora, los uuids
+-- aplicados hace más de DiarioCambios.RETENCION_APLICADOS_DIAS días: pasado
+-- ese plazo ninguna terminal los vuelve a enviar. Sin el índice, cada purga
+-- recorrería la tabla entera.
+--
+
+ALTER TABLE `cambios_aplicados`
+  ADD KEY `idx_cambios_aplicados_aplicado` (`aplicado`);
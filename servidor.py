@@ -0,0 +1,241 @@
+"""Servicio local JSON/HTTP: varias terminales comparten un solo pool de conexiones.
+
+Cada terminal que se abre con ALMACEN_SERVICIO deja de conectarse a la base de
+datos: le pide al servicio las mismas operaciones de AccesoDatos,
+ServicioInventario, el diario de cambios y el login. El servicio mantiene un
+pool de conexiones y una caché de lecturas compartida por todas las terminales:
+
+    python servidor.py --puerto 8765
+    ALMACEN_SERVICIO=http://127.0.0.1:8765 python index.py
+
+La base se elige como en index.py (ALMACEN_SQLITE o MySQL). Solo usa la
+biblioteca estándar (asyncio). Escucha en 127.0.0.1 salvo que se indique otra
+dirección; con ALMACEN_SERVICIO_TOKEN las peticiones deben traer la cabecera
+``X-Token`` con ese valor.
+
+Protocolo: ``POST /objeto/metodo`` con ``{"args": [...], "kwargs": {...}}``;
+la respuesta es ``{"resultado": ...}`` o ``{"error": ..., "tipo": ...}``. Los
+valores viajan con ``index.a_json``/``index.desde_json``. ``GET /salud`` y
+``GET /estado`` (pool, caché y métricas de consultas) sirven para monitoreo.
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from index import (AccesoDatos, DiarioCambios, MetricasBD, ServicioInventario, StockInsuficiente, Usuario,
+                   a_json, crear_conexion, desde_json)
+
+MAX_CUERPO = 16 * 1024 * 1024  # Bytes por petición
+
+
+class CacheLecturas:
+    """Respuestas recientes de lecturas, compartidas por todas las terminales.
+
+    Una respuesta vale ``ttl`` segundos; cualquier escritura vacía la caché. Si
+    varias terminales piden lo mismo a la vez, la consulta se hace una sola vez y
+    todas reciben su resultado. Una lectura que termina después de una escritura
+    se entrega pero no se guarda.
+    """
+
+    def __init__(self, ttl=2.0, max_entradas=2000):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._entradas = {}   # clave -> (instante, respuesta)
+        self._en_curso = {}   # clave -> Future de la consulta que ya se está haciendo
+        self._generacion = 0  # Cambia con cada escritura
+        self.aciertos = 0
+        self.fallos = 0
+
+    async def obtener(self, clave, calcular):
+        entrada = self._entradas.get(clave)
+        if entrada is not None and time.monotonic() - entrada[0] < self.ttl:
+            self.aciertos += 1
+            return entrada[1]
+        futuro = self._en_curso.get(clave)
+        if futuro is not None:
+            self.aciertos += 1
+            return await asyncio.shield(futuro)
+
+        self.fallos += 1
+        futuro = self._en_curso[clave] = asyncio.get_running_loop().create_future()
+        generacion = self._generacion
+        try:
+            respuesta = await calcular()
+        except Exception as e:
+            futuro.set_exception(e)
+            futuro.exception()  # Los que esperaban reciben el error; evita el aviso de excepción no leída
+            raise
+        else:
+            futuro.set_result(respuesta)
+            if generacion == self._generacion:
+                if len(self._entradas) >= self.max_entradas:
+                    del self._entradas[next(iter(self._entradas))]  # La más antigua
+                self._entradas[clave] = (time.monotonic(), respuesta)
+            return respuesta
+        finally:
+            if self._en_curso.get(clave) is futuro:
+                del self._en_curso[clave]
+
+    def invalidar(self):
+        self._generacion += 1
+        self._entradas.clear()
+        self._en_curso.clear()  # Las lecturas en curso pueden no ver la escritura
+
+    def estado(self):
+        return {"entradas": len(self._entradas), "aciertos": self.aciertos, "fallos": self.fallos, "ttl": self.ttl}
+
+
+class ServicioAlmacen:
+    """Atiende las peticiones HTTP y ejecuta las operaciones en hilos, con un solo pool."""
+
+    def __init__(self, conexion_bd, ttl_cache=2.0, token=None):
+        self.conexion_bd = conexion_bd
+        self.token = token
+        self.cache = CacheLecturas(ttl_cache)
+        # Un hilo por conexión del pool: más hilos solo esperarían una conexión libre
+        self._hilos = ThreadPoolExecutor(max_workers=conexion_bd.tamano_pool, thread_name_prefix="servicio")
+
+        datos, inventario = conexion_bd.acceso_datos(), conexion_bd.servicio_inventario()
+        self.rutas = {f"datos/{metodo}": getattr(datos, metodo) for metodo in AccesoDatos.METODOS_REMOTOS}
+        self.rutas.update({f"inventario/{metodo}": getattr(inventario, metodo)
+                           for metodo in ServicioInventario.METODOS_REMOTOS})
+        self.rutas["diario/aplicar_grupos"] = functools.partial(DiarioCambios.aplicar_grupos, conexion_bd)
+        self.rutas["usuarios/nombre_de_login"] = functools.partial(Usuario.nombre_de_login, conexion_bd)
+        self.rutas["usuarios/registrar"] = self._registrar_usuario
+        self.lecturas = {f"datos/{metodo}" for metodo in AccesoDatos.LECTURAS}
+        self.lecturas.update(f"inventario/{metodo}" for metodo in ServicioInventario.LECTURAS)
+
+    def _registrar_usuario(self, usuarios, contrasena, rol, estado):
+        return Usuario(usuarios, None, contrasena, rol, estado).registrar_usuario(self.conexion_bd)
+
+    def estado(self):
+        return {"pool": self.conexion_bd.estado_pool(), "cache": self.cache.estado(),
+                "metricas": self.conexion_bd.metricas.resumen()}
+
+    async def servir(self, host, puerto):
+        servidor = await asyncio.start_server(self.atender, host, puerto)
+        print(f"Servicio escuchando en http://{host}:{puerto} (motor: {self.conexion_bd.motor})")
+        async with servidor:
+            await servidor.serve_forever()
+
+    async def atender(self, lector, escritor):
+        """Una conexión TCP de una terminal: varias peticiones seguidas (keep-alive)."""
+        try:
+            while True:
+                peticion = await self._leer_peticion(lector)
+                if peticion is None:
+                    break
+                metodo, ruta, version, cabeceras, cuerpo = peticion
+                estado, respuesta = await self._responder(metodo, ruta, cabeceras, cuerpo)
+                mantener = version == "HTTP/1.1" and cabeceras.get("connection", "").lower() != "close"
+                escritor.write((f"HTTP/1.1 {estado} {'OK' if estado == 200 else 'Error'}\r\n"
+                                f"Content-Type: application/json; charset=utf-8\r\n"
+                                f"Content-Length: {len(respuesta)}\r\n"
+                                f"Connection: {'keep-alive' if mantener else 'close'}\r\n\r\n").encode("latin-1")
+                               + respuesta)
+                await escritor.drain()
+                if not mantener:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass  # La terminal cerró la conexión o envió algo que no es HTTP
+        finally:
+            escritor.close()
+
+    @staticmethod
+    async def _leer_peticion(lector):
+        linea = await lector.readline()
+        if not linea:
+            return None
+        metodo, ruta, version = linea.decode("latin-1").split()
+        cabeceras = {}
+        while True:
+            linea = await lector.readline()
+            if linea in (b"\r\n", b"\n", b""):
+                break
+            nombre, _, valor = linea.decode("latin-1").partition(":")
+            cabeceras[nombre.strip().lower()] = valor.strip()
+        largo = int(cabeceras.get("content-length", 0))
+        if largo > MAX_CUERPO:
+            raise ValueError("Petición demasiado grande")
+        cuerpo = await lector.readexactly(largo) if largo else b""
+        return metodo, ruta, version, cabeceras, cuerpo
+
+    @staticmethod
+    def _json(valor):
+        return json.dumps(a_json(valor), ensure_ascii=False).encode("utf-8")
+
+    def _error(self, estado, mensaje, tipo="Error"):
+        return estado, self._json({"error": mensaje, "tipo": tipo})
+
+    async def _responder(self, metodo, ruta, cabeceras, cuerpo):
+        if self.token and cabeceras.get("x-token") != self.token:
+            return self._error(401, "Token no válido")
+        if metodo == "GET" and ruta == "/salud":
+            return 200, self._json({"resultado": "ok"})
+        if metodo == "GET" and ruta == "/estado":
+            return 200, self._json({"resultado": self.estado()})
+        if metodo != "POST":
+            return self._error(405, "Método no permitido")
+        nombre = ruta.strip("/")
+        funcion = self.rutas.get(nombre)
+        if funcion is None:
+            return self._error(404, f"Operación desconocida: {nombre}")
+        try:
+            peticion = json.loads(cuerpo or b"{}", object_hook=desde_json)
+            args, kwargs = list(peticion.get("args", [])), dict(peticion.get("kwargs", {}))
+        except (ValueError, AttributeError, TypeError):
+            return self._error(400, "Cuerpo JSON no válido", "ValueError")
+
+        async def ejecutar():
+            resultado = await asyncio.get_running_loop().run_in_executor(
+                self._hilos, functools.partial(funcion, *args, **kwargs))
+            return self._json({"resultado": resultado})
+
+        try:
+            if nombre in self.lecturas:
+                return 200, await self.cache.obtener(nombre.encode("utf-8") + b"\0" + cuerpo, ejecutar)
+            try:
+                return 200, await ejecutar()
+            finally:
+                self.cache.invalidar()
+        except StockInsuficiente as e:
+            return self._error(409, str(e), "StockInsuficiente")
+        except (ValueError, TypeError) as e:
+            return self._error(400, str(e), "ValueError")
+        except self.conexion_bd.errores_de_conexion as e:
+            print(f"Sin conexión con la base de datos: {e}")
+            return self._error(503, "La base de datos no responde.", "SinConexion")
+        except self.conexion_bd.Error as e:
+            return self._error(500, str(e))
+        except Exception as e:
+            print(f"Error al atender {nombre}: {e!r}")
+            return self._error(500, "Error interno del servicio")
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Servicio local compartido para las terminales del almacén")
+    parser.add_argument("--host", default="127.0.0.1", help="Dirección donde escuchar (por defecto solo este equipo)")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--tamano-pool", type=int, default=10, help="Conexiones a la base compartidas por todas las terminales")
+    parser.add_argument("--ttl-cache", type=float, default=2.0, help="Segundos que vale una lectura en caché (0 la desactiva)")
+    args = parser.parse_args(argumentos)
+
+    metricas = MetricasBD(umbral_lenta_ms=float(os.environ.get("ALMACEN_UMBRAL_LENTAS_MS", 200)),
+                          ruta_log_lentas=os.environ.get("ALMACEN_LOG_LENTAS"))
+    conexion_bd = crear_conexion(metricas, tamano_pool=args.tamano_pool)
+    servicio = ServicioAlmacen(conexion_bd, ttl_cache=args.ttl_cache, token=os.environ.get("ALMACEN_SERVICIO_TOKEN"))
+    try:
+        asyncio.run(servicio.servir(args.host, args.puerto))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conexion_bd.cerrar_pool()
+
+
+if __name__ == "__main__":
+    main()